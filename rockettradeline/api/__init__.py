@@ -7,5 +7,9 @@ from . import tradeline
 from . import website
 from . import utils
 from . import files
+from . import instrumentation
 
-__all__ = ['auth', 'auth_extended', 'tradeline', 'website', 'utils', 'files']
\ No newline at end of file
+# Prometheus scrape endpoint: /api/method/rockettradeline.api.metrics
+from .instrumentation import metrics
+
+__all__ = ['auth', 'auth_extended', 'tradeline', 'website', 'utils', 'files', 'instrumentation', 'metrics']
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+RocketTradeline Admin Overview
+Every admin home screen counter from one query
+
+get_admin_overview runs a single SELECT of scalar subqueries. Being one
+statement, all counters come from the same consistent read, so they never
+disagree with each other the way separately fetched counts can. Sales figures
+come from the Sales Daily Rollup. The result is cached for OVERVIEW_TTL seconds.
+"""
+
+import time
+
+import frappe
+from frappe.utils import add_days, cint, get_first_day, now_datetime, today
+
+from .auth import jwt_required, get_authenticated_user
+from .payment import is_administrator
+from .reporting import COLLECTED_STATUSES
+
+OVERVIEW_CACHE_KEY = "rockettradeline:admin_overview"
+OVERVIEW_TTL = 60
+NEWSLETTER_GROUP = "Website Subscribers"
+
+OVERVIEW_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM `tabPayment Request`
+            WHERE is_manual_payment = 1 AND approval_status = 'Pending Approval') AS pending_approvals,
+        (SELECT COUNT(*) FROM `tabPayment Request` WHERE status = 'Pending') AS pending_payments,
+        (SELECT COUNT(*) FROM `tabPayment Reconciliation Match` WHERE status = 'Pending Review') AS reconciliation_reviews,
+        (SELECT COUNT(*) FROM `tabTradeline Feedback`) AS feedback_total,
+        (SELECT COUNT(*) FROM `tabTradeline Feedback` WHERE status = 'New') AS feedback_new,
+        (SELECT COUNT(*) FROM `tabTradeline Feedback` WHERE submission_date >= %(week_ago)s) AS feedback_last_7_days,
+        (SELECT COUNT(*) FROM `tabEmail Group Member`
+            WHERE email_group = %(newsletter)s AND unsubscribed = 0) AS newsletter_subscribers,
+        (SELECT COUNT(*) FROM `tabEmail Group`) AS email_groups,
+        (SELECT COUNT(*) FROM `tabTradeline Cart` WHERE status = 'Active') AS active_carts,
+        (SELECT COUNT(*) FROM `tabTradeline Cart` WHERE status IN ('Checked Out', 'Processing')) AS checkout_carts,
+        (SELECT COUNT(*) FROM `tabTradeline` WHERE status = 'Active') AS active_tradelines,
+        (SELECT COUNT(*) FROM `tabTradeline` WHERE status = 'Active' AND remaining_spots <= 0) AS sold_out_tradelines,
+        (SELECT IFNULL(SUM(request_count), 0) FROM `tabSales Daily Rollup` WHERE `date` = %(today)s) AS requests_today,
+        (SELECT IFNULL(SUM(total_amount), 0) FROM `tabSales Daily Rollup`
+            WHERE `date` = %(today)s AND status IN %(collected)s) AS collected_today,
+        (SELECT IFNULL(SUM(total_amount), 0) FROM `tabSales Daily Rollup`
+            WHERE `date` >= %(month_start)s AND status IN %(collected)s) AS collected_month_to_date
+"""
+
+
+def build_admin_overview():
+    day = today()
+    counters = frappe.db.sql(OVERVIEW_SQL, {
+        "today": day,
+        "week_ago": add_days(now_datetime(), -7),
+        "month_start": get_first_day(day),
+        "newsletter": NEWSLETTER_GROUP,
+        "collected": COLLECTED_STATUSES,
+    }, as_dict=True)[0]
+
+    return {
+        "payments": {
+            "pending_approvals": cint(counters.pending_approvals),
+            "pending_payments": cint(counters.pending_payments),
+            "reconciliation_reviews": cint(counters.reconciliation_reviews),
+        },
+        "sales": {
+            "requests_today": cint(counters.requests_today),
+            "collected_today": float(counters.collected_today),
+            "collected_month_to_date": float(counters.collected_month_to_date),
+        },
+        "feedback": {
+            "total": cint(counters.feedback_total),
+            "new": cint(counters.feedback_new),
+            "last_7_days": cint(counters.feedback_last_7_days),
+        },
+        "marketing": {
+            "newsletter_subscribers": cint(counters.newsletter_subscribers),
+            "email_groups": cint(counters.email_groups),
+        },
+        "carts": {
+            "active": cint(counters.active_carts),
+            "in_checkout": cint(counters.checkout_carts),
+        },
+        "tradelines": {
+            "active": cint(counters.active_tradelines),
+            "sold_out": cint(counters.sold_out_tradelines),
+        },
+    }
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def get_admin_overview(refresh=0):
+    """Counters for the admin home screen, cached for OVERVIEW_TTL seconds (Admin only)"""
+    try:
+        current_user = get_authenticated_user()
+        if not current_user or current_user == "Guest":
+            return {"success": False, "error": "Authentication required"}
+        if not is_administrator(current_user):
+            return {"success": False, "error": "Insufficient permissions. Admin access required."}
+
+        cache = frappe.cache()
+        cached = None if cint(refresh) else cache.get_value(OVERVIEW_CACHE_KEY)
+        if cached:
+            return {"success": True, "cached": True, **cached}
+
+        started = time.perf_counter()
+        overview = {
+            "overview": build_admin_overview(),
+            "generated_at": str(now_datetime()),
+        }
+        overview["computed_in_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        overview["ttl"] = OVERVIEW_TTL
+        cache.set_value(OVERVIEW_CACHE_KEY, overview, expires_in_sec=OVERVIEW_TTL)
+
+        return {"success": True, "cached": False, **overview}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
@@ -7,7 +7,7 @@ def get_authenticated_user():
 import frappe
 from frappe import _
 from frappe.auth import LoginManager
-from frappe.utils import validate_email_address, random_string, cstr, encode, now_datetime, add_days, now
+from frappe.utils import validate_email_address, random_string, cstr, cint, encode, now_datetime, add_days, now, get_datetime
 from frappe.core.doctype.user.user import sign_up as frappe_sign_up
 from frappe.integrations.utils import make_post_request
 import json
@@ -18,6 +18,12 @@ from datetime import datetime, timedelta
 import jwt
 import os
 from functools import wraps
+from rockettradeline.rockettradeline.doctype.verification_token.verification_token import (
+    issue_token, get_active_token, resolve_token, consume_token, clear_cached_token
+)
+from rockettradeline.api.profile import get_profile_data
+from rockettradeline.api.utils import get_customer_for_user, clear_customer_cache
+from rockettradeline.api.transaction import unit_of_work
 
 # Route Protection Decorators
 
@@ -467,22 +473,23 @@ def get_email_footer(recipient_email):
         </div>
     </div>"""
 
-def generate_verification_token(email):
-    """Generate email verification token"""
+def generate_verification_token(email, reuse=False):
+    """Generate email verification token
+
+    Tokens live in the Verification Token store (SHA-256 digest, unique index).
+    With reuse=True an unexpired token that was already sent is returned again.
+    """
     try:
         # Check if user exists first
         if not frappe.db.exists("User", email):
             frappe.log_error(f"User {email} does not exist when generating verification token")
             return None
             
-        # Create a unique verification token
-        token_data = f"{email}:{now()}:{random_string(32)}"
-        verification_token = base64.b64encode(token_data.encode()).decode()
+        verification_token = issue_token(email, "Email Verification", reuse=reuse)
         
-        # Store verification token in User doc using correct field names
-        frappe.db.set_value("User", email, "email_verification_token", verification_token)
+        # Keep the sent timestamp on the User for reference in the desk;
+        # committed by the caller's unit of work (or the background job)
         frappe.db.set_value("User", email, "email_verification_sent_at", now_datetime())
-        frappe.db.commit()
         
         frappe.logger().info(f"Successfully generated verification token for {email}")
         return verification_token
@@ -581,6 +588,7 @@ def is_email_verified(email):
 # Authentication APIs
 
 @frappe.whitelist(allow_guest=True)
+@unit_of_work(rollback_on_failure=False)
 def login(usr, pwd):
     """
     Login with username/email and password and return API tokens
@@ -645,7 +653,7 @@ def login(usr, pwd):
         if not is_email_verified(user_doc.email):
             # Generate and send verification email
             try:
-                verification_token = generate_verification_token(user_doc.email)
+                verification_token = generate_verification_token(user_doc.email, reuse=True)
                 if verification_token:
                     email_sent = send_verification_email(user_doc.email, user_doc.full_name, verification_token)
                     
@@ -659,7 +667,7 @@ def login(usr, pwd):
                     message = "Please verify your email address before logging in. Please contact support for assistance."
                     
             except Exception as e:
-                frappe.log_error(f"Failed to send verification email during login: {str(e)}")
+                frappe.log_error(f"Failed to send verification email during login: {str(e)}", defer_insert=True)
                 message = "Please verify your email address before logging in. Please contact support for assistance."
             
             frappe.local.response.http_status_code = 403
@@ -678,14 +686,13 @@ def login(usr, pwd):
         
         # Get customer information if exists
         customer = None
-        customer_data = frappe.get_all("Customer", 
-            filters={"user": user_doc.name},
-            fields=["name", "customer_name", "customer_type", "email_id", "mobile_no", "territory"],
-            limit=1
-        )
+        customer_name = get_customer_for_user(user_doc.name)
         
-        if customer_data:
-            customer = customer_data[0]
+        if customer_name:
+            customer = frappe.db.get_value("Customer", customer_name,
+                ["name", "customer_name", "customer_type", "email_id", "mobile_no", "territory"],
+                as_dict=True
+            )
         
         response_data = {
             "success": True,
@@ -716,7 +723,7 @@ def login(usr, pwd):
             "message": "Invalid credentials"
         }
     except Exception as e:
-        frappe.log_error(f"Login error: {str(e)}")
+        frappe.log_error(f"Login error: {str(e)}", defer_insert=True)
         frappe.local.response.http_status_code = 500
         return {
             "success": False,
@@ -744,6 +751,7 @@ def google_login(id_token):
         }
 
 @frappe.whitelist(allow_guest=True)
+@unit_of_work()
 def sign_up(email, full_name, password=None, phone=None):
     """
     Sign up new user, send verification email, and create customer record
@@ -773,67 +781,69 @@ def sign_up(email, full_name, password=None, phone=None):
                 "message": "Password must be at least 6 characters long"
             }
         
-        # Create user (initially unverified)
-        user = frappe.get_doc({
-            "doctype": "User",
-            "email": email,
-            "full_name": full_name,
-            "first_name": full_name.split()[0] if full_name else email,
-            "last_name": full_name.split()[1] if full_name and len(full_name.split()) > 1 else None,
-            "enabled": 1,
-            "user_type": "Website User",
-            "roles": [{"role": "Customer"}],
-            "email_verified": 0,  # Initially unverified
-            "send_welcome_email": 0  # Prevent default welcome email
-        })
-        
-        if password:
-            user.new_password = password
-        
-        if phone:
-            user.phone = phone
-        
-        # Insert user and commit to ensure it exists before setting custom fields
-        user.insert(ignore_permissions=True)
-        frappe.db.commit()
-        
-        # Generate verification token
-        verification_token = generate_verification_token(email)
-        if not verification_token:
-            # Rollback user creation
-            frappe.delete_doc("User", email, ignore_permissions=True)
-            frappe.local.response.http_status_code = 500
-            return {
-                "success": False,
-                "message": "Failed to generate verification token"
-            }
-        
-        # Send verification email
-        email_sent = send_verification_email(email, full_name, verification_token)
-        if not email_sent:
-            # Log but don't fail the signup process
-            print(f"Note: Email not sent to {email} due to configuration. User can still verify manually.")
-        
-        
-        # Create customer record
-        customer = frappe.get_doc({
-            "doctype": "Customer",
-            "customer_name": full_name,
-            "customer_type": "Individual",
-            "customer_group": "Individual",
-            "territory": "All Territories",
-            "email_id": email,
-            "mobile_no": phone,
-            "user": user.name,
-            "is_primary_contact": 1
-        })
-        
-        customer.insert(ignore_permissions=True)
+        # User, token and customer are written in one transaction and committed once
+        try:
+            # Create user (initially unverified)
+            user = frappe.get_doc({
+                "doctype": "User",
+                "email": email,
+                "full_name": full_name,
+                "first_name": full_name.split()[0] if full_name else email,
+                "last_name": full_name.split()[1] if full_name and len(full_name.split()) > 1 else None,
+                "enabled": 1,
+                "user_type": "Website User",
+                "roles": [{"role": "Customer"}],
+                "email_verified": 0,  # Initially unverified
+                "email_verification_sent_at": now_datetime(),
+                "send_welcome_email": 0  # Prevent default welcome email
+            })
+            
+            if password:
+                user.new_password = password
+            
+            if phone:
+                user.phone = phone
+            
+            user.insert(ignore_permissions=True)
+            
+            # Generate verification token
+            issue_token(email, "Email Verification")
+            
+            # Create customer record
+            customer = frappe.get_doc({
+                "doctype": "Customer",
+                "customer_name": full_name,
+                "customer_type": "Individual",
+                "customer_group": "Individual",
+                "territory": "All Territories",
+                "email_id": email,
+                "mobile_no": phone,
+                "user": user.name,
+                "is_primary_contact": 1
+            })
+            
+            customer.insert(ignore_permissions=True)
+            
+            # Verification email is sent by a background job once the commit succeeds
+            frappe.enqueue(
+                "rockettradeline.api.auth.send_sign_up_email",
+                queue="short",
+                enqueue_after_commit=True,
+                email=email,
+                full_name=full_name
+            )
+            
+        except Exception:
+            # Compensate: undo the rows and drop state kept outside the transaction
+            frappe.db.rollback()
+            clear_cached_token(email, "Email Verification")
+            clear_customer_cache(email)
+            raise
         
         return {
             "success": True,
             "message": "Account created successfully! Please check your email to verify your account before logging in.",
-            "email_sent": email_sent,
+            "email_queued": True,
             "user": {
                 "name": user.name,
                 "email": user.email,
@@ -850,13 +860,24 @@ def sign_up(email, full_name, password=None, phone=None):
             }
         }
     except Exception as e:
-        frappe.log_error(f"Sign up error: {str(e)}")
+        frappe.log_error(f"Sign up error: {str(e)}", defer_insert=True)
         frappe.local.response.http_status_code = 500
         return {
             "success": False,
             "message": "An error occurred during registration. Please try again."
         }
 
+def send_sign_up_email(email, full_name):
+    """Background job: send the verification email for a new sign-up"""
+    verification_token = get_active_token(email, "Email Verification")
+    if not verification_token:
+        # Cached token expired or was consumed before the job ran
+        verification_token = generate_verification_token(email)
+    
+    if not verification_token or not send_verification_email(email, full_name, verification_token):
+        # Log but don't fail - the user can request a resend
+        frappe.log_error(f"Verification email not sent to {email}. User can request a resend.", "Sign Up Email")
+
 @frappe.whitelist()
 def logout():
     """
@@ -992,14 +1013,13 @@ def validate_token():
         
         # Get customer information if exists
         customer = None
-        customer_data = frappe.get_all("Customer", 
-            filters={"user": user.name},
-            fields=["name", "customer_name", "customer_type", "email_id", "mobile_no", "territory"],
-            limit=1
-        )
+        customer_name = get_customer_for_user(user.name)
         
-        if customer_data:
-            customer = customer_data[0]
+        if customer_name:
+            customer = frappe.db.get_value("Customer", customer_name,
+                ["name", "customer_name", "customer_type", "email_id", "mobile_no", "territory"],
+                as_dict=True
+            )
         
         response_data = {
             "success": True,
@@ -1027,95 +1047,22 @@ def validate_token():
 
 @frappe.whitelist(allow_guest=True)
 @jwt_required()
-def get_current_user():
+def get_current_user(fields=None, include=None):
     """
-    Get current user details with full customer document including child tables
+    Get current user details with customer information
     Automatically authenticated via JWT decorator
+
+    Supports sparse fieldsets via `fields` and optional sections
+    (customer_children, files, role_profile) via `include`
     """
     try:
         user_name = get_authenticated_user()
         if not user_name:
             frappe.local.response.http_status_code = 401
             return {"success": False, "message": "Authentication required"}
-        user = frappe.get_doc("User", user_name)
-        
-        # Get full customer document with child tables if exists
-        customer = None
-        customer_list = frappe.get_all("Customer", 
-            filters={"email_id": user.name},
-            fields=["name"],
-            limit=1
-        )
-        
-        if customer_list:
-            # Get the complete customer document with all child tables
-            customer_doc = frappe.get_doc("Customer", customer_list[0].name)
-            
-            # Convert to dict to include child tables
-            customer = customer_doc.as_dict()
-            
-            # Ensure the new flags are included with proper defaults
-            customer['is_seller'] = bool(getattr(customer_doc, 'is_seller', 0))
-            customer['has_signed_agreement'] = bool(getattr(customer_doc, 'has_signed_agreement', 0))
-            customer['is_questionnaire_filled'] = bool(getattr(customer_doc, 'is_questionnaire_filled', 0))
-            customer['agreement_signed_date'] = getattr(customer_doc, 'agreement_signed_date', None)
-            customer['questionnaire_filled_date'] = getattr(customer_doc, 'questionnaire_filled_date', None)
-            
-            # Remove system fields that aren't needed in API response
-            system_fields = ['docstatus', 'idx', 'owner', 'modified_by', 'creation', 'modified']
-            for field in system_fields:
-                customer.pop(field, None)
-        
-        # Get user files/attachments
-        user_files = frappe.get_all("File",
-            filters={
-                "owner": user.name
-            },
-            fields=[
-                "name", "file_name", "file_url", "file_size", "file_type",
-                "is_private", "folder", "attached_to_doctype", "attached_to_name",
-                "creation", "modified", "content_hash"
-            ],
-            order_by="creation desc"
-        )
-        
-        # Get role profile information
-        role_profile_name = getattr(user, 'role_profile_name', None)
-        role_profile_data = None
-        
-        if role_profile_name:
-            try:
-                role_profile_doc = frappe.get_doc("Role Profile", role_profile_name)
-                role_profile_data = {
-                    "name": role_profile_doc.name,
-                    "role_profile": role_profile_doc.role_profile,
-                    "roles": [{"role": role.role} for role in role_profile_doc.roles],
-                    "creation": role_profile_doc.creation,
-                    "modified": role_profile_doc.modified
-                }
-            except frappe.DoesNotExistError:
-                role_profile_data = None
-
-        response_data = {
-            "success": True,
-            "user": {
-                "name": user.name,
-                "email": user.email,
-                "full_name": user.full_name,
-                "user_image": user.user_image,
-                "birth_date": user.birth_date,
-                "phone": user.phone,
-                "roles": [role.role for role in user.roles],
-                "role_profile_name": role_profile_name,
-                # "role_profile": role_profile_data,
-                "user_type": user.user_type,
-                "enabled": user.enabled
-            },
-            # "files": user_files
-        }
         
-        if customer:
-            response_data["customer"] = customer
+        response_data = {"success": True}
+        response_data.update(get_profile_data(user_name, fields=fields, include=include))
         
         return response_data
     except Exception as e:
@@ -1167,24 +1114,13 @@ def update_profile(full_name=None, phone=None, user_image=None, gender=None, dat
         user.save(ignore_permissions=True)
         
         # Update customer record if exists
-        # Try different ways to find the customer
-        customer_data = frappe.get_all("Customer", 
-            filters={"email_id": user.email},
-            limit=1
-        )
-        
-        # If not found by email, try by user field
-        if not customer_data:
-            customer_data = frappe.get_all("Customer", 
-                filters={"user": user.name},
-                limit=1
-            )
+        customer_name = get_customer_for_user(user.name)
         
         customer_info = None
         address_info = None
         
-        if customer_data:
-            customer = frappe.get_doc("Customer", customer_data[0].name)
+        if customer_name:
+            customer = frappe.get_doc("Customer", customer_name)
             
             # Update basic customer info
             if full_name:
@@ -1286,24 +1222,15 @@ def update_customer_flags(is_seller=None, has_signed_agreement=None, is_question
         user = frappe.get_doc("User", user_name)
         
         # Find customer record
-        customer_data = frappe.get_all("Customer", 
-            filters={"email_id": user.email},
-            limit=1
-        )
-        
-        if not customer_data:
-            customer_data = frappe.get_all("Customer", 
-                filters={"user": user.name},
-                limit=1
-            )
+        customer_name = get_customer_for_user(user.name)
         
-        if not customer_data:
+        if not customer_name:
             return {
                 "success": False,
                 "message": "Customer record not found"
             }
         
-        customer = frappe.get_doc("Customer", customer_data[0].name)
+        customer = frappe.get_doc("Customer", customer_name)
         
         # Track what was updated
         updated_fields = []
@@ -1371,24 +1298,15 @@ def get_customer_status():
         user = frappe.get_doc("User", user_name)
         
         # Find customer record
-        customer_data = frappe.get_all("Customer", 
-            filters={"email_id": user.email},
-            limit=1
-        )
+        customer_name = get_customer_for_user(user.name)
         
-        if not customer_data:
-            customer_data = frappe.get_all("Customer", 
-                filters={"user": user.name},
-                limit=1
-            )
-        
-        if not customer_data:
+        if not customer_name:
             return {
                 "success": False,
                 "message": "Customer record not found"
             }
         
-        customer = frappe.get_doc("Customer", customer_data[0].name)
+        customer = frappe.get_doc("Customer", customer_name)
         
         return {
             "success": True,
@@ -1558,10 +1476,7 @@ def create_customer_for_user(user_email):
             }
         
         # Check if customer already exists
-        existing_customer = frappe.get_all("Customer", 
-            filters={"user": user_email},
-            limit=1
-        )
+        existing_customer = get_customer_for_user(user_email)
         
         if existing_customer:
             frappe.local.response.http_status_code = 409
@@ -1605,43 +1520,131 @@ def create_customer_for_user(user_email):
             "message": str(e)
         }
 
+USER_DIRECTORY_TOTALS_CACHE_KEY = "rockettradeline:user_directory_totals"
+USER_DIRECTORY_TOTALS_TTL = 300
+
+def encode_user_cursor(creation, name):
+    """Encode a (creation, name) keyset position as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps([str(creation), name]).encode()).decode()
+
+def decode_user_cursor(cursor):
+    """Decode a cursor produced by encode_user_cursor, or None if it is malformed"""
+    try:
+        creation, name = json.loads(base64.urlsafe_b64decode(cstr(cursor).encode()).decode())
+        if creation and name:
+            return str(get_datetime(creation)), cstr(name)
+    except Exception:
+        pass
+    return None
+
+def get_user_directory_totals():
+    """Enabled/disabled and customer/no-customer counts, cached for a few minutes"""
+    totals = frappe.cache().get_value(USER_DIRECTORY_TOTALS_CACHE_KEY)
+    if totals:
+        return totals
+    
+    row = frappe.db.sql("""
+        SELECT
+            COUNT(*) AS total,
+            COALESCE(SUM(u.enabled = 1), 0) AS enabled,
+            COALESCE(SUM(u.enabled = 0), 0) AS disabled,
+            COALESCE(SUM(EXISTS(SELECT 1 FROM `tabCustomer` c WHERE c.user = u.name)), 0) AS with_customer
+        FROM `tabUser` u
+    """, as_dict=True)[0]
+    
+    totals = {
+        "total": cint(row.total),
+        "enabled": cint(row.enabled),
+        "disabled": cint(row.disabled),
+        "with_customer": cint(row.with_customer),
+        "without_customer": cint(row.total) - cint(row.with_customer)
+    }
+    frappe.cache().set_value(USER_DIRECTORY_TOTALS_CACHE_KEY, totals, expires_in_sec=USER_DIRECTORY_TOTALS_TTL)
+    return totals
+
 @frappe.whitelist(allow_guest=True)
 @jwt_required()
 @require_roles("System Manager", "Administrator")
-def get_users(limit=20, start=0, search=None):
+def get_users(limit=20, start=0, search=None, cursor=None):
     """
     Get list of users with customer information (Admin only)
     Requires System Manager or Administrator role
+
+    Pages with a keyset cursor on (creation, name): pass next_cursor from the
+    previous response as cursor. search is an email prefix match.
     """
     try:
-        filters = {}
-        if search:
-            filters["email"] = ["like", f"%{search}%"]
-        
-        users = frappe.get_all("User", 
-            filters=filters,
-            fields=["name", "email", "full_name", "enabled", "user_type", "creation", "phone"],
-            limit=limit,
-            start=start,
-            order_by="creation desc"
-        )
+        limit = min(cint(limit) or 20, 500)
+        conditions = ["1=1"]
+        values = {"limit": limit + 1}
         
-        # Add customer information for each user
-        for user in users:
-            customer_data = frappe.get_all("Customer", 
-                filters={"user": user.name},
-                fields=["name", "customer_name", "customer_type", "email_id", "mobile_no"],
-                limit=1
-            )
-            
-            if customer_data:
-                user["customer"] = customer_data[0]
-            else:
-                user["customer"] = None
+        if search:
+            # Prefix match so the unique index on email can be used
+            conditions.append("u.email LIKE %(search)s")
+            escaped = cstr(search).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            values["search"] = f"{escaped}%"
+        
+        offset = ""
+        if cursor:
+            position = decode_user_cursor(cursor)
+            if not position:
+                frappe.local.response.http_status_code = 400
+                return {
+                    "success": False,
+                    "message": "Invalid cursor"
+                }
+            values["cursor_creation"], values["cursor_name"] = position
+            conditions.append("""(u.creation < %(cursor_creation)s
+                OR (u.creation = %(cursor_creation)s AND u.name < %(cursor_name)s))""")
+        elif cint(start):
+            # Legacy offset paging, kept for older clients
+            offset = "OFFSET %(start)s"
+            values["start"] = cint(start)
+        
+        rows = frappe.db.sql(f"""
+            SELECT
+                u.name, u.email, u.full_name, u.enabled, u.user_type, u.creation, u.phone,
+                c.name AS customer, c.customer_name, c.customer_type,
+                c.email_id AS customer_email_id, c.mobile_no AS customer_mobile_no
+            FROM `tabUser` u
+            LEFT JOIN (
+                -- One customer per user, so a user linked twice is not listed twice
+                SELECT user, MIN(name) AS name FROM `tabCustomer`
+                WHERE user IS NOT NULL GROUP BY user
+            ) first_customer ON first_customer.user = u.name
+            LEFT JOIN `tabCustomer` c ON c.name = first_customer.name
+            WHERE {" AND ".join(conditions)}
+            ORDER BY u.creation DESC, u.name DESC
+            LIMIT %(limit)s {offset}
+        """, values, as_dict=True)
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        users = []
+        for row in rows:
+            users.append({
+                "name": row.name,
+                "email": row.email,
+                "full_name": row.full_name,
+                "enabled": row.enabled,
+                "user_type": row.user_type,
+                "creation": row.creation,
+                "phone": row.phone,
+                "customer": {
+                    "name": row.customer,
+                    "customer_name": row.customer_name,
+                    "customer_type": row.customer_type,
+                    "email_id": row.customer_email_id,
+                    "mobile_no": row.customer_mobile_no
+                } if row.customer else None
+            })
         
         return {
             "success": True,
-            "users": users
+            "users": users,
+            "next_cursor": encode_user_cursor(rows[-1].creation, rows[-1].name) if has_more else None,
+            "totals": get_user_directory_totals()
         }
     except Exception as e:
         frappe.local.response.http_status_code = 500
@@ -1883,6 +1886,7 @@ def optional_auth_endpoint():
 # Email Verification Endpoints
 
 @frappe.whitelist(allow_guest=True)
+@unit_of_work()
 def verify_email(token):
     """Verify email address using verification token"""
     try:
@@ -1906,13 +1910,11 @@ def verify_email(token):
             frappe.respond_as_web_page("Invalid Verification Link - Rocket Tradeline", error_message, success=False)
             return
         
-        # Find user with this verification token
-        users = frappe.get_all("User", 
-            filters={"email_verification_token": token},
-            fields=["name", "email", "email_verification_sent_at"]
-        )
+        # Find user with this verification token (single indexed lookup on the digest),
+        # locked until commit so concurrent clicks on the link verify only once
+        user_name, token_status = resolve_token(token, "Email Verification", for_update=True)
         
-        if not users:
+        if token_status == "invalid":
             frappe.local.response.http_status_code = 400
             error_message = f"""
             <div style="text-align: center; padding: 20px;">
@@ -1932,36 +1934,33 @@ def verify_email(token):
             frappe.respond_as_web_page("Invalid Verification Token - Rocket Tradeline", error_message, success=False)
             return
         
-        user_data = users[0]
-        user_doc = frappe.get_doc("User", user_data.name)
-        
-        # Check if token has expired (24 hours from sent_at)
-        if user_data.email_verification_sent_at:
-            expiry_time = user_data.email_verification_sent_at + timedelta(hours=24)
-            if now_datetime() > expiry_time:
-                frappe.local.response.http_status_code = 400
-                expired_message = f"""
-                <div style="text-align: center; padding: 20px;">
-                    <div style="margin-bottom: 30px;">
-                        <img src="{frappe.utils.get_url()}/assets/rockettradeline/images/logo.png" alt="Rocket Tradeline" style="max-height: 60px; max-width: 200px;" />
-                    </div>
-                    <div style="width: 60px; height: 60px; background-color: #f59e0b; border-radius: 50%; display: flex; align-items: center; justify-content: center; margin: 0 auto 20px;">
-                        <span style="color: white; font-size: 30px; font-weight: bold;">⚠</span>
-                    </div>
-                    <h1 style="color: #1f2937; font-size: 24px; margin-bottom: 15px;">Verification Link Expired</h1>
-                    <p style="color: #6b7280; font-size: 16px; line-height: 1.6; margin-bottom: 30px;">
-                        This verification link has expired. For security reasons, verification links are only valid for 24 hours. Please sign up again or contact support for assistance.
-                    </p>
-                    <a href="https://staging.rockettradeline.com" style="background-color: #17B26A; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; font-weight: 600; font-size: 16px; display: inline-block;">Go to Homepage</a>
+        # Expiry is enforced by the token store
+        if token_status == "expired":
+            frappe.local.response.http_status_code = 400
+            expired_message = f"""
+            <div style="text-align: center; padding: 20px;">
+                <div style="margin-bottom: 30px;">
+                    <img src="{frappe.utils.get_url()}/assets/rockettradeline/images/logo.png" alt="Rocket Tradeline" style="max-height: 60px; max-width: 200px;" />
                 </div>
-                """
-                frappe.respond_as_web_page("Verification Link Expired - Rocket Tradeline", expired_message, success=False)
-                return
+                <div style="width: 60px; height: 60px; background-color: #f59e0b; border-radius: 50%; display: flex; align-items: center; justify-content: center; margin: 0 auto 20px;">
+                    <span style="color: white; font-size: 30px; font-weight: bold;">⚠</span>
+                </div>
+                <h1 style="color: #1f2937; font-size: 24px; margin-bottom: 15px;">Verification Link Expired</h1>
+                <p style="color: #6b7280; font-size: 16px; line-height: 1.6; margin-bottom: 30px;">
+                    This verification link has expired. For security reasons, verification links are only valid for 24 hours. Please sign up again or contact support for assistance.
+                </p>
+                <a href="https://staging.rockettradeline.com" style="background-color: #17B26A; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; font-weight: 600; font-size: 16px; display: inline-block;">Go to Homepage</a>
+            </div>
+            """
+            frappe.respond_as_web_page("Verification Link Expired - Rocket Tradeline", expired_message, success=False)
+            return
         
         # Mark email as verified
-        user_doc.db_set("email_verified", 1, commit=True)
-        user_doc.db_set("email_verification_token", None, commit=True)
-        user_doc.db_set("email_verified_at", now_datetime(), commit=True)
+        frappe.db.set_value("User", user_name, {
+            "email_verified": 1,
+            "email_verified_at": now_datetime()
+        })
+        consume_token(token, "Email Verification")
         
         # Return HTML success page with login redirect
         success_message = f"""
@@ -1984,7 +1983,7 @@ def verify_email(token):
         return
         
     except Exception as e:
-        frappe.log_error(f"Email verification error: {str(e)}")
+        frappe.log_error(f"Email verification error: {str(e)}", defer_insert=True)
         frappe.local.response.http_status_code = 500
         error_message = f"""
         <div style="text-align: center; padding: 20px;">
@@ -2005,6 +2004,7 @@ def verify_email(token):
         return
 
 @frappe.whitelist(allow_guest=True)
+@unit_of_work()
 def resend_verification_email(email):
     """Resend verification email"""
     try:
@@ -2033,8 +2033,8 @@ def resend_verification_email(email):
                 "message": "Email is already verified"
             }
         
-        # Generate new verification token
-        verification_token = generate_verification_token(email)
+        # Reuse the unexpired token if one was already sent
+        verification_token = generate_verification_token(email, reuse=True)
         if not verification_token:
             frappe.local.response.http_status_code = 500
             return {
@@ -2052,7 +2052,7 @@ def resend_verification_email(email):
         }
         
     except Exception as e:
-        frappe.log_error(f"Resend verification email error: {str(e)}")
+        frappe.log_error(f"Resend verification email error: {str(e)}", defer_insert=True)
         frappe.local.response.http_status_code = 500
         return {
             "success": False,
@@ -2077,7 +2077,7 @@ def get_verification_token_for_testing(email):
             }
             
         # Get verification token
-        token = frappe.db.get_value("User", email, "email_verification_token")
+        token = get_active_token(email, "Email Verification")
         sent_at = frappe.db.get_value("User", email, "email_verification_sent_at")
         
         if not token:
@@ -2107,7 +2107,7 @@ def get_verification_token_for_testing(email):
         }
 
 @frappe.whitelist(allow_guest=True)
-def get_profile():
+def get_profile(fields=None, include=None):
     """
     Get user profile information - JWT protected endpoint
     Manual JWT validation without decorator to bypass Frappe auth issues
@@ -2146,65 +2146,8 @@ def get_profile():
                 "message": "Invalid token payload"
             }
         
-        # Get user document
-        user = frappe.get_doc("User", user_email)
-        
-        # Get full customer document with child tables if exists
-        customer = None
-        customer_list = frappe.get_all("Customer", 
-            filters={"user": user.name},
-            fields=["name"],
-            limit=1
-        )
-        
-        if customer_list:
-            # Get the complete customer document with all child tables
-            customer_doc = frappe.get_doc("Customer", customer_list[0].name)
-            
-            # Convert to dict to include child tables
-            customer = customer_doc.as_dict()
-            
-            # Remove system fields that aren't needed in API response
-            system_fields = ['docstatus', 'idx', 'owner', 'modified_by', 'creation', 'modified']
-            for field in system_fields:
-                customer.pop(field, None)
-        
-        # Get role profile information
-        role_profile_name = getattr(user, 'role_profile_name', None)
-        role_profile_data = None
-        
-        if role_profile_name:
-            try:
-                role_profile_doc = frappe.get_doc("Role Profile", role_profile_name)
-                role_profile_data = {
-                    "name": role_profile_doc.name,
-                    "role_profile": role_profile_doc.role_profile,
-                    "roles": [{"role": role.role} for role in role_profile_doc.roles],
-                    "creation": role_profile_doc.creation,
-                    "modified": role_profile_doc.modified
-                }
-            except frappe.DoesNotExistError:
-                role_profile_data = None
-
-        response_data = {
-            "success": True,
-            "user": {
-                "name": user.name,
-                "email": user.email,
-                "full_name": user.full_name,
-                "user_image": user.user_image,
-                "phone": user.phone,
-                "roles": [role.role for role in user.roles],
-                "role_profile_name": role_profile_name,
-                "role_profile": role_profile_data,
-                "user_type": user.user_type,
-                "enabled": user.enabled,
-                "creation": user.creation.strftime("%Y-%m-%d %H:%M:%S") if user.creation else None
-            }
-        }
-        
-        if customer:
-            response_data["customer"] = customer
+        response_data = {"success": True}
+        response_data.update(get_profile_data(user_email, fields=fields, include=include or "role_profile"))
         
         return response_data
     except Exception as e:
@@ -2307,6 +2250,7 @@ def test_customer_data(user_email="philmaxsnr@gmail.com"):
         }
 
 @frappe.whitelist(allow_guest=True)
+@unit_of_work()
 def test_send_verification_email_simple(email):
     """Simple test of send_verification_email function - FOR TESTING ONLY"""
     try:
@@ -2327,11 +2271,7 @@ def test_send_verification_email_simple(email):
         user_doc = frappe.get_doc("User", email)
         
         # Use existing token or generate new one
-        existing_token = frappe.db.get_value("User", email, "email_verification_token")
-        if existing_token:
-            test_token = existing_token
-        else:
-            test_token = generate_verification_token(email)
+        test_token = generate_verification_token(email, reuse=True)
         
         if not test_token:
             return {
@@ -1,4 +1,8 @@
 from .auth import jwt_required, get_current_user
+from .transaction import unit_of_work
+from rockettradeline.rockettradeline.doctype.verification_token.verification_token import (
+    issue_token, resolve_token, consume_token
+)
 import frappe
 from frappe import _
 import json
@@ -101,6 +105,7 @@ def google_oauth_login(credential):
         }
 
 @frappe.whitelist(allow_guest=True)
+@unit_of_work()
 def forgot_password(email):
     """
     Send password reset email
@@ -120,14 +125,8 @@ def forgot_password(email):
                 "message": "Account is disabled"
             }
         
-        # Generate password reset token
-        from frappe.utils import random_string
-        reset_token = random_string(32)
-        
-        # Save reset token (you'd need to add this field to User doctype)
-        user.reset_password_token = reset_token
-        user.reset_password_expires = frappe.utils.add_to_date(frappe.utils.now(), hours=24)
-        user.save(ignore_permissions=True)
+        # Generate password reset token (only its digest is stored)
+        reset_token = issue_token(email, "Password Reset")
         
         # Send reset email
         reset_link = f"{frappe.utils.get_url()}/reset-password?token={reset_token}"
@@ -160,26 +159,19 @@ def reset_password(token, new_password):
     Reset password using token
     """
     try:
-        user = frappe.get_all("User", 
-            filters={
-                "reset_password_token": token,
-                "reset_password_expires": [">", frappe.utils.now()],
-                "enabled": 1
-            },
-            limit=1
-        )
+        # Locked until commit, so the same link cannot reset the password twice concurrently
+        user_name, token_status = resolve_token(token, "Password Reset", for_update=True)
         
-        if not user:
+        if token_status != "valid" or not frappe.db.get_value("User", user_name, "enabled"):
             return {
                 "success": False,
                 "message": "Invalid or expired token"
             }
         
-        user_doc = frappe.get_doc("User", user[0].name)
+        user_doc = frappe.get_doc("User", user_name)
         user_doc.new_password = new_password
-        user_doc.reset_password_token = ""
-        user_doc.reset_password_expires = ""
         user_doc.save(ignore_permissions=True)
+        consume_token(token, "Password Reset")
         
         return {
             "success": True,
@@ -7,6 +7,10 @@ from frappe import _
 from frappe.utils import cint, flt, now, add_days, now_datetime, get_datetime
 import json
 from rockettradeline.api.auth import jwt_required, get_current_user, get_authenticated_user
+from rockettradeline.api.utils import get_customer_for_user
+from rockettradeline.api.idempotency import idempotent
+from rockettradeline.api.transaction import unit_of_work
+from rockettradeline.rockettradeline.doctype.tradeline_cart.tradeline_cart import get_active_cart
 
 def is_administrator(user):
     """Check if user has Administrator role or profile"""
@@ -31,11 +35,7 @@ def create_cart():
             return {'success': False, 'error': 'Authentication required'}
         
         # Check if user already has an active cart
-        existing_cart = frappe.db.get_value(
-            'Tradeline Cart',
-            {'user_id': current_user, 'status': 'Active'},
-            'name'
-        )
+        existing_cart = get_active_cart(current_user)
         
         if existing_cart:
             cart = frappe.get_doc('Tradeline Cart', existing_cart)
@@ -47,7 +47,7 @@ def create_cart():
             }
         
         # Get customer for user
-        customer = frappe.db.get_value('Customer', {'email_id': current_user}, 'name')
+        customer = get_customer_for_user(current_user)
         
         # Create new cart
         cart = frappe.get_doc({
@@ -87,11 +87,7 @@ def get_cart(cart_id=None):
                 return {'success': False, 'error': 'Access denied'}
         else:
             # Get active cart
-            cart_name = frappe.db.get_value(
-                'Tradeline Cart',
-                {'user_id': current_user, 'status': 'Active'},
-                'name'
-            )
+            cart_name = get_active_cart(current_user)
             
             if not cart_name:
                 return {'success': False, 'error': 'No active cart found', 'user': current_user}
@@ -101,10 +97,19 @@ def get_cart(cart_id=None):
         # Get detailed cart info with items
         cart_data = cart.as_dict()
         
-        # Add item details
+        # Add item details (one query for all items)
+        tradeline_ids = list({item['tradeline'] for item in cart_data.get('items', []) if item.get('tradeline')})
+        tradelines = {
+            t.name: t for t in frappe.get_all(
+                'Tradeline',
+                filters={'name': ['in', tradeline_ids]},
+                fields=['name', 'bank', 'age_year', 'age_month', 'credit_limit', 'max_spots', 'status']
+            )
+        } if tradeline_ids else {}
+        
         for item in cart_data.get('items', []):
-            if item.get('tradeline'):
-                tradeline = frappe.get_doc('Tradeline', item['tradeline'])
+            tradeline = tradelines.get(item.get('tradeline'))
+            if tradeline:
                 item['tradeline_details'] = {
                     'bank': tradeline.bank,
                     'age_year': tradeline.age_year,
@@ -134,6 +139,8 @@ def get_cart(cart_id=None):
 
 @frappe.whitelist(allow_guest=True)
 @jwt_required()
+@idempotent()
+@unit_of_work()
 def add_to_cart(tradeline_id, quantity=1, cart_id=None):
     """Add item to cart or update quantity if exists"""
     try:
@@ -160,17 +167,13 @@ def add_to_cart(tradeline_id, quantity=1, cart_id=None):
                 return {'success': False, 'error': 'Access denied'}
         else:
             # Get active cart or create new one
-            cart_name = frappe.db.get_value(
-                'Tradeline Cart',
-                {'user_id': current_user, 'status': 'Active'},
-                'name'
-            )
+            cart_name = get_active_cart(current_user)
             
             if cart_name:
                 cart = frappe.get_doc('Tradeline Cart', cart_name)
             else:
                 # Create new cart
-                customer = frappe.db.get_value('Customer', {'email_id': current_user}, 'name')
+                customer = get_customer_for_user(current_user)
                 cart = frappe.get_doc({
                     'doctype': 'Tradeline Cart',
                     'user_id': current_user,
@@ -219,7 +222,7 @@ def add_to_cart(tradeline_id, quantity=1, cart_id=None):
         }
         
     except Exception as e:
-        frappe.log_error(f"Add to cart error: {str(e)}", "Cart API Error")
+        frappe.log_error(f"Add to cart error: {str(e)}", "Cart API Error", defer_insert=True)
         return {'success': False, 'error': str(e)}
 
 @frappe.whitelist(allow_guest=True)
@@ -237,11 +240,7 @@ def remove_from_cart(tradeline_id, cart_id=None):
             if not verify_cart_access(cart, current_user):
                 return {'success': False, 'error': 'Access denied'}
         else:
-            cart_name = frappe.db.get_value(
-                'Tradeline Cart',
-                {'user_id': current_user, 'status': 'Active'},
-                'name'
-            )
+            cart_name = get_active_cart(current_user)
             if not cart_name:
                 return {'success': False, 'error': 'No active cart found'}
             cart = frappe.get_doc('Tradeline Cart', cart_name)
@@ -295,11 +294,7 @@ def update_cart_item(tradeline_id, quantity, cart_id=None):
             if not verify_cart_access(cart, current_user):
                 return {'success': False, 'error': 'Access denied'}
         else:
-            cart_name = frappe.db.get_value(
-                'Tradeline Cart',
-                {'user_id': current_user, 'status': 'Active'},
-                'name'
-            )
+            cart_name = get_active_cart(current_user)
             if not cart_name:
                 return {'success': False, 'error': 'No active cart found'}
             cart = frappe.get_doc('Tradeline Cart', cart_name)
@@ -353,11 +348,7 @@ def clear_cart(cart_id=None):
             if not verify_cart_access(cart, current_user):
                 return {'success': False, 'error': 'Access denied'}
         else:
-            cart_name = frappe.db.get_value(
-                'Tradeline Cart',
-                {'user_id': current_user, 'status': 'Active'},
-                'name'
-            )
+            cart_name = get_active_cart(current_user)
             if not cart_name:
                 return {'success': False, 'error': 'No active cart found'}
             cart = frappe.get_doc('Tradeline Cart', cart_name)
@@ -395,11 +386,7 @@ def update_payment_mode(payment_mode, cart_id=None):
             if not verify_cart_access(cart, current_user):
                 return {'success': False, 'error': 'Access denied'}
         else:
-            cart_name = frappe.db.get_value(
-                'Tradeline Cart',
-                {'user_id': current_user, 'status': 'Active'},
-                'name'
-            )
+            cart_name = get_active_cart(current_user)
             if not cart_name:
                 return {'success': False, 'error': 'No active cart found'}
             cart = frappe.get_doc('Tradeline Cart', cart_name)
@@ -437,11 +424,7 @@ def apply_discount(discount_type, discount_value, cart_id=None):
             if not verify_cart_access(cart, current_user):
                 return {'success': False, 'error': 'Access denied'}
         else:
-            cart_name = frappe.db.get_value(
-                'Tradeline Cart',
-                {'user_id': current_user, 'status': 'Active'},
-                'name'
-            )
+            cart_name = get_active_cart(current_user)
             if not cart_name:
                 return {'success': False, 'error': 'No active cart found'}
             cart = frappe.get_doc('Tradeline Cart', cart_name)
@@ -483,11 +466,7 @@ def checkout_cart(cart_id=None):
             if not verify_cart_access(cart, current_user):
                 return {'success': False, 'error': 'Access denied'}
         else:
-            cart_name = frappe.db.get_value(
-                'Tradeline Cart',
-                {'user_id': current_user, 'status': 'Active'},
-                'name'
-            )
+            cart_name = get_active_cart(current_user)
             if not cart_name:
                 return {'success': False, 'error': 'No active cart found'}
             cart = frappe.get_doc('Tradeline Cart', cart_name)
@@ -599,6 +578,8 @@ def get_payment_methods():
 
 @frappe.whitelist(allow_guest=True)
 @jwt_required()
+@idempotent()
+@unit_of_work()
 def create_payment_request(payment_method, cart_id=None, **kwargs):
     """Create payment request for cart"""
     try:
@@ -612,11 +593,7 @@ def create_payment_request(payment_method, cart_id=None, **kwargs):
             if not verify_cart_access(cart, current_user):
                 return {'success': False, 'error': 'Access denied'}
         else:
-            cart_name = frappe.db.get_value(
-                'Tradeline Cart',
-                {'user_id': current_user, 'status': 'Active'},
-                'name'
-            )
+            cart_name = get_active_cart(current_user)
             if not cart_name:
                 return {'success': False, 'error': 'No active cart found'}
             cart = frappe.get_doc('Tradeline Cart', cart_name)
@@ -631,7 +608,7 @@ def create_payment_request(payment_method, cart_id=None, **kwargs):
         return payment_result
         
     except Exception as e:
-        frappe.log_error(f"Create payment request error: {str(e)}", "Cart API Error")
+        frappe.log_error(f"Create payment request error: {str(e)}", "Cart API Error", defer_insert=True)
         return {'success': False, 'error': str(e)}
 
 @frappe.whitelist(allow_guest=True)
@@ -646,6 +623,27 @@ def calculate_payment_fees(amount, payment_method):
         frappe.log_error(f"Calculate payment fees error: {str(e)}", "Cart API Error")
         return {'success': False, 'error': str(e)}
 
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def get_checkout_quote(cart_id=None):
+    """Compare fees and eligibility of every payment method for the cart"""
+    try:
+        current_user = get_authenticated_user()
+        if not current_user:
+            return {'success': False, 'error': 'Authentication required'}
+
+        if not cart_id:
+            cart_id = get_active_cart(current_user)
+            if not cart_id:
+                return {'success': False, 'error': 'No active cart found'}
+
+        from rockettradeline.api.payment import get_checkout_quote
+        return get_checkout_quote(cart_id)
+
+    except Exception as e:
+        frappe.log_error(f"Get checkout quote error: {str(e)}", "Cart API Error")
+        return {'success': False, 'error': str(e)}
+
 @frappe.whitelist(allow_guest=True)
 @jwt_required()
 def process_cart_payment(payment_request_id, **payment_data):
@@ -677,9 +675,9 @@ def get_cart_payment_status(cart_id=None):
             if not verify_cart_access(cart, current_user):
                 return {'success': False, 'error': 'Access denied'}
         else:
-            cart_name = frappe.db.get_value(
+            cart_name = get_active_cart(current_user) or frappe.db.get_value(
                 'Tradeline Cart',
-                {'user_id': current_user, 'status': ['in', ['Active', 'Payment Pending', 'Checked Out']]},
+                {'user_id': current_user, 'status': ['in', ['Payment Pending', 'Checked Out']]},
                 'name'
             )
             if not cart_name:
@@ -694,11 +692,15 @@ def get_cart_payment_status(cart_id=None):
             order_by='creation desc'
         )
         
+        from rockettradeline.api.payment_events import get_event_cursor
+
         return {
             'success': True,
             'cart_status': cart.status,
             'payment_requests': payment_requests,
-            'has_pending_payment': any(req['status'] == 'Pending' for req in payment_requests)
+            'has_pending_payment': any(req['status'] == 'Pending' for req in payment_requests),
+            # Listen for `payment_status` and resume with payment_events.get_payment_events(since=...)
+            'events_cursor': get_event_cursor(current_user)
         }
         
     except Exception as e:
@@ -724,11 +726,7 @@ def extend_cart_expiry(days=30, cart_id=None):
             if not verify_cart_access(cart, current_user):
                 return {'success': False, 'error': 'Access denied'}
         else:
-            cart_name = frappe.db.get_value(
-                'Tradeline Cart',
-                {'user_id': current_user, 'status': 'Active'},
-                'name'
-            )
+            cart_name = get_active_cart(current_user)
             if not cart_name:
                 return {'success': False, 'error': 'No active cart found'}
             cart = frappe.get_doc('Tradeline Cart', cart_name)
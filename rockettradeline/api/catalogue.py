@@ -0,0 +1,245 @@
+"""
+RocketTradeline Catalogue Search
+Faceted tradeline search over an in-memory columnar snapshot
+
+Active tradelines are loaded (one query) into NumPy column arrays. The snapshot
+is shared through Redis and kept in process memory, keyed by a version that
+Tradeline / Tradeline Bank doc_events bump. Range filters, sorting, facet counts
+and pagination are vectorized array operations, so a search runs no SQL.
+"""
+
+import calendar
+import json
+
+import frappe
+import numpy as np
+from frappe.utils import cint, flt, getdate, today
+
+SNAPSHOT_KEY = "rockettradeline:catalogue:snapshot"
+SNAPSHOT_VERSION_KEY = "rockettradeline:catalogue:version"
+MAX_PAGE_LENGTH = 100
+
+# In-process copy of the snapshot, valid while its version matches Redis
+_local_snapshot = {"version": None, "columns": None}
+
+# Range filters: filter name prefix -> snapshot column
+RANGE_FILTERS = {
+    "price": "price",
+    "credit_limit": "credit_limit",
+    "age": "age_months",
+    "utilization": "utilization",
+}
+
+SORTS = {
+    "newest": ("creation", True),
+    "cheapest": ("price", False),
+    "oldest": ("age_months", True),
+    "highest_limit": ("credit_limit", True),
+    "soonest_closing": ("days_to_closing", False),
+}
+
+PRICE_BUCKETS = [0, 250, 500, 1000, 2000, 5000]
+AGE_BUCKETS_YEARS = [0, 2, 5, 10, 15, 20]
+
+def build_snapshot():
+    rows = frappe.db.sql("""
+        SELECT t.name, t.bank, b.bank_name, t.age_year, t.age_month, t.credit_limit, t.price,
+            t.max_spots, t.remaining_spots, t.closing_date, t.credit_utilization_rate, t.status,
+            UNIX_TIMESTAMP(t.creation) AS creation
+        FROM `tabTradeline` t
+        LEFT JOIN `tabTradeline Bank` b ON b.name = t.bank
+        WHERE t.status = 'Active'
+    """, as_dict=True)
+
+    def column(field, dtype, convert):
+        return np.array([convert(row[field]) for row in rows], dtype=dtype)
+
+    columns = {
+        "name": column("name", object, str),
+        "bank": column("bank", object, lambda v: v or ""),
+        "bank_name": column("bank_name", object, lambda v: v or ""),
+        "age_year": column("age_year", np.int32, cint),
+        "age_month": column("age_month", np.int32, cint),
+        "credit_limit": column("credit_limit", np.float64, flt),
+        "price": column("price", np.float64, flt),
+        "max_spots": column("max_spots", np.int32, cint),
+        "remaining_spots": column("remaining_spots", np.int32, cint),
+        "closing_date": column("closing_date", np.int32, cint),
+        "utilization": column("credit_utilization_rate", np.float64, flt),
+        "creation": column("creation", np.float64, flt),
+        "status": column("status", object, str),
+    }
+    columns["age_months"] = columns["age_year"] * 12 + columns["age_month"]
+    # Lowercased "bank id + bank name" for text search
+    columns["search_text"] = np.array(
+        [f"{bank} {bank_name}".lower() for bank, bank_name in zip(columns["bank"], columns["bank_name"])],
+        dtype=str
+    ) if rows else np.array([], dtype=str)
+    return columns
+
+
+def get_snapshot():
+    """Columnar snapshot of active tradelines, from process memory, then Redis, then the DB"""
+    cache = frappe.cache()
+    version = cache.get_value(SNAPSHOT_VERSION_KEY)
+    if version is None:
+        version = frappe.generate_hash(length=10)
+        cache.set_value(SNAPSHOT_VERSION_KEY, version)
+
+    if _local_snapshot["version"] == version and _local_snapshot["columns"] is not None:
+        return _local_snapshot["columns"]
+
+    snapshot = cache.get_value(SNAPSHOT_KEY)
+    if not snapshot or snapshot.get("version") != version:
+        snapshot = {"version": version, "columns": build_snapshot()}
+        cache.set_value(SNAPSHOT_KEY, snapshot)
+
+    _local_snapshot.update(snapshot)
+    return snapshot["columns"]
+
+
+def get_snapshot_version():
+    return _local_snapshot["version"]
+
+
+def invalidate_catalogue(doc=None, method=None):
+    """Tradeline / Tradeline Bank doc_events hook; also call after bulk writes"""
+    frappe.cache().set_value(SNAPSHOT_VERSION_KEY, frappe.generate_hash(length=10))
+    frappe.cache().delete_value(SNAPSHOT_KEY)
+    _local_snapshot.update({"version": None, "columns": None})
+    if doc is not None:
+        # Re-bump after commit so a concurrent rebuild cannot cache pre-commit rows
+        frappe.db.after_commit.add(invalidate_catalogue)
+
+
+def days_to_closing(closing_day, on_date=None):
+    """Days from on_date until each statement closing day-of-month"""
+    on_date = getdate(on_date or today())
+    days_in_month = calendar.monthrange(on_date.year, on_date.month)[1]
+    closing_day = np.clip(closing_day, 1, days_in_month)
+    return np.where(closing_day >= on_date.day, closing_day - on_date.day, closing_day + days_in_month - on_date.day)
+
+
+def filter_mask(columns, filters, search=None):
+    mask = np.ones(len(columns["name"]), dtype=bool)
+
+    for prefix, column in RANGE_FILTERS.items():
+        values = columns[column]
+        scale = 12 if prefix == "age" else 1
+        low, high = filters.get(f"min_{prefix}"), filters.get(f"max_{prefix}")
+        if low not in (None, ""):
+            mask &= values >= flt(low) * scale
+        if high not in (None, ""):
+            mask &= values <= flt(high) * scale
+
+    banks = filters.get("bank")
+    if banks:
+        mask &= np.isin(columns["bank"], banks if isinstance(banks, list) else [banks])
+
+    if cint(filters.get("available_only")):
+        mask &= columns["remaining_spots"] > 0
+
+    if search:
+        mask &= np.char.find(columns["search_text"], search.strip().lower()) >= 0
+
+    return mask
+
+
+def facet_counts(columns, mask):
+    banks, counts = np.unique(columns["bank"][mask], return_counts=True)
+    bank_names = dict(zip(columns["bank"], columns["bank_name"]))
+
+    def bucketed(values, edges, label):
+        index = np.digitize(values, edges[1:], right=False)
+        counts = np.bincount(index, minlength=len(edges))
+        buckets = []
+        for i, count in enumerate(counts[:len(edges)]):
+            low = edges[i]
+            high = edges[i + 1] if i + 1 < len(edges) else None
+            buckets.append({"label": label(low, high), "min": low, "max": high, "count": int(count)})
+        return buckets
+
+    return {
+        "bank": sorted(
+            ({"bank": bank, "bank_name": bank_names.get(bank), "count": int(count)} for bank, count in zip(banks, counts) if bank),
+            key=lambda f: -f["count"]
+        ),
+        "price": bucketed(columns["price"][mask], PRICE_BUCKETS,
+            lambda low, high: f"${low}-${high}" if high else f"${low}+"),
+        "age": bucketed(columns["age_months"][mask] / 12, AGE_BUCKETS_YEARS,
+            lambda low, high: f"{low}-{high} years" if high else f"{low}+ years"),
+    }
+
+
+def snapshot_row(columns, i):
+    """Tradeline dict for snapshot row i, shaped like get_tradelines results"""
+    return {
+        "name": columns["name"][i],
+        "bank": columns["bank"][i] or None,
+        "bank_name": columns["bank_name"][i] or None,
+        "age_year": int(columns["age_year"][i]),
+        "age_month": int(columns["age_month"][i]),
+        "credit_limit": float(columns["credit_limit"][i]),
+        "price": float(columns["price"][i]),
+        "max_spots": int(columns["max_spots"][i]),
+        "remaining_spots": int(columns["remaining_spots"][i]),
+        "closing_date": int(columns["closing_date"][i]),
+        "credit_utilization_rate": float(columns["utilization"][i]),
+        "status": columns["status"][i],
+    }
+
+
+def search_catalogue(filters=None, sort="newest", limit=20, start=0, search=None, with_facets=True):
+    """Filter, sort, facet and page the snapshot; returns plain dicts"""
+    filters = filters or {}
+    if sort not in SORTS:
+        frappe.throw(f"sort must be one of: {', '.join(SORTS)}")
+
+    columns = get_snapshot()
+    mask = filter_mask(columns, filters, search)
+    indices = np.flatnonzero(mask)
+
+    column, descending = SORTS[sort]
+    values = days_to_closing(columns["closing_date"]) if column == "days_to_closing" else columns[column]
+    keys = values[indices]
+    # Stable sort, newest first among ties
+    order = np.lexsort((-columns["creation"][indices], -keys if descending else keys))
+    indices = indices[order]
+
+    start, limit = max(cint(start), 0), min(max(cint(limit), 1), MAX_PAGE_LENGTH)
+    page = indices[start:start + limit]
+
+    tradelines = [snapshot_row(columns, i) for i in page]
+
+    result = {
+        "tradelines": tradelines,
+        "total": int(len(indices)),
+        "start": start,
+        "limit": limit,
+        "sort": sort,
+    }
+    if with_facets:
+        result["facets"] = facet_counts(columns, mask)
+    return result
+
+
+@frappe.whitelist(allow_guest=True)
+def search_tradelines(filters=None, sort="newest", limit=20, start=0, search=None, facets=1):
+    """
+    Faceted tradeline search
+    filters: min_/max_ price, credit_limit, age (years), utilization; bank (id or list); available_only
+    sort: newest, cheapest, oldest, highest_limit, soonest_closing
+    """
+    try:
+        if isinstance(filters, str):
+            filters = json.loads(filters) if filters else {}
+
+        return {
+            "success": True,
+            **search_catalogue(filters, sort, limit, start, search, with_facets=cint(facets))
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
@@ -0,0 +1,271 @@
+"""
+RocketTradeline Data Export
+Streams admin datasets to a private CSV or XLSX File in a background job
+
+Rows are read with keyset iteration (WHERE name > last ORDER BY name LIMIT
+BATCH_SIZE) as tuples and written straight to disk: csv.writer for CSV and an
+openpyxl write-only workbook for XLSX. Only one batch is ever held in memory,
+so a million-row export costs the same memory as a thousand-row one.
+"""
+
+import csv
+import hashlib
+import os
+
+import frappe
+from frappe.utils import get_datetime, now_datetime
+
+from .auth import jwt_required, get_authenticated_user
+from .payment import is_administrator
+
+BATCH_SIZE = 5000
+EXPORT_STATUS_KEY = "rockettradeline:export:{}"
+EXPORT_STATUS_TTL = 24 * 60 * 60
+REALTIME_EVENT = "export_progress"
+FORMATS = ("csv", "xlsx")
+XLSX_MAX_ROWS = 1048576
+# Cells starting with these are formulas to spreadsheet apps
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+DATASETS = {
+    "payment_requests": {
+        "doctype": "Payment Request",
+        "fields": ["name", "creation", "title", "payment_method", "cart_id", "amount", "fees", "total_amount",
+            "currency", "status", "customer", "customer_name", "customer_email", "transaction_id", "created_by",
+            "created_at", "completed_at", "verified_by", "verified_at", "is_manual_payment", "approval_status",
+            "approved_by", "approved_at", "rejection_reason"],
+    },
+    "client_tradelines": {
+        "doctype": "Client Tradelines",
+        "fields": ["name", "creation", "title", "customer", "customer_name", "status", "created_date", "cart",
+            "payment_request", "tradeline", "tradeline_name", "quantity", "unit_price", "total_amount",
+            "expiry_date", "assigned_to", "completion_date"],
+    },
+    "feedback": {
+        "doctype": "Tradeline Feedback",
+        "fields": ["name", "creation", "feedback_id", "first_name", "last_name", "email", "phone",
+            "question_1_why_buying", "question_2_importance", "question_3_credit_score",
+            "question_4_derogatory_marks", "submission_date", "source", "submitted_by_user", "status"],
+    },
+    "subscribers": {
+        "doctype": "Email Group Member",
+        "fields": ["name", "creation", "email", "email_group", "unsubscribed"],
+        "filters": {"email_group": "Website Subscribers"},
+    },
+    "carts": {
+        "doctype": "Tradeline Cart",
+        "fields": ["name", "creation", "user_id", "customer", "status", "cart_expiry", "payment_mode",
+            "payment_status", "subtotal", "discount_amount", "tax_amount", "total_amount"],
+    },
+    "files": {
+        "doctype": "File",
+        "fields": ["name", "creation", "file_name", "file_url", "file_size", "file_type", "is_private", "folder",
+            "attached_to_doctype", "attached_to_name", "owner"],
+        "filters": {"is_folder": 0},
+    },
+}
+
+
+def iter_dataset(dataset, filters=None):
+    """Yield the header, then every matching row as a tuple, BATCH_SIZE rows per query"""
+    config = DATASETS[dataset]
+    filters = {**config.get("filters", {}), **(filters or {})}
+    yield config["fields"]
+
+    last = None
+    while True:
+        batch_filters = dict(filters)
+        if last is not None:
+            batch_filters["name"] = [">", last]
+        rows = frappe.get_all(config["doctype"],
+            filters=batch_filters,
+            fields=config["fields"],
+            order_by="name asc",
+            limit=BATCH_SIZE,
+            as_list=True
+        )
+        yield from rows
+        if len(rows) < BATCH_SIZE:
+            return
+        # name is the first field
+        last = rows[-1][0]
+
+
+def _safe_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def write_csv(path, rows, on_progress=None):
+    count = -1
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for count, row in enumerate(rows):
+            writer.writerow([_safe_cell(value) for value in row])
+            if on_progress and count and not count % BATCH_SIZE:
+                on_progress(count)
+    return max(count, 0)
+
+
+def write_xlsx(path, rows, on_progress=None):
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    workbook = Workbook(write_only=True)
+    sheet, header, sheet_rows, count = None, None, 0, 0
+    for index, row in enumerate(rows):
+        if index == 0:
+            header = list(row)
+            continue
+        if sheet is None or sheet_rows >= XLSX_MAX_ROWS:
+            # Continue on a new sheet once one is full
+            sheet = workbook.create_sheet(f"Export {len(workbook.worksheets) + 1}")
+            sheet.append(header)
+            sheet_rows = 1
+        sheet.append([ILLEGAL_CHARACTERS_RE.sub("", value) if isinstance(value, str) else value
+            for value in map(_safe_cell, row)])
+        sheet_rows += 1
+        count += 1
+        if on_progress and not count % BATCH_SIZE:
+            on_progress(count)
+
+    if sheet is None:
+        workbook.create_sheet("Export 1").append(header)
+    workbook.save(path)
+    return count
+
+
+def _content_hash(path):
+    # Set on the File up front; otherwise File.validate reads the whole file to hash it
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def run_export(export_id, dataset, file_format, filters, user):
+    """Background job: write a dataset to a private File"""
+    stats = {"export_id": export_id, "user": user, "dataset": dataset, "format": file_format,
+        "status": "Running", "rows": 0, "started_at": str(now_datetime())}
+    _set_export_status(stats)
+
+    file_name = f"{dataset}-{now_datetime().strftime('%Y%m%d-%H%M%S')}-{frappe.generate_hash(length=6)}.{file_format}"
+    path = frappe.get_site_path("private", "files", file_name)
+
+    def on_progress(count):
+        stats["rows"] = count
+        _set_export_status(stats)
+
+    try:
+        writer = write_xlsx if file_format == "xlsx" else write_csv
+        stats["rows"] = writer(path, iter_dataset(dataset, filters), on_progress)
+
+        file_doc = frappe.get_doc({
+            "doctype": "File",
+            "file_name": file_name,
+            "file_url": f"/private/files/{file_name}",
+            "is_private": 1,
+            "file_size": os.path.getsize(path),
+            "content_hash": _content_hash(path),
+        })
+        file_doc.flags.ignore_permissions = True
+        file_doc.insert()
+        frappe.db.commit()
+
+        stats.update({"status": "Completed", "file_url": file_doc.file_url, "file": file_doc.name})
+    except Exception as e:
+        frappe.db.rollback()
+        if os.path.exists(path):
+            os.remove(path)
+        stats.update({"status": "Failed", "error": str(e)})
+        frappe.log_error(f"Export {export_id} failed: {str(e)}", "Data Export")
+
+    stats["finished_at"] = str(now_datetime())
+    _set_export_status(stats)
+    frappe.publish_realtime(REALTIME_EVENT, stats, user=user)
+    return stats
+
+
+def _set_export_status(stats):
+    frappe.cache().set_value(EXPORT_STATUS_KEY.format(stats["export_id"]), stats, expires_in_sec=EXPORT_STATUS_TTL)
+
+
+def build_export_filters(dataset, filters=None, from_date=None, to_date=None):
+    """Validated filters: equality on the dataset's own fields plus a creation range"""
+    filters = frappe.parse_json(filters) if filters else {}
+    # name is reserved for the keyset cursor
+    unknown = set(filters) - set(DATASETS[dataset]["fields"][1:])
+    if unknown:
+        frappe.throw(f"Cannot filter {dataset} on: {', '.join(sorted(unknown))}")
+
+    if from_date and to_date:
+        filters["creation"] = ["between", [get_datetime(from_date), get_datetime(to_date)]]
+    elif from_date:
+        filters["creation"] = [">=", get_datetime(from_date)]
+    elif to_date:
+        filters["creation"] = ["<=", get_datetime(to_date)]
+    return filters
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def start_export(dataset, file_format="csv", filters=None, from_date=None, to_date=None):
+    """
+    Export a dataset to a private CSV/XLSX File (Admin only)
+    dataset: payment_requests, client_tradelines, feedback, subscribers, carts or files
+    """
+    try:
+        current_user = get_authenticated_user()
+        if not current_user or current_user == "Guest":
+            return {"success": False, "error": "Authentication required"}
+        if not is_administrator(current_user):
+            return {"success": False, "error": "Insufficient permissions. Admin access required."}
+
+        if dataset not in DATASETS:
+            return {"success": False, "error": f"dataset must be one of: {', '.join(DATASETS)}"}
+        file_format = (file_format or "csv").lower()
+        if file_format not in FORMATS:
+            return {"success": False, "error": f"file_format must be one of: {', '.join(FORMATS)}"}
+
+        filters = build_export_filters(dataset, filters, from_date, to_date)
+        export_id = f"EXP-{now_datetime().strftime('%Y%m%d%H%M%S')}-{frappe.generate_hash(length=6)}"
+        _set_export_status({"export_id": export_id, "user": current_user, "dataset": dataset, "status": "Queued"})
+        frappe.enqueue(
+            "rockettradeline.api.export.run_export",
+            queue="long",
+            timeout=3600,
+            export_id=export_id,
+            dataset=dataset,
+            file_format=file_format,
+            filters=filters,
+            user=current_user
+        )
+
+        return {"success": True, "export_id": export_id, "status": "Queued", "realtime_event": REALTIME_EVENT}
+
+    except Exception as e:
+        frappe.log_error(f"Export start failed: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def get_export_status(export_id):
+    """Progress of an export and, once completed, its file_url (Admin only)"""
+    try:
+        current_user = get_authenticated_user()
+        if not current_user or current_user == "Guest":
+            return {"success": False, "error": "Authentication required"}
+        if not is_administrator(current_user):
+            return {"success": False, "error": "Insufficient permissions. Admin access required."}
+
+        stats = frappe.cache().get_value(EXPORT_STATUS_KEY.format(export_id))
+        if not stats:
+            return {"success": False, "error": "Export not found"}
+
+        return {"success": True, "export": stats}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
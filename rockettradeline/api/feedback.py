@@ -8,9 +8,12 @@ import re
 from frappe import _
 from frappe.utils import cstr, now_datetime, get_datetime, now, validate_email_address
 from rockettradeline.api.auth import jwt_required, get_authenticated_user
+from rockettradeline.api.utils import get_customer_for_user
+from rockettradeline.api.transaction import unit_of_work
 
 @frappe.whitelist(allow_guest=True)
 @jwt_required()
+@unit_of_work()
 def submit_feedback(question_1_why_buying, question_2_importance, question_3_credit_score, 
                    question_4_derogatory_marks, first_name, last_name, email, phone=None, source=None):
     """
@@ -148,35 +151,29 @@ def submit_feedback(question_1_why_buying, question_2_importance, question_3_cre
         feedback_doc.flags.authenticated_submission = True
         
         feedback_doc.insert(ignore_permissions=True)
-        frappe.db.commit()
         
-        # Update customer questionnaire status
+        # Update customer questionnaire status; a failure only undoes this step
+        frappe.db.savepoint("questionnaire_status")
         try:
             # Find customer by email or user
             customer = None
             
-            # First try to find by email
-            customers = frappe.get_all("Customer", filters={"email_id": email.strip().lower()}, fields=["name"])
-            if customers:
-                customer = frappe.get_doc("Customer", customers[0].name)
-            else:
-                # Try to find by user if authenticated
-                if current_user and current_user != "Guest":
-                    customers = frappe.get_all("Customer", filters={"user": current_user}, fields=["name"])
-                    if customers:
-                        customer = frappe.get_doc("Customer", customers[0].name)
+            # First try the submitted email, then the authenticated user
+            customer_name = get_customer_for_user(email.strip().lower()) or get_customer_for_user(current_user)
+            if customer_name:
+                customer = frappe.get_doc("Customer", customer_name)
             
             # Update questionnaire status if customer found
             if customer:
                 customer.is_questionnaire_filled = 1
                 customer.questionnaire_filled_date = now()
                 customer.save(ignore_permissions=True)
-                frappe.db.commit()
                 frappe.logger().info(f"Updated customer {customer.name} questionnaire status to filled")
             else:
                 frappe.logger().info(f"No customer found for email {email} or user {current_user}")
                 
         except Exception as e:
+            frappe.db.rollback(save_point="questionnaire_status")
             frappe.logger().error(f"Failed to update customer questionnaire status: {str(e)}")
             # Don't fail the feedback submission if customer update fails
         
@@ -344,6 +341,7 @@ def get_feedback_details(feedback_id):
 
 @frappe.whitelist()
 @jwt_required()
+@unit_of_work()
 def update_feedback_status(feedback_id, status, notes=None):
     """
     Update feedback submission status
@@ -393,7 +391,6 @@ def update_feedback_status(feedback_id, status, notes=None):
             feedback.add_comment('Comment', text=notes)
         
         feedback.save(ignore_permissions=True)
-        frappe.db.commit()
         
         return {
             "success": True,
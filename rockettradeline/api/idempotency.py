@@ -0,0 +1,156 @@
+"""
+RocketTradeline Idempotency Keys
+Safe client retries for payment and cart mutations
+
+A client sends `Idempotency-Key: <unique value>` with a POST. The first request
+with that key runs normally and its successful response is stored in Redis for
+IDEMPOTENCY_TTL. A retry with the same key (same credentials and endpoint)
+gets the stored response back without running the endpoint, so it never
+touches the DB. A duplicate that arrives while the first request is still running
+waits for it up to WAIT_TIMEOUT instead of racing it.
+
+    @frappe.whitelist(allow_guest=True)
+    @jwt_required()
+    @idempotent()
+    def add_to_cart(...):
+
+The decorator sits inside jwt_required, so only a currently valid token can
+replay a response. Keys are scoped by the authenticated user rather than the
+token, so a retry after a JWT refresh still finds the first response, and one
+user can never replay another's. Unauthenticated calls are not deduplicated.
+"""
+
+import hashlib
+import pickle
+import time
+from functools import wraps
+
+import frappe
+
+from .auth import get_authenticated_user
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+RESPONSE_KEY = "rockettradeline:idempotency:{}"
+LOCK_KEY = "rockettradeline:idempotency:lock:{}"
+IDEMPOTENCY_TTL = 24 * 60 * 60
+LOCK_TTL = 60
+WAIT_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+MAX_KEY_LENGTH = 255
+
+# Delete the lock only if it still holds our token, atomically
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def _scope(user, fn, key):
+    raw = f"{user}|{fn.__module__}.{fn.__qualname__}|{key}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _fingerprint(args, kwargs):
+    """Digest of the request parameters, to reject a key reused for a different request"""
+    params = {k: v for k, v in (frappe.local.form_dict or {}).items() if k != "cmd"}
+    params.update({f"kwarg:{k}": v for k, v in kwargs.items()})
+    if args:
+        params["args"] = args
+
+    request = getattr(frappe.local, "request", None)
+    files = getattr(request, "files", None) if request else None
+    if files:
+        params["files"] = sorted((name, f.filename, f.content_length) for name, f in files.items())
+
+    return hashlib.sha256(frappe.as_json(params, indent=None).encode()).hexdigest()
+
+
+def _get_stored(cache, response_key):
+    # Raw GET: get_value's per-request local cache would hide the response while polling
+    value = cache.get(response_key)
+    return pickle.loads(value) if value else None
+
+
+def _replay(stored, fingerprint):
+    if stored["fingerprint"] != fingerprint:
+        frappe.local.response.http_status_code = 422
+        return {"success": False, "error": f"{IDEMPOTENCY_HEADER} was already used for a different request"}
+
+    if stored.get("http_status_code"):
+        frappe.local.response.http_status_code = stored["http_status_code"]
+    # Whitelisted methods cannot set headers; after_request adds REPLAYED_HEADER
+    frappe.local.flags.idempotent_replayed = True
+    return stored["response"]
+
+
+def after_request(response=None, request=None):
+    """after_request hook: mark replayed responses"""
+    if response is not None and frappe.local.flags.get("idempotent_replayed"):
+        response.headers[REPLAYED_HEADER] = "true"
+
+
+def idempotent(ttl=IDEMPOTENCY_TTL, wait_timeout=WAIT_TIMEOUT):
+    """Honour the Idempotency-Key header on a whitelisted method"""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = frappe.get_request_header(IDEMPOTENCY_HEADER)
+            user = get_authenticated_user()
+            if not key or not user or user == "Guest":
+                return fn(*args, **kwargs)
+
+            if len(key) > MAX_KEY_LENGTH:
+                frappe.local.response.http_status_code = 400
+                return {"success": False, "error": f"{IDEMPOTENCY_HEADER} is too long"}
+
+            scope = _scope(user, fn, key)
+            fingerprint = _fingerprint(args, kwargs)
+            cache = frappe.cache()
+            response_key = cache.make_key(RESPONSE_KEY.format(scope))
+            # RedisWrapper.exists applies make_key itself, so keep the bare name for it
+            lock_name = LOCK_KEY.format(scope)
+            lock_key = cache.make_key(lock_name)
+
+            stored = _get_stored(cache, response_key)
+            if stored:
+                return _replay(stored, fingerprint)
+
+            token = frappe.generate_hash(length=16)
+            if not cache.set(lock_key, token, nx=True, ex=LOCK_TTL):
+                # Another request with this key is running; wait for its response
+                deadline = time.monotonic() + wait_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(POLL_INTERVAL)
+                    stored = _get_stored(cache, response_key)
+                    if stored:
+                        return _replay(stored, fingerprint)
+                    if not cache.exists(lock_name):
+                        # First request failed without storing; let the client retry
+                        break
+
+                frappe.local.response.http_status_code = 409
+                return {
+                    "success": False,
+                    "error": f"A request with this {IDEMPOTENCY_HEADER} is still in progress or failed; retry"
+                }
+
+            try:
+                response = fn(*args, **kwargs)
+                # Only completed work is replayed; failures may be retried for real
+                if not (isinstance(response, dict) and response.get("success") is False):
+                    cache.set(response_key, pickle.dumps({
+                        "fingerprint": fingerprint,
+                        "response": response,
+                        "http_status_code": frappe.local.response.get("http_status_code"),
+                    }), ex=ttl)
+                return response
+            finally:
+                cache.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,332 @@
+"""
+RocketTradeline API Instrumentation
+Per-request latency, SQL, Redis and payload metrics for whitelisted app methods
+
+Enable with `"rockettradeline_metrics": 1` in site_config.json. When disabled the
+request hooks return after a single config lookup and nothing is wrapped.
+Metrics are exposed in Prometheus text format at /api/method/rockettradeline.api.metrics
+"""
+
+import frappe
+import math
+import time
+
+from rockettradeline.api.utils import get_counters, get_raw_hash
+
+METHOD_PREFIX = "/api/method/rockettradeline."
+HISTOGRAM_KEY = "rockettradeline:metrics:histograms"
+# Label for app paths that do not resolve to a whitelisted method
+OTHER_ENDPOINT = "other"
+
+# Dotted paths already resolved to whitelisted methods in this process
+_known_endpoints = set()
+
+# Log-linear bucket layouts: upper bound of bucket i is base * factor ** i.
+# sqrt(2) steps keep the relative error per bucket under ~20%, like an HDR histogram
+# with one significant digit, while keeping the number of Redis hash fields small.
+HISTOGRAMS = {
+    "request_duration_seconds": {"base": 0.0005, "factor": math.sqrt(2), "buckets": 36},
+    "db_duration_seconds": {"base": 0.0001, "factor": math.sqrt(2), "buckets": 36},
+    "db_queries": {"base": 1, "factor": 2, "buckets": 12},
+    "redis_duration_seconds": {"base": 0.00005, "factor": math.sqrt(2), "buckets": 32},
+    "redis_commands": {"base": 1, "factor": 2, "buckets": 12},
+    "response_bytes": {"base": 64, "factor": 2, "buckets": 22},
+}
+
+
+def is_enabled():
+    return bool(frappe.conf.get("rockettradeline_metrics"))
+
+
+def bucket_index(metric, value):
+    """Return the histogram bucket for a value (last bucket is the overflow bucket)"""
+    layout = HISTOGRAMS[metric]
+    if value <= layout["base"]:
+        return 0
+    index = math.ceil(math.log(value / layout["base"], layout["factor"]) - 1e-9)
+    return min(index, layout["buckets"])
+
+
+def bucket_bound(metric, index):
+    layout = HISTOGRAMS[metric]
+    if index >= layout["buckets"]:
+        return "+Inf"
+    return "{:.6g}".format(layout["base"] * layout["factor"] ** index)
+
+
+def resolve_endpoint(path):
+    """
+    Metrics label for a request path: the dotted method when it is whitelisted,
+    otherwise OTHER_ENDPOINT, so made-up paths cannot create new series
+    """
+    method = path[len("/api/method/"):].strip("/")
+    if method in _known_endpoints:
+        return method
+
+    try:
+        fn = frappe.get_attr(method)
+    except Exception:
+        return OTHER_ENDPOINT
+    if fn not in frappe.whitelisted:
+        return OTHER_ENDPOINT
+
+    _known_endpoints.add(method)
+    return method
+
+
+def escape_label(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def get_request_metrics():
+    """Metrics collected for the current request, or None when not instrumented"""
+    return getattr(frappe.local, "rockettradeline_metrics", None)
+
+
+# SQL and Redis wrappers
+
+
+def _wrap_sql(db, state):
+    original_sql = db.sql
+
+    def instrumented_sql(query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original_sql(query, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            state["db_queries"] += 1
+            state["db_duration_seconds"] += elapsed
+            for listener in state["sql_listeners"]:
+                listener(query, args, kwargs, elapsed)
+
+    db.sql = instrumented_sql
+    state["original_sql"] = original_sql
+
+
+def _unwrap_sql(db, state):
+    if state.get("original_sql") and "sql" in db.__dict__:
+        del db.__dict__["sql"]
+
+
+def _instrument_redis():
+    """Wrap the shared Redis client once per process; idle unless a request is instrumented"""
+    cache = frappe.cache()
+    if getattr(cache, "_rockettradeline_instrumented", False):
+        return
+
+    original_execute = cache.execute_command
+
+    def instrumented_execute(*args, **kwargs):
+        state = get_request_metrics()
+        if state is None:
+            return original_execute(*args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return original_execute(*args, **kwargs)
+        finally:
+            state["redis_commands"] += 1
+            state["redis_duration_seconds"] += time.perf_counter() - start
+
+    cache.execute_command = instrumented_execute
+    cache._rockettradeline_instrumented = True
+
+
+def add_sql_listener(listener):
+    """Register a callback(query, args, kwargs, elapsed) for SQL run in this request"""
+    state = get_request_metrics()
+    if state is not None:
+        state["sql_listeners"].append(listener)
+
+
+# Request hooks
+
+
+def add_finish_callback(callback):
+    """Register a callback(state, response) run from after_request"""
+    state = get_request_metrics()
+    if state is not None:
+        state["finish_callbacks"].append(callback)
+
+
+def start_request_instrumentation():
+    """
+    Create the per-request state and wrap SQL/Redis (idempotent).
+    Returns None for requests that are not app API calls.
+    """
+    state = get_request_metrics()
+    if state is not None:
+        return state
+
+    request = getattr(frappe.local, "request", None)
+    if not request or not request.path.startswith(METHOD_PREFIX):
+        return None
+
+    state = {
+        "endpoint": resolve_endpoint(request.path),
+        "start": time.perf_counter(),
+        "db_queries": 0,
+        "db_duration_seconds": 0.0,
+        "redis_commands": 0,
+        "redis_duration_seconds": 0.0,
+        "sql_listeners": [],
+        "finish_callbacks": [],
+        "record_metrics": False,
+    }
+    frappe.local.rockettradeline_metrics = state
+
+    _wrap_sql(frappe.db, state)
+    _instrument_redis()
+    return state
+
+
+def before_request():
+    """before_request hook"""
+    if not is_enabled():
+        return
+
+    state = start_request_instrumentation()
+    if state is not None:
+        state["record_metrics"] = True
+
+
+def after_request(response=None, request=None):
+    """after_request hook"""
+    state = get_request_metrics()
+    if state is None:
+        return
+
+    frappe.local.rockettradeline_metrics = None
+    if frappe.db:
+        _unwrap_sql(frappe.db, state)
+
+    for callback in state["finish_callbacks"]:
+        try:
+            callback(state, response)
+        except Exception:
+            frappe.log_error(frappe.get_traceback(), "Request instrumentation callback failed")
+
+    if not state["record_metrics"]:
+        return
+
+    observations = {
+        "request_duration_seconds": time.perf_counter() - state["start"],
+        "db_queries": state["db_queries"],
+        "db_duration_seconds": state["db_duration_seconds"],
+        "redis_commands": state["redis_commands"],
+        "redis_duration_seconds": state["redis_duration_seconds"],
+        "response_bytes": _response_size(response),
+    }
+
+    try:
+        record_observations(state["endpoint"], observations)
+    except Exception:
+        # Metrics must never break the request
+        pass
+
+
+def _response_size(response):
+    if response is None:
+        return 0
+    if response.content_length is not None:
+        return response.content_length
+    if response.is_streamed:
+        return 0
+    return len(response.get_data())
+
+
+def record_observations(endpoint, observations):
+    """Add one observation per metric to the shared histograms (single Redis round trip)"""
+    cache = frappe.cache()
+    key = cache.make_key(HISTOGRAM_KEY)
+    pipe = cache.pipeline(transaction=False)
+
+    for metric, value in observations.items():
+        prefix = f"{metric}|{endpoint}"
+        pipe.hincrby(key, f"{prefix}|{bucket_index(metric, value)}", 1)
+        pipe.hincrbyfloat(key, f"{prefix}|sum", value)
+        pipe.hincrby(key, f"{prefix}|count", 1)
+
+    pipe.execute()
+
+
+# Exposition
+
+
+def _load_histograms():
+    raw = get_raw_hash(HISTOGRAM_KEY)
+
+    histograms = {}
+    for field, value in raw.items():
+        metric, endpoint, slot = frappe.safe_decode(field).rsplit("|", 2)
+        entry = histograms.setdefault(metric, {}).setdefault(endpoint, {"buckets": {}, "sum": 0.0, "count": 0})
+        if slot == "sum":
+            entry["sum"] = float(value)
+        elif slot == "count":
+            entry["count"] = int(value)
+        else:
+            entry["buckets"][int(slot)] = int(value)
+
+    return histograms
+
+
+def render_prometheus():
+    """Render all histograms and counters in Prometheus text format"""
+    lines = []
+
+    for metric, endpoints in sorted(_load_histograms().items()):
+        if metric not in HISTOGRAMS:
+            continue
+        name = f"rockettradeline_{metric}"
+        lines.append(f"# TYPE {name} histogram")
+        for endpoint, entry in sorted(endpoints.items()):
+            endpoint = escape_label(endpoint)
+            cumulative = 0
+            for index in range(HISTOGRAMS[metric]["buckets"] + 1):
+                cumulative += entry["buckets"].get(index, 0)
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bucket_bound(metric, index)}"}} {cumulative}')
+            lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {entry["sum"]:.6f}')
+            lines.append(f'{name}_count{{endpoint="{endpoint}"}} {entry["count"]}')
+
+    counters = get_counters()
+    if counters:
+        lines.append("# TYPE rockettradeline_events_total counter")
+        for counter, value in sorted(counters.items()):
+            lines.append(f'rockettradeline_events_total{{name="{escape_label(counter)}"}} {value}')
+
+    return "\n".join(lines) + "\n"
+
+
+def _is_authorized_scraper():
+    token = frappe.conf.get("rockettradeline_metrics_token")
+    auth_header = frappe.get_request_header("Authorization") or ""
+    if token and auth_header == f"Bearer {token}":
+        return True
+    return "System Manager" in frappe.get_roles()
+
+
+@frappe.whitelist(allow_guest=True)
+def metrics():
+    """
+    Prometheus scrape endpoint
+    Allowed for System Manager sessions or `Bearer <rockettradeline_metrics_token>`
+    """
+    from werkzeug.wrappers import Response
+
+    if not is_enabled():
+        return Response("metrics disabled\n", status=404, mimetype="text/plain")
+
+    if not _is_authorized_scraper():
+        return Response("forbidden\n", status=403, mimetype="text/plain")
+
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@frappe.whitelist()
+def reset_metrics():
+    """Clear all collected histograms (System Manager only)"""
+    frappe.only_for("System Manager")
+    frappe.cache().delete_value(HISTOGRAM_KEY)
+    return {"success": True, "message": "Metrics reset"}
@@ -1,10 +1,12 @@
 import frappe
 from frappe import _
 from frappe.utils import validate_email_address, now_datetime
+from rockettradeline.api.transaction import unit_of_work
 
 # Email Group Management APIs
 
 @frappe.whitelist(allow_guest=True)
+@unit_of_work()
 def subscribe_to_newsletter(email, full_name=None):
     """
     Add user to Website Subscribers email group
@@ -28,7 +30,6 @@ def subscribe_to_newsletter(email, full_name=None):
                 "description": "Subscribers to RocketTradeline website newsletter and updates"
             })
             email_group.insert(ignore_permissions=True)
-            frappe.db.commit()
         
         # Check if email is already subscribed
         existing_member = frappe.db.exists("Email Group Member", {
@@ -42,7 +43,6 @@ def subscribe_to_newsletter(email, full_name=None):
             if member_doc.unsubscribed:
                 member_doc.unsubscribed = 0
                 member_doc.save(ignore_permissions=True)
-                frappe.db.commit()
                 return {
                     "success": True,
                     "message": "Successfully resubscribed to newsletter!",
@@ -81,9 +81,7 @@ def subscribe_to_newsletter(email, full_name=None):
                     user_doc.save(ignore_permissions=True)
             except Exception as e:
                 # Log error but don't fail the subscription
-                frappe.log_error(f"Error updating user info for {email}: {str(e)}")
-        
-        frappe.db.commit()
+                frappe.log_error(f"Error updating user info for {email}: {str(e)}", defer_insert=True)
         
         return {
             "success": True,
@@ -95,13 +93,14 @@ def subscribe_to_newsletter(email, full_name=None):
         }
         
     except Exception as e:
-        frappe.log_error(f"Newsletter subscription error: {str(e)}")
+        frappe.log_error(f"Newsletter subscription error: {str(e)}", defer_insert=True)
         return {
             "success": False,
             "message": f"Subscription failed: {str(e)}"
         }
 
 @frappe.whitelist(allow_guest=True)
+@unit_of_work()
 def unsubscribe_from_newsletter(email, token=None):
     """
     Unsubscribe user from Website Subscribers email group
@@ -133,7 +132,6 @@ def unsubscribe_from_newsletter(email, token=None):
         member_doc = frappe.get_doc("Email Group Member", member)
         member_doc.unsubscribed = 1
         member_doc.save(ignore_permissions=True)
-        frappe.db.commit()
         
         return {
             "success": True,
@@ -144,7 +142,7 @@ def unsubscribe_from_newsletter(email, token=None):
         }
         
     except Exception as e:
-        frappe.log_error(f"Newsletter unsubscribe error: {str(e)}")
+        frappe.log_error(f"Newsletter unsubscribe error: {str(e)}", defer_insert=True)
         return {
             "success": False,
             "message": f"Unsubscribe failed: {str(e)}"
@@ -247,6 +245,7 @@ def get_newsletter_subscribers(limit=50, start=0):
         }
 
 @frappe.whitelist(allow_guest=True)
+@unit_of_work()
 def subscribe_to_email_group(email, email_group, full_name=None):
     """
     Add user to any specified email group
@@ -285,7 +284,6 @@ def subscribe_to_email_group(email, email_group, full_name=None):
             if member_doc.unsubscribed:
                 member_doc.unsubscribed = 0
                 member_doc.save(ignore_permissions=True)
-                frappe.db.commit()
                 return {
                     "success": True,
                     "message": f"Successfully resubscribed to {email_group}!",
@@ -324,9 +322,7 @@ def subscribe_to_email_group(email, email_group, full_name=None):
                     user_doc.save(ignore_permissions=True)
             except Exception as e:
                 # Log error but don't fail the subscription
-                frappe.log_error(f"Error updating user info for {email}: {str(e)}")
-        
-        frappe.db.commit()
+                frappe.log_error(f"Error updating user info for {email}: {str(e)}", defer_insert=True)
         
         return {
             "success": True,
@@ -338,7 +334,7 @@ def subscribe_to_email_group(email, email_group, full_name=None):
         }
         
     except Exception as e:
-        frappe.log_error(f"Email group subscription error: {str(e)}")
+        frappe.log_error(f"Email group subscription error: {str(e)}", defer_insert=True)
         return {
             "success": False,
             "message": f"Subscription failed: {str(e)}"
@@ -364,13 +360,16 @@ def get_email_groups():
             order_by="creation desc"
         )
         
-        # Get subscriber count for each group
+        # Get subscriber counts for all groups in one query
+        subscriber_counts = dict(frappe.get_all("Email Group Member",
+            filters={"unsubscribed": 0},
+            fields=["email_group", "count(name) as subscriber_count"],
+            group_by="email_group",
+            as_list=True
+        ))
+        
         for group in email_groups:
-            subscriber_count = frappe.db.count("Email Group Member", {
-                "email_group": group.name,
-                "unsubscribed": 0
-            })
-            group["subscriber_count"] = subscriber_count
+            group["subscriber_count"] = subscriber_counts.get(group.name, 0)
         
         return {
             "success": True,
@@ -386,6 +385,7 @@ def get_email_groups():
         }
 
 @frappe.whitelist()
+@unit_of_work()
 def create_email_group(title, description=None):
     """
     Create a new email group (Admin only)
@@ -419,7 +419,6 @@ def create_email_group(title, description=None):
             "description": description or f"Email group for {title}"
         })
         email_group.insert()
-        frappe.db.commit()
         
         return {
             "success": True,
@@ -432,7 +431,7 @@ def create_email_group(title, description=None):
         }
         
     except Exception as e:
-        frappe.log_error(f"Create email group error: {str(e)}")
+        frappe.log_error(f"Create email group error: {str(e)}", defer_insert=True)
         return {
             "success": False,
             "message": f"Failed to create email group: {str(e)}"
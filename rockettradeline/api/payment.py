@@ -5,6 +5,18 @@ from decimal import Decimal
 import json
 import re
 from .auth import jwt_required, get_authenticated_user, get_email_header, get_email_footer
+from .transaction import unit_of_work
+from .idempotency import idempotent
+from rockettradeline.rockettradeline.doctype.sales_daily_rollup.sales_daily_rollup import track_payment_requests
+from rockettradeline.rockettradeline.doctype.payment_configuration.payment_configuration import (
+    compute_fees,
+    get_active_payment_config,
+    get_active_payment_configs,
+    get_registry_version,
+)
+
+CHECKOUT_QUOTE_CACHE_KEY = "rockettradeline:checkout_quote:{}:{}:{}"
+CHECKOUT_QUOTE_TTL = 60 * 60
 
 
 def send_payment_request_notification_email(payment_request_doc):
@@ -142,6 +154,8 @@ def send_payment_approval_email(payment_request_doc):
 
 @frappe.whitelist(allow_guest=True)
 @jwt_required()
+@idempotent()
+@unit_of_work()
 def create_manual_payment_request(cart_id, payment_method):
     """Create a manual payment request that requires approval"""
     try:
@@ -173,7 +187,7 @@ def create_manual_payment_request(cart_id, payment_method):
                             "file_size": file_doc.file_size
                         }
                     except Exception as e:
-                        frappe.log_error(f"File upload error: {str(e)}")
+                        frappe.log_error(f"File upload error: {str(e)}", defer_insert=True)
                         return {"success": False, "error": f"Failed to upload file: {str(e)}"}
         
         # Validate cart exists and is owned by current user or user is administrator
@@ -226,10 +240,8 @@ def create_manual_payment_request(cart_id, payment_method):
                     WHERE file_url = %s
                 """, ("Payment Request", payment_doc.name, "proof_of_payment", file_url))
             except Exception as attach_error:
-                frappe.log_error(f"Attachment linking error: {str(attach_error)}")
+                frappe.log_error(f"Attachment linking error: {str(attach_error)}", defer_insert=True)
         
-        frappe.db.commit()
-
         return {
             "success": True,
             "message": "Manual payment request created successfully. Awaiting approval.",
@@ -244,7 +256,7 @@ def create_manual_payment_request(cart_id, payment_method):
         }
 
     except Exception as e:
-        frappe.log_error(f"Sample payment creation failed: {str(e)}")
+        frappe.log_error(f"Sample payment creation failed: {str(e)}", defer_insert=True)
         return {
             "success": False,
             "error": str(e)
@@ -253,6 +265,7 @@ def create_manual_payment_request(cart_id, payment_method):
 
 @frappe.whitelist(allow_guest=True)
 @jwt_required()
+@unit_of_work()
 def upload_payment_proof(payment_request_id):
     """
     Upload proof of payment file for existing payment request
@@ -297,7 +310,7 @@ def upload_payment_proof(payment_request_id):
                         file_url = file_doc.file_url
                         file_name = file_doc.file_name
                     except Exception as e:
-                        frappe.log_error(f"File upload error: {str(e)}")
+                        frappe.log_error(f"File upload error: {str(e)}", defer_insert=True)
                         return {"success": False, "error": f"Failed to upload file: {str(e)}"}
                 else:
                     return {"success": False, "error": "No file selected"}
@@ -317,8 +330,6 @@ def upload_payment_proof(payment_request_id):
             WHERE file_url = %s
         """, ("Payment Request", payment_req.name, "proof_of_payment", file_url))
         
-        frappe.db.commit()
-        
         return {
             "success": True,
             "message": "Proof of payment uploaded successfully",
@@ -328,7 +339,7 @@ def upload_payment_proof(payment_request_id):
         }
         
     except Exception as e:
-        frappe.log_error(f"Payment proof upload failed: {str(e)}")
+        frappe.log_error(f"Payment proof upload failed: {str(e)}", defer_insert=True)
         return {
             "success": False,
             "error": str(e)
@@ -346,6 +357,7 @@ def is_administrator(user):
 
 @frappe.whitelist(allow_guest=True)
 @jwt_required()
+@unit_of_work()
 def approve_manual_payment(payment_request_id, approval_action="approve", rejection_reason=None):
     """Approve or reject a manual payment request (Admin only)"""
     try:
@@ -390,7 +402,6 @@ def approve_manual_payment(payment_request_id, approval_action="approve", reject
             return {"success": False, "error": "Invalid approval action. Use 'approve' or 'reject'"}
 
         payment_req.save(ignore_permissions=True)
-        frappe.db.commit()
 
         return {
             "success": True,
@@ -401,13 +412,179 @@ def approve_manual_payment(payment_request_id, approval_action="approve", reject
         }
 
     except Exception as e:
-        frappe.log_error(f"Manual payment approval failed: {str(e)}")
+        frappe.log_error(f"Manual payment approval failed: {str(e)}", defer_insert=True)
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+MAX_BULK_APPROVALS = 500
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+@unit_of_work()
+def bulk_approve_manual_payments(items):
+    """
+    Approve or reject many manual payment requests at once (Admin only)
+    items: [{"payment_request_id": ..., "action": "approve"|"reject", "rejection_reason": ...}]
+    Requests are validated in one query and updated in one transaction; customer
+    notifications run in a background job after commit.
+    """
+    try:
+        current_user = get_authenticated_user()
+        if not current_user or current_user == "Guest":
+            return {"success": False, "error": "Authentication required"}
+
+        if not is_administrator(current_user):
+            return {"success": False, "error": "Insufficient permissions. Admin access required."}
+
+        items = frappe.parse_json(items) or []
+        if not isinstance(items, list) or not items:
+            return {"success": False, "error": "items must be a non-empty list"}
+        if len(items) > MAX_BULK_APPROVALS:
+            return {"success": False, "error": f"At most {MAX_BULK_APPROVALS} items per call"}
+
+        ids = [item.get("payment_request_id") for item in items if isinstance(item, dict)]
+        existing = {
+            row.name: row for row in frappe.get_all(
+                "Payment Request",
+                filters={"name": ["in", ids]},
+                fields=["name", "is_manual_payment", "approval_status", "cart_id", "created_by", "owner"]
+            )
+        } if ids else {}
+
+        results = []
+        approved, rejected = [], {}
+        seen = set()
+        for item in items:
+            item = item if isinstance(item, dict) else {}
+            name = item.get("payment_request_id")
+            action = item.get("action", "approve")
+            row = existing.get(name)
+
+            error = None
+            if not name or name in seen:
+                error = "Missing or duplicate payment_request_id"
+            elif not row:
+                error = "Payment request not found"
+            elif not row.is_manual_payment:
+                error = "This is not a manual payment request"
+            elif row.approval_status != "Pending Approval":
+                error = f"Payment request is already {(row.approval_status or '').lower()}"
+            elif action not in ("approve", "reject"):
+                error = "Invalid approval action. Use 'approve' or 'reject'"
+            seen.add(name)
+
+            if error:
+                results.append({"payment_request_id": name, "success": False, "error": error})
+            elif action == "approve":
+                approved.append(name)
+            else:
+                reason = item.get("rejection_reason") or "Payment rejected by admin"
+                rejected.setdefault(reason, []).append(name)
+
+        timestamp = now_datetime()
+        applied = {}
+        decided = approved + [name for names in rejected.values() for name in names]
+        with track_payment_requests(decided):
+            if approved:
+                frappe.db.sql("""
+                    UPDATE `tabPayment Request`
+                    SET approval_status = 'Approved', status = 'Draft',
+                        approved_by = %(user)s, approved_at = %(now)s,
+                        transaction_id = CONCAT('MANUAL_', UPPER(payment_method), '_', %(stamp)s),
+                        modified = %(now)s, modified_by = %(user)s
+                    WHERE name IN %(names)s AND approval_status = 'Pending Approval'
+                """, {"user": current_user, "now": timestamp, "stamp": timestamp.strftime('%Y%m%d%H%M%S'),
+                    "names": tuple(approved)})
+                applied.update({name: ("Approved", "Draft") for name in approved})
+
+            for reason, names in rejected.items():
+                frappe.db.sql("""
+                    UPDATE `tabPayment Request`
+                    SET approval_status = 'Rejected', status = 'Failed', rejection_reason = %(reason)s,
+                        modified = %(now)s, modified_by = %(user)s
+                    WHERE name IN %(names)s AND approval_status = 'Pending Approval'
+                """, {"user": current_user, "now": timestamp, "reason": reason, "names": tuple(names)})
+                applied.update({name: ("Rejected", "Failed") for name in names})
+
+        # Re-read inside the transaction so rows a concurrent approver got to first are reported
+        if applied:
+            current = {
+                row.name: row for row in frappe.get_all(
+                    "Payment Request",
+                    filters={"name": ["in", list(applied)]},
+                    fields=["name", "approval_status", "modified"]
+                )
+            }
+            for name, (approval_status, status) in list(applied.items()):
+                row = current.get(name)
+                if not row or row.approval_status != approval_status or row.modified != timestamp:
+                    del applied[name]
+                    results.append({"payment_request_id": name, "success": False,
+                        "error": "Payment request was updated concurrently"})
+
+        from rockettradeline.api.payment_events import queue_bulk_payment_events
+        queue_bulk_payment_events(
+            [existing[name] for name in applied],
+            {name: {"status": status, "approval_status": approval_status} for name, (approval_status, status) in applied.items()}
+        )
+
+        for name, (approval_status, status) in applied.items():
+            results.append({
+                "payment_request_id": name,
+                "success": True,
+                "approval_status": approval_status,
+                "status": status
+            })
+
+        if applied:
+            frappe.enqueue(
+                "rockettradeline.api.payment.process_manual_payment_decisions",
+                queue="short",
+                names=list(applied),
+                user=current_user,
+                enqueue_after_commit=True
+            )
+
+        order = {name: index for index, name in enumerate(ids)}
+        results.sort(key=lambda r: order.get(r["payment_request_id"], len(order)))
+
+        return {
+            "success": True,
+            "processed": len(applied),
+            "failed": len(results) - len(applied),
+            "results": results
+        }
+
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Bulk manual payment approval failed: {str(e)}", defer_insert=True)
         return {
             "success": False,
             "error": str(e)
         }
 
 
+def process_manual_payment_decisions(names, user=None):
+    """Background follow-up for bulk approvals: audit comments and failure emails"""
+    for name in names:
+        try:
+            payment_req = frappe.get_doc("Payment Request", name)
+            payment_req.add_comment(
+                "Info",
+                f"Manual payment {payment_req.approval_status.lower()} by {user or 'admin'} (bulk)"
+            )
+            if payment_req.status == "Failed":
+                payment_req.send_failure_notification()
+            frappe.db.commit()
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.log_error(f"Manual payment follow-up failed for {name}: {str(e)}")
+
+
 @frappe.whitelist(allow_guest=True)
 @jwt_required()
 def get_manual_payment_requests(status=None, limit=20, start=0):
@@ -532,6 +709,8 @@ def get_my_manual_payments(limit=20, start=0):
 
 @frappe.whitelist(allow_guest=True)
 @jwt_required()
+@idempotent()
+@unit_of_work()
 def create_payment_request(cart_id, payment_method, **kwargs):
     """Create a payment request for cart items"""
     try:
@@ -551,30 +730,27 @@ def create_payment_request(cart_id, payment_method, **kwargs):
             frappe.throw(_("Cart is not active"))
 
         # Get payment configuration
-        payment_config = frappe.get_doc("Payment Configuration", {
-            "payment_method": payment_method,
-            "is_active": 1
-        })
-
-        if not payment_config:
+        config = get_active_payment_config(payment_method)
+        if not config:
             frappe.local.response["http_status_code"] = 400
             frappe.throw(_("Payment method not configured"))
 
         # Calculate total amount with fees
         cart_total = cart.calculate_totals()
-        fees = payment_config.calculate_fees(cart_total["total"])
+        fees = compute_fees(config, cart_total["total"])
         total_amount = cart_total["total"] + fees["total_fee"]
 
         # Validate amount limits
-        if total_amount < payment_config.min_amount:
+        if total_amount < config["min_amount"]:
             frappe.local.response["http_status_code"] = 400
-            frappe.throw(_("Amount below minimum limit of ${0}").format(payment_config.min_amount))
+            frappe.throw(_("Amount below minimum limit of ${0}").format(config["min_amount"]))
 
-        if total_amount > payment_config.max_amount:
+        if total_amount > config["max_amount"]:
             frappe.local.response["http_status_code"] = 400
-            frappe.throw(_("Amount exceeds maximum limit of ${0}").format(payment_config.max_amount))
+            frappe.throw(_("Amount exceeds maximum limit of ${0}").format(config["max_amount"]))
 
         # Create payment request using configuration
+        payment_config = frappe.get_cached_doc("Payment Configuration", config["name"])
         payment_request = payment_config.create_payment_request(
             amount=cart_total["total"],
             customer_email=kwargs.get("customer_email", current_user),
@@ -609,7 +785,7 @@ def create_payment_request(cart_id, payment_method, **kwargs):
         }
 
     except Exception as e:
-        frappe.log_error(f"Payment request creation failed: {str(e)}")
+        frappe.log_error(f"Payment request creation failed: {str(e)}", defer_insert=True)
         return {
             "success": False,
             "error": str(e)
@@ -640,10 +816,10 @@ def process_payment(payment_request_id, **payment_data):
             frappe.throw(_("Unauthorized access"))
 
         # Get payment configuration
-        payment_config = frappe.get_doc("Payment Configuration", {
-            "payment_method": payment_req.payment_method,
-            "is_active": 1
-        })
+        payment_config = get_active_payment_config(payment_req.payment_method)
+        if not payment_config:
+            frappe.local.response["http_status_code"] = 400
+            frappe.throw(_("Payment method not configured"))
 
         # Process payment based on method
         if payment_req.payment_method == "PayPal":
@@ -1253,16 +1429,15 @@ def get_payment_methods():
             frappe.local.response["http_status_code"] = 401
             frappe.throw("Authentication required", frappe.AuthenticationError)
         
-        payment_configs = frappe.get_all(
-            "Payment Configuration",
-            filters={"is_active": 1},
-            fields=[
-                "name", "payment_method", "payment_type", "min_amount", 
-                "max_amount", "fixed_fee", "percentage_fee", "instructions",
-                "icon", "display_name"
-            ],
-            order_by="creation desc"
-        )
+        fields = [
+            "name", "payment_method", "payment_type", "min_amount",
+            "max_amount", "fixed_fee", "percentage_fee", "instructions",
+            "icon", "display_name"
+        ]
+        payment_configs = [
+            {field: config[field] for field in fields}
+            for config in get_active_payment_configs()
+        ]
 
         return {
             "success": True,
@@ -1286,16 +1461,12 @@ def calculate_payment_fees(amount, payment_method):
             frappe.local.response["http_status_code"] = 401
             frappe.throw("Authentication required", frappe.AuthenticationError)
         
-        payment_config = frappe.get_doc("Payment Configuration", {
-            "payment_method": payment_method,
-            "is_active": 1
-        })
-
-        if not payment_config:
+        config = get_active_payment_config(payment_method)
+        if not config:
             frappe.local.response["http_status_code"] = 404
             frappe.throw(_("Payment method not found"))
 
-        fees = payment_config.calculate_fees(flt(amount))
+        fees = compute_fees(config, flt(amount))
 
         return {
             "success": True,
@@ -1310,6 +1481,89 @@ def calculate_payment_fees(amount, payment_method):
         }
 
 
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def get_checkout_quote(cart_id):
+    """
+    Compare every active payment method for a cart: fees, limits, eligibility
+    Cached until the cart or any payment configuration changes
+    """
+    try:
+        current_user = get_authenticated_user()
+        if not current_user or current_user == "Guest":
+            frappe.local.response["http_status_code"] = 401
+            frappe.throw("Authentication required", frappe.AuthenticationError)
+
+        cart_row = frappe.db.get_value("Tradeline Cart", cart_id, ["user_id", "modified"], as_dict=True)
+        if not cart_row:
+            frappe.local.response["http_status_code"] = 404
+            frappe.throw(_("Cart not found"))
+
+        if cart_row.user_id != current_user and not is_administrator(current_user):
+            frappe.local.response["http_status_code"] = 403
+            frappe.throw(_("Unauthorized access to cart"))
+
+        cache_key = CHECKOUT_QUOTE_CACHE_KEY.format(cart_id, cart_row.modified, get_registry_version())
+        quote = frappe.cache().get_value(cache_key)
+        if quote is None:
+            quote = build_checkout_quote(frappe.get_doc("Tradeline Cart", cart_id))
+            frappe.cache().set_value(cache_key, quote, expires_in_sec=CHECKOUT_QUOTE_TTL)
+
+        return {"success": True, **quote}
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+def build_checkout_quote(cart):
+    """Evaluate all active payment methods against the cart total in one pass"""
+    cart_total = flt(cart.calculate_totals()["total"])
+
+    methods = []
+    for config in get_active_payment_configs():
+        fees = compute_fees(config, cart_total)
+        total_amount = flt(cart_total + fees["total_fee"], 2)
+
+        reason = None
+        if total_amount < config["min_amount"]:
+            reason = _("Amount below minimum limit of ${0}").format(config["min_amount"])
+        elif total_amount > config["max_amount"]:
+            reason = _("Amount exceeds maximum limit of ${0}").format(config["max_amount"])
+
+        methods.append({
+            "payment_method": config["payment_method"],
+            "display_name": config["display_name"],
+            "payment_type": config["payment_type"],
+            "icon": config["icon"],
+            "sort_order": config["sort_order"],
+            "fixed_fee": fees["fixed_fee"],
+            "percentage_fee": config["percentage_fee"],
+            "percentage_fee_amount": flt(fees["percentage_fee_amount"], 2),
+            "total_fee": flt(fees["total_fee"], 2),
+            "total_amount": total_amount,
+            "min_amount": config["min_amount"],
+            "max_amount": config["max_amount"],
+            "eligible": reason is None,
+            "ineligible_reason": reason
+        })
+
+    # Eligible methods first, cheapest first
+    methods.sort(key=lambda m: (not m["eligible"], m["total_amount"], m["sort_order"] or 0))
+    eligible = [m for m in methods if m["eligible"]]
+
+    return {
+        "cart_id": cart.name,
+        "cart_total": cart_total,
+        "currency": "USD",
+        "methods": methods,
+        "cheapest_method": eligible[0]["payment_method"] if eligible else None,
+        "quoted_at": str(now_datetime())
+    }
+
+
 @frappe.whitelist(allow_guest=True)
 @jwt_required()
 def verify_payment(payment_request_id):
@@ -1352,10 +1606,8 @@ def test_payment_configuration(payment_method, test_amount=100):
             frappe.local.response["http_status_code"] = 401
             frappe.throw("Authentication required", frappe.AuthenticationError)
         
-        payment_config = frappe.get_doc("Payment Configuration", {
-            "payment_method": payment_method,
-            "is_active": 1
-        })
+        config = get_active_payment_config(payment_method)
+        payment_config = frappe.get_cached_doc("Payment Configuration", config["name"]) if config else None
 
         if not payment_config:
             return {
@@ -1406,10 +1658,8 @@ def create_sample_payment(payment_method, amount, customer_email):
             frappe.local.response["http_status_code"] = 401
             frappe.throw("Authentication required", frappe.AuthenticationError)
         
-        payment_config = frappe.get_doc("Payment Configuration", {
-            "payment_method": payment_method,
-            "is_active": 1
-        })
+        config = get_active_payment_config(payment_method)
+        payment_config = frappe.get_cached_doc("Payment Configuration", config["name"]) if config else None
 
         if not payment_config:
             return {
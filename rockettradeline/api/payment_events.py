@@ -0,0 +1,116 @@
+"""
+RocketTradeline Payment Events
+Pushes payment status changes to the owning user instead of having clients poll
+
+Every change is published on the `payment_status` realtime event to the user's
+room and appended to a short per-user log in Redis with an increasing `seq`.
+A reconnecting client calls get_payment_events(since=<last seq>) to fetch only
+what it missed; `reset: true` means the log no longer reaches back that far and
+a full status fetch is needed.
+"""
+
+import frappe
+from frappe.utils import cint, now_datetime
+
+from .auth import jwt_required, get_authenticated_user
+
+REALTIME_EVENT = "payment_status"
+EVENT_LOG_KEY = "rockettradeline:payment_events:{}"
+EVENT_SEQ_KEY = "rockettradeline:payment_events:seq:{}"
+EVENT_LOG_SIZE = 200
+EVENT_LOG_TTL = 7 * 24 * 60 * 60
+
+# Payment Request fields carried in the delta when they change
+WATCHED_FIELDS = (
+    "status", "approval_status", "transaction_id", "rejection_reason",
+    "approved_at", "verified_at", "completed_at"
+)
+
+
+def build_delta(name, cart_id, changes):
+    return {
+        "payment_request": name,
+        "cart_id": cart_id,
+        **{field: str(value) if value is not None and not isinstance(value, (str, int, float)) else value
+            for field, value in changes.items()}
+    }
+
+
+def queue_payment_event(user, delta):
+    """Publish a delta to the user once the current transaction commits"""
+    if not user or user == "Guest":
+        return
+    frappe.db.after_commit.add(lambda: publish_payment_event(user, delta))
+
+
+def publish_payment_event(user, delta):
+    cache = frappe.cache()
+    seq = cache.incr(cache.make_key(EVENT_SEQ_KEY.format(user)))
+    event = {"seq": seq, "at": str(now_datetime()), **delta}
+
+    log_key = cache.make_key(EVENT_LOG_KEY.format(user))
+    pipe = cache.pipeline(transaction=False)
+    pipe.zadd(log_key, {frappe.as_json(event, indent=None): seq})
+    pipe.zremrangebyrank(log_key, 0, -(EVENT_LOG_SIZE + 1))
+    pipe.expire(log_key, EVENT_LOG_TTL)
+    pipe.expire(cache.make_key(EVENT_SEQ_KEY.format(user)), EVENT_LOG_TTL)
+    pipe.execute()
+
+    frappe.publish_realtime(REALTIME_EVENT, event, user=user)
+
+
+def get_event_cursor(user):
+    """Latest seq for a user; clients start listening from here after a full fetch"""
+    cache = frappe.cache()
+    return cint(cache.get(cache.make_key(EVENT_SEQ_KEY.format(user))))
+
+
+def on_payment_request_change(doc):
+    """Called from PaymentRequest.on_update"""
+    changes = {field: doc.get(field) for field in WATCHED_FIELDS if doc.has_value_changed(field)}
+    if not changes:
+        return
+    changes.setdefault("status", doc.status)
+    queue_payment_event(doc.created_by or doc.owner, build_delta(doc.name, doc.cart_id, changes))
+
+
+def queue_bulk_payment_events(rows, changes):
+    """
+    Publish deltas for rows updated with set-based SQL, which skips on_update
+    rows: dicts with name, cart_id and created_by/owner
+    """
+    for row in rows:
+        queue_payment_event(row.get("created_by") or row.get("owner"),
+            build_delta(row["name"], row.get("cart_id"), changes[row["name"]]))
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def get_payment_events(since=0):
+    """Payment status events after `since` for the current user, oldest first"""
+    try:
+        current_user = get_authenticated_user()
+        if not current_user or current_user == "Guest":
+            return {"success": False, "error": "Authentication required"}
+
+        since = cint(since)
+        cache = frappe.cache()
+        latest = get_event_cursor(current_user)
+        rows = cache.zrangebyscore(cache.make_key(EVENT_LOG_KEY.format(current_user)), since + 1, "+inf")
+        events = [frappe.parse_json(frappe.safe_decode(row)) for row in rows]
+
+        # Events between `since` and the oldest retained one were trimmed away,
+        # or `since` is ahead of the log (it expired and the sequence restarted)
+        oldest = events[0]["seq"] if events else latest + 1
+        reset = since > latest or (since > 0 and oldest > since + 1)
+
+        return {
+            "success": True,
+            "events": events,
+            "cursor": latest,
+            "reset": reset,
+            "realtime_event": REALTIME_EVENT
+        }
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
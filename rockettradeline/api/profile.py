@@ -0,0 +1,177 @@
+import frappe
+from frappe.utils import cstr
+import json
+from rockettradeline.api.utils import get_customer_for_user
+
+# Profile read model used by get_current_user / get_profile.
+# Each section is cached per user in a Redis hash and built only when requested.
+
+PROFILE_CACHE_TTL = 6 * 60 * 60
+
+USER_FIELDS = [
+    "name", "email", "full_name", "user_image", "birth_date", "phone",
+    "role_profile_name", "user_type", "enabled", "creation"
+]
+
+CUSTOMER_FLAG_FIELDS = ["is_seller", "has_signed_agreement", "is_questionnaire_filled"]
+
+SYSTEM_FIELDS = ["docstatus", "idx", "owner", "modified_by", "creation", "modified"]
+
+# Optional sections loaded only when listed in `include`
+OPTIONAL_SECTIONS = ["customer_children", "files", "role_profile"]
+
+
+def _cache_key(user):
+    return f"rockettradeline:profile:{user}"
+
+
+def _parse_list(value):
+    """Accept a JSON list or a comma separated string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith("["):
+            value = json.loads(value)
+        else:
+            value = value.split(",")
+    return [cstr(v).strip() for v in value if cstr(v).strip()]
+
+
+def _get_section(user, section, builder):
+    """Return a cached profile section, building it on a miss"""
+    cache = frappe.cache()
+    key = _cache_key(user)
+
+    data = cache.hget(key, section)
+    if data is None:
+        data = builder(user)
+        cache.hset(key, section, data)
+        cache.expire(cache.make_key(key), PROFILE_CACHE_TTL)
+
+    return data
+
+
+def _build_user(user):
+    data = frappe.db.get_value("User", user, USER_FIELDS, as_dict=True) or {}
+    if data.get("creation"):
+        data["creation"] = data.creation.strftime("%Y-%m-%d %H:%M:%S")
+    data["roles"] = frappe.get_all("Has Role",
+        filters={"parent": user, "parenttype": "User"},
+        pluck="role"
+    )
+    return data
+
+
+def _build_customer(user):
+    """Customer scalar fields only (no child tables)"""
+    customer_name = get_customer_for_user(user)
+    if not customer_name:
+        return {}
+
+    customer = frappe.db.get_value("Customer", customer_name, "*", as_dict=True) or {}
+    for field in CUSTOMER_FLAG_FIELDS:
+        customer[field] = bool(customer.get(field))
+    for field in SYSTEM_FIELDS:
+        customer.pop(field, None)
+
+    return customer
+
+
+def _build_customer_children(user):
+    customer_name = get_customer_for_user(user)
+    if not customer_name:
+        return {}
+
+    children = {}
+    for df in frappe.get_meta("Customer").get_table_fields():
+        children[df.fieldname] = frappe.get_all(df.options,
+            filters={"parent": customer_name, "parenttype": "Customer", "parentfield": df.fieldname},
+            fields=["*"],
+            order_by="idx asc"
+        )
+    return children
+
+
+def _build_files(user):
+    return frappe.get_all("File",
+        filters={"owner": user},
+        fields=[
+            "name", "file_name", "file_url", "file_size", "file_type",
+            "is_private", "folder", "attached_to_doctype", "attached_to_name",
+            "creation", "modified", "content_hash"
+        ],
+        order_by="creation desc"
+    )
+
+
+def _build_role_profile(user):
+    role_profile_name = frappe.db.get_value("User", user, "role_profile_name")
+    if not role_profile_name or not frappe.db.exists("Role Profile", role_profile_name):
+        return {}
+
+    role_profile = frappe.get_cached_doc("Role Profile", role_profile_name)
+    return {
+        "name": role_profile.name,
+        "role_profile": role_profile.role_profile,
+        "roles": [{"role": role.role} for role in role_profile.roles],
+        "creation": role_profile.creation,
+        "modified": role_profile.modified
+    }
+
+
+def _sparse(data, wanted):
+    if not wanted:
+        return data
+    return {k: v for k, v in data.items() if k in wanted}
+
+
+def get_profile_data(user, fields=None, include=None):
+    """
+    Build the profile payload for a user.
+
+    fields: sparse fieldset, e.g. "full_name,email,customer.customer_name".
+        Plain names select User fields, "customer.<field>" selects Customer fields.
+    include: optional sections - customer_children, files, role_profile.
+    """
+    fields = _parse_list(fields)
+    include = [s for s in _parse_list(include) if s in OPTIONAL_SECTIONS]
+
+    user_fields = [f for f in fields if "." not in f]
+    customer_fields = [f.split(".", 1)[1] for f in fields if f.startswith("customer.")]
+
+    result = {"user": dict(_sparse(_get_section(user, "user", _build_user), user_fields))}
+
+    # Skip the customer section entirely if only user fields were requested
+    if not fields or customer_fields or "customer_children" in include:
+        customer = _get_section(user, "customer", _build_customer)
+        if customer:
+            customer = dict(_sparse(customer, customer_fields))
+            if "customer_children" in include:
+                customer.update(_get_section(user, "customer_children", _build_customer_children))
+            result["customer"] = customer
+
+    if "files" in include:
+        result["files"] = _get_section(user, "files", _build_files)
+
+    if "role_profile" in include:
+        result["user"]["role_profile"] = _get_section(user, "role_profile", _build_role_profile)
+
+    return result
+
+
+def clear_profile_cache(user):
+    if user:
+        frappe.cache().delete_value(_cache_key(user))
+
+
+def invalidate_profile_cache(doc, method=None):
+    """doc_events hook for User, Customer and File"""
+    if doc.doctype == "User":
+        clear_profile_cache(doc.name)
+    elif doc.doctype == "Customer":
+        clear_profile_cache(doc.get("user"))
+        if doc.get("email_id") != doc.get("user"):
+            clear_profile_cache(doc.get("email_id"))
+    elif doc.doctype == "File":
+        frappe.cache().hdel(_cache_key(doc.owner), "files")
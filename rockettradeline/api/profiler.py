@@ -0,0 +1,167 @@
+"""
+RocketTradeline Request Profiler
+Opt-in stack-sampling profiler for live API requests
+
+A request is profiled when either
+- it carries `X-Rockettradeline-Profile: <key>` matching `rockettradeline_profiler_key`
+  in site_config.json, or
+- it is picked by `rockettradeline_profile_sample_rate` (0..1) in site_config.json.
+
+While the request runs, a sampler thread records the request thread's stack every
+`rockettradeline_profile_interval_ms` (default 5 ms) and the SQL timeline is captured
+through the instrumentation SQL wrapper. The result is stored in Redis keyed by a
+request ID, returned in the `X-Rockettradeline-Profile-Id` response header.
+With neither setting configured the hook returns after two config lookups.
+"""
+
+import frappe
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from rockettradeline.api.instrumentation import add_finish_callback, add_sql_listener, start_request_instrumentation
+from rockettradeline.api.utils import normalize_query
+
+PROFILE_HEADER = "X-Rockettradeline-Profile"
+PROFILE_ID_HEADER = "X-Rockettradeline-Profile-Id"
+PROFILE_KEY = "rockettradeline:profiles:{}"
+RECENT_PROFILES_KEY = "rockettradeline:profiles:recent"
+PROFILE_TTL = 24 * 60 * 60
+MAX_RECENT_PROFILES = 100
+MAX_SQL_EVENTS = 2000
+
+
+class StackSampler(threading.Thread):
+    """Sample one thread's Python stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True, name="rockettradeline-profiler")
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                frame = frame.f_back
+
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=1)
+
+
+def _should_profile():
+    key = frappe.conf.get("rockettradeline_profiler_key")
+    rate = frappe.conf.get("rockettradeline_profile_sample_rate")
+    if not key and not rate:
+        return False
+
+    if key and frappe.get_request_header(PROFILE_HEADER) == key:
+        return True
+
+    return bool(rate) and random.random() < float(rate)
+
+
+def before_request():
+    """before_request hook"""
+    if not _should_profile():
+        return
+
+    state = start_request_instrumentation()
+    if state is None:
+        return
+
+    started_at = frappe.utils.now()
+    interval = (frappe.conf.get("rockettradeline_profile_interval_ms") or 5) / 1000
+    sampler = StackSampler(threading.get_ident(), interval)
+    sql_events = []
+
+    def record_sql(query, args, kwargs, elapsed):
+        if len(sql_events) < MAX_SQL_EVENTS:
+            sql_events.append({
+                "offset_ms": round((time.perf_counter() - state["start"] - elapsed) * 1000, 3),
+                "duration_ms": round(elapsed * 1000, 3),
+                "query": normalize_query(query)[:1000],
+            })
+
+    def finish(state, response):
+        sampler.stop()
+        profile_id = frappe.generate_hash(length=12)
+        profile = {
+            "id": profile_id,
+            "endpoint": state["endpoint"],
+            "user": frappe.session.user if getattr(frappe.local, "session", None) else None,
+            "started_at": started_at,
+            "duration_ms": round((time.perf_counter() - state["start"]) * 1000, 3),
+            "sample_interval_ms": interval * 1000,
+            "samples": sampler.samples,
+            "sql_count": state["db_queries"],
+            "sql_ms": round(state["db_duration_seconds"] * 1000, 3),
+            "collapsed": dict(sampler.stacks),
+            "sql_timeline": sql_events,
+        }
+        store_profile(profile)
+        if response is not None:
+            response.headers[PROFILE_ID_HEADER] = profile_id
+
+    add_sql_listener(record_sql)
+    add_finish_callback(finish)
+    sampler.start()
+
+
+def store_profile(profile):
+    cache = frappe.cache()
+    cache.set_value(PROFILE_KEY.format(profile["id"]), profile, expires_in_sec=PROFILE_TTL)
+
+    summary = {k: profile[k] for k in ("id", "endpoint", "user", "started_at", "duration_ms", "samples", "sql_count", "sql_ms")}
+    cache.lpush(RECENT_PROFILES_KEY, frappe.as_json(summary, indent=None))
+    cache.ltrim(RECENT_PROFILES_KEY, 0, MAX_RECENT_PROFILES - 1)
+    cache.expire(cache.make_key(RECENT_PROFILES_KEY), PROFILE_TTL)
+
+
+@frappe.whitelist()
+def get_recent_profiles(limit=20):
+    """List recently captured profiles (System Manager only)"""
+    frappe.only_for("System Manager")
+
+    rows = frappe.cache().lrange(RECENT_PROFILES_KEY, 0, frappe.utils.cint(limit) - 1) or []
+    return {
+        "success": True,
+        "profiles": [frappe.parse_json(frappe.safe_decode(row)) for row in rows]
+    }
+
+
+@frappe.whitelist()
+def get_request_profile(profile_id, output="json"):
+    """
+    Return one profile (System Manager only)
+    output="collapsed" returns flamegraph.pl / speedscope compatible text
+    """
+    frappe.only_for("System Manager")
+
+    profile = frappe.cache().get_value(PROFILE_KEY.format(profile_id))
+    if not profile:
+        frappe.local.response.http_status_code = 404
+        return {"success": False, "message": "Profile not found or expired"}
+
+    if output == "collapsed":
+        from werkzeug.wrappers import Response
+
+        lines = [f"{stack} {count}" for stack, count in sorted(profile["collapsed"].items())]
+        return Response("\n".join(lines) + "\n", mimetype="text/plain")
+
+    return {"success": True, "profile": profile}
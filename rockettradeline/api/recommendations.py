@@ -0,0 +1,233 @@
+"""
+RocketTradeline Recommendations
+Ranks tradelines for a customer from their latest questionnaire answers
+
+Each active tradeline in the catalogue snapshot becomes a row of normalized
+features (higher is better). A customer's Tradeline Feedback answers become a
+weight vector over the same features, and a recommendation is the top-K of
+features @ weights. The feature matrix is cached per snapshot version, so
+scoring one customer is a single matrix-vector product.
+
+precompute_recommendations scores every recent lead in one matrix product and
+replaces the Redis hash of top-K per lead (expiring after RECOMMENDATIONS_TTL);
+get_recommended_tradelines serves that
+result while the snapshot and the lead's latest answers are unchanged.
+"""
+
+import frappe
+import numpy as np
+from frappe.utils import add_days, cint, now_datetime
+
+from .auth import jwt_required, get_authenticated_user
+from .catalogue import get_snapshot, get_snapshot_version, snapshot_row
+
+RECOMMENDATIONS_CACHE_KEY = "rockettradeline:recommendations"
+# Slightly longer than the hourly schedule, so a skipped run cannot leave stale entries forever
+RECOMMENDATIONS_TTL = 2 * 60 * 60
+DEFAULT_TOP_K = 10
+MAX_TOP_K = 50
+PRECOMPUTE_DAYS = 30
+PRECOMPUTE_CHUNK = 1000
+
+FEATURES = ("age", "credit_limit", "low_utilization", "affordability", "availability")
+MAX_AGE_MONTHS = 240
+MAX_CREDIT_LIMIT = 50000
+
+BASE_WEIGHTS = {"age": 1.0, "credit_limit": 1.0, "low_utilization": 0.5, "affordability": 1.0, "availability": 0.25}
+
+# Weight adjustments keyed by a distinctive phrase of each questionnaire option
+PURPOSE_WEIGHTS = {
+    "buy a home": {"age": 1.0, "credit_limit": 0.5},
+    "refinance a mortgage": {"age": 1.0, "low_utilization": 0.5},
+    "buy a car": {"credit_limit": 0.5, "affordability": 0.5},
+    "personal or business loan": {"credit_limit": 1.0},
+    "other reasons": {"affordability": 0.5},
+}
+IMPORTANCE_WEIGHTS = {
+    "lower interest rates": {"low_utilization": 1.0, "age": 0.5},
+    "higher credit limits": {"credit_limit": 1.5},
+    "boost your credit score": {"age": 1.0, "low_utilization": 0.5},
+    "qualify to buy a house": {"age": 1.0, "credit_limit": 0.5},
+    "qualify to buy a car": {"credit_limit": 0.5, "affordability": 0.5},
+}
+CREDIT_BAND_WEIGHTS = {
+    "bad credit": {"age": 1.0, "low_utilization": 1.0},
+    "fair credit": {"age": 0.5, "low_utilization": 0.5},
+    "good credit": {"credit_limit": 0.5},
+    "excellent credit": {"credit_limit": 1.0, "affordability": 0.5},
+}
+DEROGATORY_WEIGHTS = {
+    "late payments": {"low_utilization": 0.5},
+    "charge-offs": {"age": 0.5, "low_utilization": 0.5},
+    "foreclosures": {"age": 1.0},
+    "bankruptcy": {"age": 1.5},
+    "repossessions": {"age": 0.5},
+}
+
+FEEDBACK_FIELDS = ["name", "submitted_by_user", "email", "question_1_why_buying", "question_2_importance",
+    "question_3_credit_score", "question_4_derogatory_marks"]
+
+# Feature matrix for the in-process snapshot version
+_local_features = {"version": None, "matrix": None}
+
+
+def build_feature_matrix(columns):
+    """(tradelines x FEATURES) matrix, each feature scaled to 0..1"""
+    if not len(columns["name"]):
+        return np.zeros((0, len(FEATURES)))
+
+    max_price = columns["price"].max()
+    max_spots = np.maximum(columns["max_spots"], 1)
+    return np.column_stack([
+        np.minimum(columns["age_months"] / MAX_AGE_MONTHS, 1.0),
+        np.minimum(np.log1p(columns["credit_limit"]) / np.log1p(MAX_CREDIT_LIMIT), 1.0),
+        1.0 - np.clip(columns["utilization"], 0, 100) / 100,
+        1.0 - columns["price"] / max_price if max_price else np.ones(len(columns["price"])),
+        np.clip(columns["remaining_spots"] / max_spots, 0, 1),
+    ]).astype(np.float64)
+
+
+def get_feature_matrix():
+    """Snapshot columns and their feature matrix, cached per snapshot version"""
+    columns = get_snapshot()
+    version = get_snapshot_version()
+    if _local_features["version"] != version or _local_features["matrix"] is None:
+        _local_features.update({"version": version, "matrix": build_feature_matrix(columns)})
+    return columns, _local_features["matrix"]
+
+
+def profile_weights(feedback=None):
+    """Weight vector over FEATURES for a Tradeline Feedback row (or the default profile)"""
+    weights = dict(BASE_WEIGHTS)
+    if feedback:
+        for field, table in (
+            ("question_1_why_buying", PURPOSE_WEIGHTS),
+            ("question_2_importance", IMPORTANCE_WEIGHTS),
+            ("question_3_credit_score", CREDIT_BAND_WEIGHTS),
+            ("question_4_derogatory_marks", DEROGATORY_WEIGHTS),
+        ):
+            answer = (feedback.get(field) or "").lower()
+            for phrase, adjustments in table.items():
+                if phrase in answer:
+                    for feature, weight in adjustments.items():
+                        weights[feature] += weight
+
+    vector = np.array([weights[feature] for feature in FEATURES], dtype=np.float64)
+    return vector / vector.sum()
+
+
+def top_k(scores, available, k):
+    """Indices of the k best available scores, best first"""
+    scores = np.where(available, scores, -np.inf)
+    k = min(k, int(available.sum()))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+def recommend(feedback=None, k=DEFAULT_TOP_K):
+    """Top-k (snapshot index, score) pairs for one questionnaire"""
+    columns, matrix = get_feature_matrix()
+    scores = matrix @ profile_weights(feedback)
+    best = top_k(scores, columns["remaining_spots"] > 0, k)
+    return columns, [(i, float(scores[i])) for i in best]
+
+
+def get_latest_feedback(user):
+    feedback = frappe.get_all("Tradeline Feedback",
+        or_filters={"submitted_by_user": user, "email": user},
+        fields=FEEDBACK_FIELDS,
+        order_by="submission_date desc, creation desc",
+        limit=1
+    )
+    return feedback[0] if feedback else None
+
+
+def precompute_recommendations(days=PRECOMPUTE_DAYS, k=DEFAULT_TOP_K):
+    """
+    Score every lead with feedback in the last `days` and cache their top-k
+    Scheduled hourly; one (leads x features) @ (features x tradelines) product per chunk
+    """
+    rows = frappe.get_all("Tradeline Feedback",
+        filters={"submission_date": [">=", add_days(now_datetime(), -cint(days))]},
+        fields=FEEDBACK_FIELDS,
+        order_by="submission_date desc, creation desc"
+    )
+
+    # Latest answers per lead, keyed like get_recommended_tradelines looks them up
+    leads = {}
+    for row in rows:
+        leads.setdefault(row.submitted_by_user if row.submitted_by_user not in (None, "", "Guest") else row.email, row)
+    leads.pop(None, None)
+    leads.pop("", None)
+
+    columns, matrix = get_feature_matrix()
+    version = get_snapshot_version()
+    available = columns["remaining_spots"] > 0
+    subjects = list(leads)
+    cache = frappe.cache()
+    # Build a fresh hash and swap it in, dropping leads that left the window
+    staging_key = f"{RECOMMENDATIONS_CACHE_KEY}:building"
+    cache.delete_value(staging_key)
+
+    for start in range(0, len(subjects), PRECOMPUTE_CHUNK):
+        chunk = subjects[start:start + PRECOMPUTE_CHUNK]
+        weights = np.vstack([profile_weights(leads[subject]) for subject in chunk])
+        scores = weights @ matrix.T
+        for row, subject in enumerate(chunk):
+            best = top_k(scores[row], available, k)
+            cache.hset(staging_key, subject, {
+                "version": version,
+                "feedback": leads[subject].name,
+                "k": k,
+                "tradelines": [(str(columns["name"][i]), float(scores[row][i])) for i in best],
+            })
+
+    if subjects:
+        cache.rename(cache.make_key(staging_key), cache.make_key(RECOMMENDATIONS_CACHE_KEY))
+        cache.expire(cache.make_key(RECOMMENDATIONS_CACHE_KEY), RECOMMENDATIONS_TTL)
+    else:
+        cache.delete_value(RECOMMENDATIONS_CACHE_KEY)
+
+    return {"leads": len(subjects), "tradelines": len(columns["name"])}
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def get_recommended_tradelines(limit=DEFAULT_TOP_K):
+    """Tradelines ranked for the current user's latest questionnaire answers"""
+    try:
+        current_user = get_authenticated_user()
+        if not current_user or current_user == "Guest":
+            return {"success": False, "error": "Authentication required"}
+
+        limit = min(max(cint(limit), 1), MAX_TOP_K)
+        feedback = get_latest_feedback(current_user)
+
+        columns, matrix = get_feature_matrix()
+        version = get_snapshot_version()
+        cached = frappe.cache().hget(RECOMMENDATIONS_CACHE_KEY, current_user)
+        index = {name: i for i, name in enumerate(columns["name"])} if cached else None
+
+        if (cached and feedback and cached["version"] == version and cached["feedback"] == feedback.name
+                and cached["k"] >= limit and all(name in index for name, _ in cached["tradelines"][:limit])):
+            ranked = [(index[name], score) for name, score in cached["tradelines"][:limit]]
+        else:
+            _, ranked = recommend(feedback, limit)
+
+        tradelines = []
+        for i, score in ranked:
+            tradeline = snapshot_row(columns, i)
+            tradeline["score"] = round(score, 4)
+            tradelines.append(tradeline)
+
+        return {
+            "success": True,
+            "tradelines": tradelines,
+            "personalized": bool(feedback),
+            "feedback": feedback.name if feedback else None
+        }
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
@@ -0,0 +1,566 @@
+"""
+RocketTradeline Payment Reconciliation
+Matches exported P2P / bank statements against pending Payment Requests
+
+Statement files (CSV from Zelle, CashApp, Venmo or a bank, or OFX) are uploaded
+as private Files and reconciled in a background job:
+- rows are streamed, never loaded whole, and processed in chunks of BATCH_SIZE
+- pending Payment Requests in the lookback window are loaded once into an
+  in-memory index keyed by (payment_method, amount in cents)
+- a first pass verifies rows with exactly one candidate in the date window
+  whose sender matches; a second pass queues near misses as Payment
+  Reconciliation Match records for review, leaving their requests matchable
+"""
+
+import csv
+import hashlib
+import json
+import re
+from datetime import timedelta
+
+import frappe
+from frappe.utils import add_days, cint, flt, get_datetime, now_datetime
+
+from .auth import jwt_required, get_authenticated_user
+from .payment import is_administrator
+from .payment_events import queue_bulk_payment_events
+from .transaction import unit_of_work
+from rockettradeline.rockettradeline.doctype.sales_daily_rollup.sales_daily_rollup import track_payment_requests
+
+BATCH_SIZE = 500
+LOOKBACK_DAYS = 30
+# A payment is expected between the request's creation and this many days later
+MATCH_WINDOW_DAYS = 7
+# Fuzzy matches may differ by up to this many cents
+AMOUNT_TOLERANCE_CENTS = 100
+P2P_METHODS = ("Zelle", "CashApp", "Venmo", "Apple Cash")
+BATCH_STATUS_KEY = "rockettradeline:reconciliation:{}"
+BATCH_STATUS_TTL = 7 * 24 * 60 * 60
+
+SOURCE_METHODS = {"Zelle": "Zelle", "CashApp": "CashApp", "Venmo": "Venmo", "Bank": None}
+
+# Header aliases seen in Zelle, Cash App, Venmo and bank CSV exports (lowercased)
+COLUMN_ALIASES = {
+    "date": ("date", "datetime", "transaction date", "posted date", "posting date", "date/time"),
+    "amount": ("amount", "amount (total)", "net amount", "total", "credit"),
+    "sender": ("from", "sender", "name", "sender name", "payer", "counterparty"),
+    "reference": ("transaction id", "id", "reference", "reference number", "confirmation", "confirmation number"),
+    "memo": ("memo", "note", "notes", "description", "details"),
+    "direction": ("type", "transaction type", "debit/credit", "credit/debit", "dr/cr", "cr/dr"),
+}
+
+# Direction / OFX TRNTYPE values that always mean money left the account. Venmo's
+# "Payment" type covers both directions, so it is left to the amount's sign
+DEBIT_TYPES = {"debit", "dr", "d", "withdrawal", "sent", "fee", "srvchg", "atm", "pos",
+    "check", "directdebit", "repeatpmt"}
+
+SENDER_PREFIX = re.compile(
+    r"^\s*(zelle|venmo|cash\s*app|square\s*cash|apple\s*cash)?\s*(payment|transfer)?\s*(from)?\s*",
+    re.IGNORECASE
+)
+
+
+def normalize_sender(value):
+    """Comparable form of a name, email, handle or phone number"""
+    value = SENDER_PREFIX.sub("", str(value or "")).lower()
+    digits = re.sub(r"\D", "", value)
+    if len(digits) >= 10 and len(digits) >= len(re.sub(r"[\W_]", "", value)) - 1:
+        return digits[-10:]
+    return re.sub(r"[^a-z0-9@.]", "", value.lstrip("$@"))
+
+
+def _method_from_text(text):
+    text = (text or "").lower()
+    for method in P2P_METHODS:
+        if method.lower().replace(" ", "") in text.replace(" ", ""):
+            return method
+    return None
+
+
+def parse_amount_cents(amount, direction=None):
+    """
+    Signed amount in cents; bank debits come as -50.00, (50.00), 50.00- or
+    $50.00 DR, or as a positive amount with a debit direction / TRNTYPE
+    """
+    text = str(amount or "").strip().upper()
+    negative = text.startswith("(") and text.endswith(")")
+    if text.endswith("DR"):
+        negative, text = True, text[:-2].strip()
+    elif text.endswith("CR"):
+        text = text[:-2].strip()
+    if text.endswith("-"):
+        negative, text = True, text[:-1].strip()
+
+    cents = int(round(flt(re.sub(r"[^\d.\-]", "", text) or 0) * 100))
+    # Word match, so "ACH_DEBIT" or "Payment Sent" count too
+    if negative or set(re.split(r"[^a-z]+", (direction or "").lower())) & DEBIT_TYPES:
+        cents = -abs(cents)
+    return cents
+
+
+def _row(source, date, amount, sender, reference, memo, raw, direction=None):
+    amount_cents = parse_amount_cents(amount, direction)
+    if amount_cents <= 0 or not date:
+        # Only incoming payments can settle a request
+        return None
+
+    payment_method = SOURCE_METHODS.get(source) or _method_from_text(f"{sender} {memo}")
+    raw_json = json.dumps(raw, default=str, sort_keys=True)
+    return {
+        "source": source,
+        "payment_method": payment_method,
+        "transaction_date": date,
+        "amount_cents": amount_cents,
+        "sender": (sender or "").strip()[:140],
+        "sender_key": normalize_sender(sender),
+        "reference": (reference or "").strip()[:140],
+        "raw_row": raw_json,
+        "row_hash": hashlib.sha1(f"{source}|{raw_json}".encode()).hexdigest(),
+    }
+
+
+def _parse_date(value):
+    try:
+        return get_datetime(value)
+    except Exception:
+        return None
+
+
+def iter_csv_rows(path, source):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = None
+        for values in reader:
+            if header is None:
+                # Some exports put a title above the header row
+                lowered = [v.strip().lower() for v in values]
+                if any(v in COLUMN_ALIASES["amount"] for v in lowered):
+                    header = {}
+                    for key, aliases in COLUMN_ALIASES.items():
+                        header[key] = next((lowered.index(a) for a in aliases if a in lowered), None)
+                    columns = lowered
+                continue
+
+            def get(key):
+                index = header[key]
+                return values[index] if index is not None and index < len(values) else None
+
+            row = _row(source, _parse_date(get("date")), get("amount"), get("sender"), get("reference"),
+                get("memo"), dict(zip(columns, values)), get("direction"))
+            if row:
+                yield row
+
+
+OFX_TAG = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def iter_ofx_rows(path, source):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        transaction = None
+        for line in f:
+            for tag, value in OFX_TAG.findall(line):
+                tag = tag.upper()
+                if tag == "STMTTRN":
+                    transaction = {}
+                elif transaction is not None:
+                    transaction[tag] = value.strip()
+            if transaction is not None and "</STMTTRN>" in line.upper():
+                posted = transaction.get("DTPOSTED", "")[:14]
+                date = _parse_date(f"{posted[:4]}-{posted[4:6]}-{posted[6:8]} {posted[8:10] or '00'}:"
+                    f"{posted[10:12] or '00'}:{posted[12:14] or '00'}") if len(posted) >= 8 else None
+                row = _row(source, date, transaction.get("TRNAMT"), transaction.get("NAME"),
+                    transaction.get("FITID"), transaction.get("MEMO"), transaction, transaction.get("TRNTYPE"))
+                transaction = None
+                if row:
+                    yield row
+
+
+def iter_statement_rows(path, source):
+    """Stream normalized incoming transactions from a CSV or OFX statement"""
+    if path.lower().endswith((".ofx", ".qfx")):
+        return iter_ofx_rows(path, source)
+    return iter_csv_rows(path, source)
+
+
+class CandidateIndex:
+    """Pending Payment Requests keyed by (payment_method, amount in cents)"""
+
+    def __init__(self, requests):
+        self.by_key = {}
+        for request in requests:
+            request.sender_keys = self._sender_keys(request)
+            key = (request.payment_method, int(round(flt(request.total_amount) * 100)))
+            self.by_key.setdefault(key, []).append(request)
+
+    @staticmethod
+    def _sender_keys(request):
+        values = [request.customer_name, request.customer_email, (request.customer_email or "").split("@")[0]]
+        try:
+            payment_data = json.loads(request.payment_data or "{}")
+        except ValueError:
+            payment_data = {}
+        if isinstance(payment_data, dict):
+            values += [payment_data.get(k) for k in ("sender_email", "sender_phone", "sender_name",
+                "cashtag", "venmo_username", "phone_number")]
+        return {key for key in map(normalize_sender, values) if len(key) >= 3}
+
+    @staticmethod
+    def _sender_matches(row, request):
+        key = row["sender_key"]
+        if not key:
+            return False
+        return any(key == k or (len(k) >= 5 and (k in key or key in k)) for k in request.sender_keys)
+
+    def _in_window(self, row, request):
+        created = get_datetime(request.created_at or request.creation)
+        # Date-only statements post at midnight; allow a day of slack before creation
+        return created - timedelta(days=1) <= row["transaction_date"] <= created + timedelta(days=MATCH_WINDOW_DAYS)
+
+    def match_exact(self, row):
+        """Return the one candidate with this exact amount whose sender matches, removing it from the index"""
+        methods = [row["payment_method"]] if row["payment_method"] else P2P_METHODS
+        exact = [request for method in methods for request in self.by_key.get((method, row["amount_cents"]), ())
+            if self._in_window(row, request) and self._sender_matches(row, request)]
+        if len(exact) != 1:
+            return None
+        self._take(exact[0])
+        return exact[0]
+
+    def match_fuzzy(self, row):
+        """
+        Return (score, request) for the best near miss, or (0, None)
+        The request stays in the index: a reviewer may reject the suggestion
+        """
+        methods = [row["payment_method"]] if row["payment_method"] else P2P_METHODS
+
+        fuzzy = []
+        for method in methods:
+            for delta in range(-AMOUNT_TOLERANCE_CENTS, AMOUNT_TOLERANCE_CENTS + 1):
+                for request in self.by_key.get((method, row["amount_cents"] + delta), ()):
+                    if not self._in_window(row, request):
+                        continue
+                    sender = self._sender_matches(row, request)
+                    if delta == 0 and sender:
+                        # Left over by match_exact, so one of several identical candidates
+                        score = 0.9
+                    else:
+                        score = 1 - abs(delta) / (AMOUNT_TOLERANCE_CENTS * 2) - (0 if sender else 0.3)
+                    fuzzy.append((round(score, 3), request))
+
+        if fuzzy:
+            return max(fuzzy, key=lambda f: f[0])
+        return 0, None
+
+    def _take(self, request):
+        key = (request.payment_method, int(round(flt(request.total_amount) * 100)))
+        self.by_key[key].remove(request)
+
+
+def load_candidates():
+    return frappe.db.sql("""
+        SELECT name, payment_method, total_amount, created_at, creation,
+            customer_name, customer_email, payment_data
+        FROM `tabPayment Request`
+        WHERE payment_method IN %(methods)s
+            AND status IN ('Pending', 'Draft')
+            AND verified_at IS NULL
+            AND created_at >= %(since)s
+    """, {"methods": P2P_METHODS, "since": add_days(now_datetime(), -LOOKBACK_DAYS)}, as_dict=True)
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+MATCH_FIELDS = [
+    "name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+    "batch_id", "source", "payment_method", "transaction_date", "amount", "sender", "reference",
+    "status", "match_type", "score", "payment_request", "row_hash", "raw_row"
+]
+
+
+def verify_matched_requests(names, user):
+    """Mark exactly matched Payment Requests verified in one statement"""
+    if not names:
+        return
+    rows = frappe.get_all(
+        "Payment Request",
+        filters={"name": ["in", names], "status": ["in", ["Pending", "Draft"]]},
+        fields=["name", "cart_id", "created_by", "owner"]
+    )
+    timestamp = now_datetime()
+    with track_payment_requests(names):
+        # MariaDB applies SET assignments left to right, so approved_* see the new approval_status
+        frappe.db.sql("""
+            UPDATE `tabPayment Request`
+            SET status = 'Verified', verified_by = %(user)s, verified_at = %(now)s,
+                approval_status = IF(approval_status = 'Pending Approval', 'Approved', approval_status),
+                approved_by = IF(approval_status = 'Approved' AND approved_by IS NULL, %(user)s, approved_by),
+                approved_at = IF(approval_status = 'Approved' AND approved_at IS NULL, %(now)s, approved_at),
+                modified = %(now)s, modified_by = %(user)s
+            WHERE name IN %(names)s AND status IN ('Pending', 'Draft')
+        """, {"user": user, "now": timestamp, "names": tuple(names)})
+
+    queue_bulk_payment_events(rows, {row.name: {"status": "Verified", "verified_at": timestamp} for row in rows})
+
+
+def _seen_hashes(chunk):
+    return set(frappe.get_all(
+        "Payment Reconciliation Match",
+        filters={"row_hash": ["in", [row["row_hash"] for row in chunk]]},
+        pluck="row_hash"
+    ))
+
+
+def _match_record(row, idx, timestamp, batch_id, source, user, status, match_type, score, request):
+    return (
+        frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0, idx,
+        batch_id, source, row["payment_method"] or (request.payment_method if request else None),
+        row["transaction_date"], row["amount_cents"] / 100, row["sender"], row["reference"],
+        status, match_type, score, request.name if request else None, row["row_hash"], row["raw_row"]
+    )
+
+
+def run_reconciliation(file_url, source, batch_id, user, path=None):
+    """
+    Background job: reconcile one statement file (path skips the File lookup)
+
+    The file is streamed twice. The first pass verifies every exact match, so a
+    near miss earlier in the file can never claim a request that a later row pays
+    exactly. The second pass queues the remaining rows for review.
+    """
+    stats = {"batch_id": batch_id, "status": "Running", "rows": 0, "duplicates": 0,
+        "auto_verified": 0, "pending_review": 0, "unmatched": 0, "started_at": str(now_datetime())}
+    _set_batch_status(stats)
+
+    try:
+        path = path or frappe.get_doc("File", {"file_url": file_url}).get_full_path()
+        index = CandidateIndex(load_candidates())
+        # Hashes recorded by the first pass, each consumed once by the second
+        exact_hashes = set()
+
+        for chunk in _chunks(iter_statement_rows(path, source), BATCH_SIZE):
+            seen = _seen_hashes(chunk)
+            timestamp = now_datetime()
+            records, verified = [], []
+            for idx, row in enumerate(chunk):
+                if row["row_hash"] in seen:
+                    continue
+                request = index.match_exact(row)
+                if not request:
+                    continue
+                seen.add(row["row_hash"])
+                exact_hashes.add(row["row_hash"])
+                verified.append(request.name)
+                stats["auto_verified"] += 1
+                records.append(_match_record(row, idx, timestamp, batch_id, source, user,
+                    "Auto Verified", "Exact", 1.0, request))
+
+            frappe.db.bulk_insert("Payment Reconciliation Match", MATCH_FIELDS, records, ignore_duplicates=True)
+            verify_matched_requests(verified, user)
+            frappe.db.commit()
+            _set_batch_status(stats)
+
+        for chunk in _chunks(iter_statement_rows(path, source), BATCH_SIZE):
+            seen = _seen_hashes(chunk)
+            timestamp = now_datetime()
+            records = []
+            for idx, row in enumerate(chunk):
+                stats["rows"] += 1
+                if row["row_hash"] in exact_hashes:
+                    exact_hashes.discard(row["row_hash"])
+                    continue
+                if row["row_hash"] in seen:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(row["row_hash"])
+
+                score, request = index.match_fuzzy(row)
+                if request:
+                    status, match_type = "Pending Review", "Fuzzy"
+                    stats["pending_review"] += 1
+                else:
+                    status, match_type = "Unmatched", "None"
+                    stats["unmatched"] += 1
+                records.append(_match_record(row, idx, timestamp, batch_id, source, user,
+                    status, match_type, score, request))
+
+            frappe.db.bulk_insert("Payment Reconciliation Match", MATCH_FIELDS, records, ignore_duplicates=True)
+            frappe.db.commit()
+            _set_batch_status(stats)
+
+        stats["status"] = "Completed"
+    except Exception as e:
+        frappe.db.rollback()
+        stats.update({"status": "Failed", "error": str(e)})
+        frappe.log_error(f"Reconciliation {batch_id} failed: {str(e)}", "Payment Reconciliation")
+
+    stats["finished_at"] = str(now_datetime())
+    _set_batch_status(stats)
+    return stats
+
+
+def _set_batch_status(stats):
+    frappe.cache().set_value(BATCH_STATUS_KEY.format(stats["batch_id"]), stats, expires_in_sec=BATCH_STATUS_TTL)
+
+
+def _require_admin():
+    current_user = get_authenticated_user()
+    if not current_user or current_user == "Guest":
+        return None, {"success": False, "error": "Authentication required"}
+    if not is_administrator(current_user):
+        return None, {"success": False, "error": "Insufficient permissions. Admin access required."}
+    return current_user, None
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def reconcile_statement(file_url, source="Bank"):
+    """
+    Start reconciling an uploaded statement (Admin only)
+    source: Zelle, CashApp, Venmo or Bank; bank rows infer the method from the description
+    """
+    try:
+        current_user, error = _require_admin()
+        if error:
+            return error
+
+        if source not in SOURCE_METHODS:
+            return {"success": False, "error": f"source must be one of: {', '.join(SOURCE_METHODS)}"}
+        if not frappe.db.exists("File", {"file_url": file_url}):
+            return {"success": False, "error": "File not found"}
+
+        batch_id = f"REC-{now_datetime().strftime('%Y%m%d%H%M%S')}-{frappe.generate_hash(length=6)}"
+        _set_batch_status({"batch_id": batch_id, "status": "Queued"})
+        frappe.enqueue(
+            "rockettradeline.api.reconciliation.run_reconciliation",
+            queue="long",
+            timeout=3600,
+            file_url=file_url,
+            source=source,
+            batch_id=batch_id,
+            user=current_user
+        )
+
+        return {"success": True, "batch_id": batch_id, "status": "Queued"}
+
+    except Exception as e:
+        frappe.log_error(f"Reconciliation start failed: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def get_reconciliation_status(batch_id):
+    """Progress and totals of a reconciliation run (Admin only)"""
+    try:
+        current_user, error = _require_admin()
+        if error:
+            return error
+
+        stats = frappe.cache().get_value(BATCH_STATUS_KEY.format(batch_id))
+        if not stats:
+            counts = frappe.get_all(
+                "Payment Reconciliation Match",
+                filters={"batch_id": batch_id},
+                fields=["status", "count(name) as count"],
+                group_by="status"
+            )
+            if not counts:
+                return {"success": False, "error": "Reconciliation batch not found"}
+            stats = {"batch_id": batch_id, "status": "Completed", "counts": {c.status: c.count for c in counts}}
+
+        return {"success": True, "batch": stats}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def get_reconciliation_review_queue(limit=50, start=0, batch_id=None):
+    """Fuzzy matches awaiting review, best score first (Admin only)"""
+    try:
+        current_user, error = _require_admin()
+        if error:
+            return error
+
+        filters = {"status": "Pending Review"}
+        if batch_id:
+            filters["batch_id"] = batch_id
+
+        matches = frappe.get_all(
+            "Payment Reconciliation Match",
+            filters=filters,
+            fields=["name", "batch_id", "source", "payment_method", "transaction_date", "amount",
+                "sender", "reference", "score", "payment_request"],
+            order_by="score desc, transaction_date asc",
+            limit_start=cint(start),
+            limit_page_length=cint(limit)
+        )
+
+        requests = {
+            r.name: r for r in frappe.get_all(
+                "Payment Request",
+                filters={"name": ["in", [m.payment_request for m in matches if m.payment_request]]},
+                fields=["name", "total_amount", "customer_name", "customer_email", "created_at", "status"]
+            )
+        } if matches else {}
+        for match in matches:
+            match["payment_request_details"] = requests.get(match.payment_request)
+
+        return {"success": True, "matches": matches}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+@unit_of_work()
+def resolve_reconciliation_match(match_id, action="confirm", payment_request_id=None):
+    """
+    Confirm or reject a queued match (Admin only)
+    payment_request_id reassigns the match to another request before confirming
+    """
+    try:
+        current_user, error = _require_admin()
+        if error:
+            return error
+
+        if action not in ("confirm", "reject"):
+            return {"success": False, "error": "Invalid action. Use 'confirm' or 'reject'"}
+
+        match = frappe.get_doc("Payment Reconciliation Match", match_id)
+        if match.status not in ("Pending Review", "Unmatched"):
+            return {"success": False, "error": f"Match is already {match.status.lower()}"}
+
+        if action == "confirm":
+            match.payment_request = payment_request_id or match.payment_request
+            if not match.payment_request:
+                return {"success": False, "error": "payment_request_id is required for unmatched rows"}
+            # Several suggestions may point at one request; only the first confirmation settles it
+            if frappe.db.get_value("Payment Request", match.payment_request, "status") not in ("Pending", "Draft"):
+                return {"success": False, "error": "Payment request is no longer pending"}
+            verify_matched_requests([match.payment_request], current_user)
+            match.status = "Confirmed"
+        else:
+            match.status = "Rejected"
+
+        match.reviewed_by = current_user
+        match.reviewed_at = now_datetime()
+        match.save(ignore_permissions=True)
+
+        return {"success": True, "match_id": match.name, "status": match.status,
+            "payment_request": match.payment_request}
+
+    except Exception as e:
+        frappe.log_error(f"Reconciliation review failed: {str(e)}", defer_insert=True)
+        return {"success": False, "error": str(e)}
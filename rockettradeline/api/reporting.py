@@ -0,0 +1,132 @@
+"""
+RocketTradeline Sales Reporting
+Dashboard queries over the Sales Daily Rollup table
+
+Sales Daily Rollup holds one row per (date, payment_method, status,
+approval_status) with request counts and amounts. Payment Request hooks and the
+bulk approval / reconciliation paths keep it current. A summary therefore reads
+at most a few rows per day instead of scanning `tabPayment Request`.
+"""
+
+import frappe
+from frappe.utils import add_days, get_first_day, getdate, today
+
+from .auth import jwt_required, get_authenticated_user
+from .payment import is_administrator
+
+RANGES = {"today": 0, "7d": 6, "30d": 29, "90d": 89, "365d": 364}
+PERIOD_RANGES = ("mtd", "ytd", "all")
+
+# group_by dimension -> rollup column expression
+GROUP_BY = {
+    "date": "`date`",
+    "week": "DATE_SUB(`date`, INTERVAL WEEKDAY(`date`) DAY)",
+    "month": "DATE_FORMAT(`date`, '%%Y-%%m-01')",
+    "payment_method": "payment_method",
+    "status": "status",
+    "approval_status": "approval_status",
+}
+
+# Statuses whose money has actually been received
+COLLECTED_STATUSES = ("Completed", "Verified")
+
+
+def resolve_range(range="30d", from_date=None, to_date=None):
+    """(from_date, to_date) for a named range; explicit dates win"""
+    end = getdate(to_date or today())
+    if from_date:
+        return getdate(from_date), end
+    if range in RANGES:
+        return add_days(end, -RANGES[range]), end
+    if range == "mtd":
+        return get_first_day(end), end
+    if range == "ytd":
+        return end.replace(month=1, day=1), end
+    if range == "all":
+        return None, end
+    frappe.throw(f"range must be one of: {', '.join([*RANGES, *PERIOD_RANGES])}")
+
+
+def sales_summary(range="30d", group_by="date", from_date=None, to_date=None):
+    dimensions = [d.strip() for d in (group_by or "").split(",") if d.strip()]
+    unknown = [d for d in dimensions if d not in GROUP_BY]
+    if unknown:
+        frappe.throw(f"group_by must be a comma separated list of: {', '.join(GROUP_BY)}")
+
+    start, end = resolve_range(range, from_date, to_date)
+    conditions = ["`date` <= %(end)s"] + (["`date` >= %(start)s"] if start else [])
+    columns = [f"{GROUP_BY[d]} AS `{d}`" for d in dimensions] + [
+        "SUM(request_count) AS request_count",
+        "SUM(amount) AS amount",
+        "SUM(fees) AS fees",
+        "SUM(total_amount) AS total_amount",
+        "SUM(IF(status IN %(collected)s, total_amount, 0)) AS collected_amount",
+        "SUM(IF(status IN %(collected)s, request_count, 0)) AS collected_count",
+    ]
+    group = ""
+    if dimensions:
+        group = (f"GROUP BY {', '.join(GROUP_BY[d] for d in dimensions)} "
+            f"ORDER BY {', '.join(f'`{d}`' for d in dimensions)}")
+
+    rows = frappe.db.sql(f"""
+        SELECT {", ".join(columns)}
+        FROM `tabSales Daily Rollup`
+        WHERE {" AND ".join(conditions)}
+        {group}
+    """, {"start": start, "end": end, "collected": COLLECTED_STATUSES}, as_dict=True)
+
+    totals = {field: sum(row[field] or 0 for row in rows) for field in
+        ("request_count", "amount", "fees", "total_amount", "collected_amount", "collected_count")}
+    return {
+        "from_date": str(start) if start else None,
+        "to_date": str(end),
+        "group_by": dimensions,
+        "rows": rows if dimensions else [],
+        "totals": totals,
+    }
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def get_sales_summary(range="30d", group_by="date", from_date=None, to_date=None):
+    """
+    Payment Request counts and amounts from the daily rollup (Admin only)
+    range: today, 7d, 30d, 90d, 365d, mtd, ytd or all (from_date/to_date override it)
+    group_by: comma separated date, week, month, payment_method, status, approval_status
+    """
+    try:
+        current_user = get_authenticated_user()
+        if not current_user or current_user == "Guest":
+            return {"success": False, "error": "Authentication required"}
+        if not is_administrator(current_user):
+            return {"success": False, "error": "Insufficient permissions. Admin access required."}
+
+        return {"success": True, **sales_summary(range, group_by, from_date, to_date)}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def rebuild_sales_rollups(from_date=None, to_date=None):
+    """Recompute the sales rollup from Payment Requests in a background job (Admin only)"""
+    try:
+        current_user = get_authenticated_user()
+        if not current_user or current_user == "Guest":
+            return {"success": False, "error": "Authentication required"}
+        if not is_administrator(current_user):
+            return {"success": False, "error": "Insufficient permissions. Admin access required."}
+
+        frappe.enqueue(
+            "rockettradeline.rockettradeline.doctype.sales_daily_rollup.sales_daily_rollup.rebuild_sales_rollup",
+            queue="long",
+            timeout=3600,
+            from_date=from_date,
+            to_date=to_date
+        )
+        return {"success": True, "status": "Queued"}
+
+    except Exception as e:
+        frappe.log_error(f"Sales rollup rebuild failed to start: {str(e)}")
+        return {"success": False, "error": str(e)}
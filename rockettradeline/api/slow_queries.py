@@ -0,0 +1,157 @@
+"""
+RocketTradeline Slow Query Recorder
+Captures SQL over a threshold with the API method and user that issued it
+
+Enable with `"rockettradeline_slow_query_ms": <threshold>` in site_config.json.
+`rockettradeline_explain_sample_rate` (default 0.1) controls how often a captured
+SELECT is re-run under EXPLAIN. Offenders are aggregated by normalized query in
+Redis sorted sets; only the top MAX_TRACKED_QUERIES of each are kept, and a
+query's details are dropped once it has left all of them.
+"""
+
+import frappe
+import hashlib
+import random
+
+from rockettradeline.api.instrumentation import add_sql_listener, start_request_instrumentation
+from rockettradeline.api.utils import normalize_query
+
+TOTAL_MS_KEY = "rockettradeline:slow_queries:total_ms"
+COUNT_KEY = "rockettradeline:slow_queries:count"
+MAX_MS_KEY = "rockettradeline:slow_queries:max_ms"
+DETAIL_KEY = "rockettradeline:slow_queries:detail"
+MAX_TRACKED_QUERIES = 500
+MAX_QUERY_LENGTH = 4000
+
+
+def before_request():
+    """before_request hook"""
+    threshold_ms = frappe.conf.get("rockettradeline_slow_query_ms")
+    if not threshold_ms:
+        return
+
+    state = start_request_instrumentation()
+    if state is None:
+        return
+
+    threshold = float(threshold_ms) / 1000
+    explain_rate = float(frappe.conf.get("rockettradeline_explain_sample_rate", 0.1))
+
+    def record_slow_query(query, args, kwargs, elapsed):
+        if elapsed < threshold:
+            return
+        try:
+            values = args[0] if args else kwargs.get("values", ())
+            capture(state, query, values, elapsed, explain_rate)
+        except Exception:
+            # Diagnostics must never break the request
+            pass
+
+    add_sql_listener(record_slow_query)
+
+
+def capture(state, query, values, elapsed, explain_rate):
+    query = frappe.safe_decode(str(query))
+    fingerprint = normalize_query(query)
+    digest = hashlib.sha1(fingerprint.encode()).hexdigest()[:16]
+    elapsed_ms = round(elapsed * 1000, 3)
+
+    detail = {
+        "fingerprint": fingerprint[:MAX_QUERY_LENGTH],
+        "example": query[:MAX_QUERY_LENGTH],
+        "method": state["endpoint"],
+        "user": frappe.session.user if getattr(frappe.local, "session", None) else None,
+        "duration_ms": elapsed_ms,
+        "captured_at": frappe.utils.now(),
+    }
+
+    if random.random() < explain_rate and fingerprint.startswith("select"):
+        detail["explain"] = explain(state, query, values)
+
+    previous = frappe.cache().hget(DETAIL_KEY, digest) or {}
+    if "explain" not in detail and previous.get("explain"):
+        detail["explain"] = previous["explain"]
+    detail["methods"] = sorted(set(previous.get("methods", [])) | {state["endpoint"]})[:20]
+    frappe.cache().hset(DETAIL_KEY, digest, detail)
+
+    cache = frappe.cache()
+    max_ms = cache.zscore(cache.make_key(MAX_MS_KEY), digest) or 0
+
+    pipe = cache.pipeline(transaction=False)
+    pipe.zincrby(cache.make_key(TOTAL_MS_KEY), elapsed_ms, digest)
+    pipe.zincrby(cache.make_key(COUNT_KEY), 1, digest)
+    if elapsed_ms > max_ms:
+        pipe.zadd(cache.make_key(MAX_MS_KEY), {digest: elapsed_ms})
+    # Keep only the worst offenders, noting who is trimmed
+    for key in (TOTAL_MS_KEY, COUNT_KEY, MAX_MS_KEY):
+        pipe.zrange(cache.make_key(key), 0, -(MAX_TRACKED_QUERIES + 1))
+        pipe.zremrangebyrank(cache.make_key(key), 0, -(MAX_TRACKED_QUERIES + 1))
+    results = pipe.execute()
+
+    evicted = {frappe.safe_decode(member) for trimmed in results[-6::2] for member in trimmed}
+    if evicted:
+        prune_details(cache, evicted)
+
+
+def prune_details(cache, digests):
+    """Drop details of digests that are no longer in any of the sorted sets"""
+    digests = list(digests)
+    pipe = cache.pipeline(transaction=False)
+    for digest in digests:
+        for key in (TOTAL_MS_KEY, COUNT_KEY, MAX_MS_KEY):
+            pipe.zscore(cache.make_key(key), digest)
+    scores = pipe.execute()
+
+    for i, digest in enumerate(digests):
+        if all(score is None for score in scores[i * 3:i * 3 + 3]):
+            cache.hdel(DETAIL_KEY, digest)
+
+
+def explain(state, query, values):
+    """Run EXPLAIN for the captured statement with its original parameters"""
+    try:
+        # Unwrapped sql, so the EXPLAIN itself is not measured or captured
+        return state["original_sql"](f"EXPLAIN {query}", values, as_dict=True)
+    except Exception as e:
+        return [{"error": str(e)}]
+
+
+@frappe.whitelist()
+def get_slow_query_report(limit=20, order_by="total_ms"):
+    """
+    Top-N slow queries (System Manager only)
+    order_by: total_ms, count or max_ms
+    """
+    frappe.only_for("System Manager")
+
+    keys = {"total_ms": TOTAL_MS_KEY, "count": COUNT_KEY, "max_ms": MAX_MS_KEY}
+    if order_by not in keys:
+        return {"success": False, "message": f"order_by must be one of: {', '.join(keys)}"}
+
+    cache = frappe.cache()
+    top = cache.zrevrange(cache.make_key(keys[order_by]), 0, frappe.utils.cint(limit) - 1)
+
+    queries = []
+    for digest in top:
+        digest = frappe.safe_decode(digest)
+        total_ms = cache.zscore(cache.make_key(TOTAL_MS_KEY), digest) or 0
+        count = cache.zscore(cache.make_key(COUNT_KEY), digest) or 0
+        detail = cache.hget(DETAIL_KEY, digest) or {}
+        queries.append({
+            "id": digest,
+            "total_ms": round(total_ms, 3),
+            "count": int(count),
+            "avg_ms": round(total_ms / count, 3) if count else None,
+            "max_ms": cache.zscore(cache.make_key(MAX_MS_KEY), digest),
+            **detail
+        })
+
+    return {"success": True, "queries": queries}
+
+
+@frappe.whitelist()
+def reset_slow_queries():
+    """Clear the slow query aggregates (System Manager only)"""
+    frappe.only_for("System Manager")
+    frappe.cache().delete_value([TOTAL_MS_KEY, COUNT_KEY, MAX_MS_KEY, DETAIL_KEY])
+    return {"success": True, "message": "Slow query report reset"}
@@ -21,9 +21,11 @@ def get_tradelines(limit=20, start=0, search=None, filters=None):
             if isinstance(filters, str):
                 filters = json.loads(filters)
             
-            if filters.get("min_price"):
+            if filters.get("min_price") and filters.get("max_price"):
+                query_filters["price"] = ["between", [filters["min_price"], filters["max_price"]]]
+            elif filters.get("min_price"):
                 query_filters["price"] = [">=", filters["min_price"]]
-            if filters.get("max_price"):
+            elif filters.get("max_price"):
                 query_filters["price"] = ["<=", filters["max_price"]]
             if filters.get("min_credit_limit"):
                 query_filters["credit_limit"] = [">=", filters["min_credit_limit"]]
@@ -40,11 +42,17 @@ def get_tradelines(limit=20, start=0, search=None, filters=None):
             order_by="creation desc"
         )
         
-        # Get bank names
+        # Get bank names (one query for the whole page)
+        bank_ids = list({t.bank for t in tradelines if t.bank})
+        bank_names = dict(frappe.get_all("Tradeline Bank",
+            filters={"name": ["in", bank_ids]},
+            fields=["name", "bank_name"],
+            as_list=True
+        )) if bank_ids else {}
+        
         for tradeline in tradelines:
             if tradeline.bank:
-                bank_doc = frappe.get_doc("Tradeline Bank", tradeline.bank)
-                tradeline.bank_name = bank_doc.bank_name
+                tradeline.bank_name = bank_names.get(tradeline.bank)
         
         return {
             "success": True,
@@ -0,0 +1,339 @@
+"""
+RocketTradeline Bulk Tradeline Import
+Creates and updates seller inventory from a CSV, JSON Lines or JSON upload in a background job
+
+CSV and JSON Lines (.jsonl, one object per line) files are streamed. A JSON
+file (one list of objects) must be parsed whole, so it is capped at
+MAX_JSON_BYTES; use JSON Lines for anything larger. Rows are streamed and processed in chunks of BATCH_SIZE. Per chunk:
+- bank, card holder and mailing address values are resolved with one query each
+- rows naming an existing Tradeline are merged over its stored values (update);
+  rows without a name get names from one reserved block of the naming series
+- every row is checked with validate_tradeline_data; failures are reported per row
+- valid rows are written with one multi-row INSERT ... ON DUPLICATE KEY UPDATE
+
+Progress is kept in Redis (get_tradeline_import_status) and pushed to the
+importing user on the `tradeline_import_progress` realtime event.
+"""
+
+import csv
+import json
+import os
+
+import frappe
+from frappe.utils import cint, flt, now_datetime
+
+from .auth import jwt_required, get_authenticated_user
+from .catalogue import invalidate_catalogue
+from .payment import is_administrator
+from .utils import validate_tradeline_data
+
+BATCH_SIZE = 500
+MAX_INLINE_ROWS = 5000
+MAX_REPORTED_ERRORS = 1000
+MAX_JSON_BYTES = 20 * 1024 * 1024
+JSON_LINES_EXTENSIONS = (".jsonl", ".ndjson")
+IMPORT_STATUS_KEY = "rockettradeline:tradeline_import:{}"
+IMPORT_STATUS_TTL = 7 * 24 * 60 * 60
+REALTIME_EVENT = "tradeline_import_progress"
+
+# Tradeline autoname is format:{#####}, i.e. the unprefixed series with 5 digits
+TRADELINE_SERIES = ""
+TRADELINE_SERIES_DIGITS = 5
+
+IMPORT_FIELDS = ["bank", "age_year", "age_month", "credit_limit", "price", "max_spots", "closing_date",
+    "card_holder", "mailing_address", "credit_utilization_rate", "balance", "status"]
+INT_FIELDS = ("age_year", "age_month", "credit_limit", "max_spots", "closing_date")
+FLOAT_FIELDS = ("price", "credit_utilization_rate", "balance")
+STATUSES = ("Active", "InActive")
+
+# Columns written by the upsert; creation/owner/purchased_spots only apply to new rows
+UPSERT_FIELDS = ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+    *IMPORT_FIELDS, "remaining_spots", "purchased_spots"]
+UPDATE_ON_DUPLICATE = [*IMPORT_FIELDS, "modified", "modified_by"]
+
+
+def iter_import_rows(path):
+    """Stream raw row dicts from a CSV, JSON Lines or JSON (list of objects) file"""
+    if path.lower().endswith(JSON_LINES_EXTENSIONS):
+        with open(path, encoding="utf-8-sig") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Reported by prepare_chunk as an invalid row
+                    yield None
+        return
+
+    if path.lower().endswith(".json"):
+        if os.path.getsize(path) > MAX_JSON_BYTES:
+            frappe.throw(f"JSON imports are limited to {MAX_JSON_BYTES // (1024 * 1024)} MB; "
+                "upload JSON Lines (.jsonl, one object per line) for larger files")
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f)
+        if not isinstance(rows, list):
+            frappe.throw("JSON imports must be a list of tradeline objects")
+        yield from rows
+        return
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            yield {(key or "").strip().lower().replace(" ", "_"): (value or "").strip() for key, value in row.items()}
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def resolve_links(rows):
+    """Map the link values used in rows to document names, one query per doctype"""
+    values = {field: {str(row[field]).strip() for row in rows if row.get(field)}
+        for field in ("bank", "card_holder", "mailing_address")}
+    resolved = {"bank": {}, "card_holder": {}, "mailing_address": {}}
+
+    if values["bank"]:
+        for bank in frappe.get_all("Tradeline Bank",
+                or_filters={"name": ["in", list(values["bank"])], "bank_name": ["in", list(values["bank"])]},
+                fields=["name", "bank_name"]):
+            resolved["bank"][bank.name.lower()] = bank.name
+            resolved["bank"][(bank.bank_name or bank.name).lower()] = bank.name
+
+    if values["card_holder"]:
+        for holder in frappe.get_all("Card Holder",
+                or_filters={"name": ["in", list(values["card_holder"])], "email": ["in", list(values["card_holder"])]},
+                fields=["name", "email"], order_by="creation asc"):
+            resolved["card_holder"][holder.name.lower()] = holder.name
+            if holder.email:
+                resolved["card_holder"].setdefault(holder.email.lower(), holder.name)
+
+    if values["mailing_address"]:
+        for address in frappe.get_all("Mailing Address",
+                filters={"name": ["in", list(values["mailing_address"])]}, pluck="name"):
+            resolved["mailing_address"][address.lower()] = address
+
+    return resolved
+
+
+def reserve_names(count):
+    """Take `count` unused names from the Tradeline naming series, one block per round trip"""
+    names = []
+    frappe.db.sql("INSERT IGNORE INTO `tabSeries` (`name`, `current`) VALUES (%s, 0)", (TRADELINE_SERIES,))
+    while len(names) < count:
+        needed = count - len(names)
+        current = cint(frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name` = %s FOR UPDATE",
+            (TRADELINE_SERIES,))[0][0])
+        frappe.db.sql("UPDATE `tabSeries` SET `current` = %s WHERE `name` = %s", (current + needed, TRADELINE_SERIES))
+        block = [str(number).zfill(TRADELINE_SERIES_DIGITS) for number in range(current + 1, current + needed + 1)]
+        # Never let the upsert overwrite a tradeline that was named by hand
+        taken = set(frappe.get_all("Tradeline", filters={"name": ["in", block]}, pluck="name"))
+        names.extend(name for name in block if name not in taken)
+    return names
+
+
+def prepare_chunk(chunk, first_row, can_create=True, can_write=True):
+    """
+    Resolve, merge and validate a chunk; returns (valid rows, per-row errors)
+    can_create/can_write: the importing user's Tradeline permissions for new and existing rows
+    """
+    names = [str(row.get("name") or "").strip() if isinstance(row, dict) else "" for row in chunk]
+    existing = {row.name: row for row in frappe.get_all("Tradeline",
+        filters={"name": ["in", [name for name in names if name]]},
+        fields=["name", "purchased_spots", *IMPORT_FIELDS]
+    )} if any(names) else {}
+    links = resolve_links([row for row in chunk if isinstance(row, dict)])
+
+    valid, errors = [], []
+    for offset, (raw, name) in enumerate(zip(chunk, names)):
+        row_number = first_row + offset
+        if not isinstance(raw, dict):
+            errors.append({"row": row_number, "errors": ["Row must be an object"]})
+            continue
+        if name and name not in existing:
+            errors.append({"row": row_number, "name": name, "errors": [f"Tradeline {name} not found"]})
+            continue
+        if not (can_write if name else can_create):
+            errors.append({"row": row_number, "name": name or None,
+                "errors": [f"Permission denied: cannot {'update' if name else 'create'} tradelines"]})
+            continue
+
+        # Updates only change the columns the row provides
+        data = dict(existing[name]) if name else {"age_month": 0, "credit_utilization_rate": 0, "balance": 0,
+            "status": "Active", "purchased_spots": 0}
+        data.update({field: raw[field] for field in IMPORT_FIELDS if raw.get(field) not in (None, "")})
+
+        row_errors = []
+        for field in ("bank", "card_holder", "mailing_address"):
+            value = str(data.get(field) or "").strip()
+            if value:
+                data[field] = links[field].get(value.lower())
+                if not data[field] and not (name and value == existing[name][field]):
+                    row_errors.append(f"{field} {value} not found")
+                data[field] = data[field] or value
+
+        row_errors.extend(validate_tradeline_data(data))
+        if data.get("status") not in STATUSES:
+            row_errors.append(f"status must be one of: {', '.join(STATUSES)}")
+        if cint(data.get("max_spots")) < cint(data.get("purchased_spots")):
+            row_errors.append("Max spots cannot be less than purchased spots")
+
+        if row_errors:
+            errors.append({"row": row_number, "name": name or None, "errors": row_errors})
+            continue
+
+        for field in INT_FIELDS:
+            data[field] = cint(data.get(field))
+        for field in FLOAT_FIELDS:
+            data[field] = flt(data.get(field))
+        data["name"] = name or None
+        valid.append(data)
+
+    return valid, errors
+
+
+def upsert_tradelines(rows, user):
+    """Insert new and update existing tradelines with one statement; returns (inserted, updated)"""
+    new_names = iter(reserve_names(sum(1 for row in rows if not row["name"])))
+    timestamp = now_datetime()
+    values = []
+    inserted = 0
+    for row in rows:
+        if not row["name"]:
+            row["name"] = next(new_names)
+            inserted += 1
+        values.extend([row["name"], timestamp, timestamp, user, user, 0, 0,
+            *(row[field] for field in IMPORT_FIELDS),
+            row["max_spots"] - cint(row.get("purchased_spots")), cint(row.get("purchased_spots"))])
+
+    placeholders = ", ".join(["(" + ", ".join(["%s"] * len(UPSERT_FIELDS)) + ")"] * len(rows))
+    updates = ", ".join(f"`{field}` = VALUES(`{field}`)" for field in UPDATE_ON_DUPLICATE)
+    # remaining_spots follows max_spots; MariaDB applies assignments in order, so max_spots is already new
+    frappe.db.sql(f"""
+        INSERT INTO `tabTradeline` ({", ".join(f"`{field}`" for field in UPSERT_FIELDS)})
+        VALUES {placeholders}
+        ON DUPLICATE KEY UPDATE {updates}, `remaining_spots` = GREATEST(`max_spots` - `purchased_spots`, 0)
+    """, values)
+    return inserted, len(rows) - inserted
+
+
+def run_tradeline_import(import_id, user, file_url=None, rows=None):
+    """Background job: import tradelines from an uploaded file or inline rows"""
+    stats = {"import_id": import_id, "status": "Running", "processed": 0, "inserted": 0, "updated": 0,
+        "failed": 0, "errors": [], "total": len(rows) if rows is not None else None, "user": user,
+        "started_at": str(now_datetime())}
+    _set_import_status(stats, user)
+
+    try:
+        if rows is None:
+            rows = iter_import_rows(frappe.get_doc("File", {"file_url": file_url}).get_full_path())
+        can_create = frappe.has_permission("Tradeline", "create", user=user)
+        can_write = frappe.has_permission("Tradeline", "write", user=user)
+
+        for chunk in _chunks(rows, BATCH_SIZE):
+            valid, errors = prepare_chunk(chunk, stats["processed"] + 1, can_create, can_write)
+            if valid:
+                inserted, updated = upsert_tradelines(valid, user)
+                stats["inserted"] += inserted
+                stats["updated"] += updated
+            frappe.db.commit()
+
+            stats["processed"] += len(chunk)
+            stats["failed"] += len(errors)
+            stats["errors"].extend(errors[:MAX_REPORTED_ERRORS - len(stats["errors"])])
+            _set_import_status(stats, user)
+
+        stats["status"] = "Completed"
+    except Exception as e:
+        frappe.db.rollback()
+        stats.update({"status": "Failed", "error": str(e)})
+        frappe.log_error(f"Tradeline import {import_id} failed: {str(e)}", "Tradeline Import")
+    finally:
+        # The upsert bypasses Tradeline doc_events
+        invalidate_catalogue()
+
+    stats["finished_at"] = str(now_datetime())
+    _set_import_status(stats, user)
+    return stats
+
+
+def _set_import_status(stats, user):
+    frappe.cache().set_value(IMPORT_STATUS_KEY.format(stats["import_id"]), stats, expires_in_sec=IMPORT_STATUS_TTL)
+    progress = {key: value for key, value in stats.items() if key != "errors"}
+    frappe.publish_realtime(REALTIME_EVENT, progress, user=user)
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def import_tradelines(file_url=None, rows=None):
+    """
+    Start a bulk tradeline import from an uploaded CSV/JSON Lines/JSON File or a JSON list of rows
+    Rows with a `name` update that tradeline (needs write permission); rows without
+    one create a new tradeline (needs create permission)
+    """
+    try:
+        current_user = get_authenticated_user()
+        if not current_user or current_user == "Guest":
+            return {"success": False, "error": "Authentication required"}
+        can_create = frappe.has_permission("Tradeline", "create")
+        can_write = frappe.has_permission("Tradeline", "write")
+        if not (can_create or can_write):
+            return {"success": False, "error": "Permission denied"}
+
+        if rows is not None:
+            rows = json.loads(rows) if isinstance(rows, str) else rows
+            if not isinstance(rows, list):
+                return {"success": False, "error": "rows must be a list of tradeline objects"}
+            if len(rows) > MAX_INLINE_ROWS:
+                return {"success": False, "error": f"Upload a file to import more than {MAX_INLINE_ROWS} rows"}
+            updates = any(isinstance(row, dict) and row.get("name") for row in rows)
+            creates = any(not (isinstance(row, dict) and row.get("name")) for row in rows)
+            if (updates and not can_write) or (creates and not can_create):
+                return {"success": False, "error": "Permission denied"}
+        elif not file_url:
+            return {"success": False, "error": "file_url or rows is required"}
+        elif not frappe.db.exists("File", {"file_url": file_url}):
+            return {"success": False, "error": "File not found"}
+
+        import_id = f"TLI-{now_datetime().strftime('%Y%m%d%H%M%S')}-{frappe.generate_hash(length=6)}"
+        frappe.cache().set_value(IMPORT_STATUS_KEY.format(import_id),
+            {"import_id": import_id, "status": "Queued", "user": current_user}, expires_in_sec=IMPORT_STATUS_TTL)
+        frappe.enqueue(
+            "rockettradeline.api.tradeline_import.run_tradeline_import",
+            queue="long",
+            timeout=3600,
+            import_id=import_id,
+            user=current_user,
+            file_url=None if rows is not None else file_url,
+            rows=rows
+        )
+
+        return {"success": True, "import_id": import_id, "status": "Queued", "realtime_event": REALTIME_EVENT}
+
+    except Exception as e:
+        frappe.log_error(f"Tradeline import start failed: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
+@frappe.whitelist(allow_guest=True)
+@jwt_required()
+def get_tradeline_import_status(import_id):
+    """Progress, totals and per-row errors of a tradeline import"""
+    try:
+        current_user = get_authenticated_user()
+        if not current_user or current_user == "Guest":
+            return {"success": False, "error": "Authentication required"}
+        stats = frappe.cache().get_value(IMPORT_STATUS_KEY.format(import_id))
+        if not stats or (stats.get("user") != current_user and not is_administrator(current_user)):
+            return {"success": False, "error": "Import not found"}
+
+        return {"success": True, "import": stats}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
@@ -0,0 +1,70 @@
+"""
+RocketTradeline Unit of Work
+One transaction, one commit per API call
+
+    @frappe.whitelist(allow_guest=True)
+    @jwt_required()
+    @unit_of_work()
+    def approve_manual_payment(...):
+        ...
+
+The outermost unit commits once when the function returns. If it raises or
+returns {"success": False, ...}, the unit rolls back instead. Nested units join
+the outer one. Side effects that must only happen for committed data are
+registered with on_commit (or frappe.enqueue(enqueue_after_commit=True) /
+frappe.publish_realtime(after_commit=True)); they run after the single commit.
+
+Failure paths should log with frappe.log_error(..., defer_insert=True) so the
+Error Log row survives the rollback.
+"""
+
+from functools import wraps
+
+import frappe
+
+
+def on_commit(callback):
+    """Run callback once the current transaction commits; dropped on rollback"""
+    frappe.db.after_commit.add(callback)
+
+
+def in_unit_of_work():
+    return bool(frappe.local.flags.get("unit_of_work_depth"))
+
+
+def unit_of_work(rollback_on_failure=True):
+    """
+    Declare a transaction boundary around a whitelisted method
+    rollback_on_failure=False commits failure responses too, for endpoints whose
+    failure path still records state (e.g. login issuing a verification token)
+    """
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            depth = frappe.local.flags.get("unit_of_work_depth") or 0
+            frappe.local.flags.unit_of_work_depth = depth + 1
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                if not depth:
+                    frappe.db.rollback()
+                raise
+            finally:
+                frappe.local.flags.unit_of_work_depth = depth
+
+            if depth:
+                # Joined an outer unit; it owns the commit
+                return result
+
+            failed = isinstance(result, dict) and result.get("success") is False
+            if failed and rollback_on_failure:
+                frappe.db.rollback()
+            else:
+                frappe.db.commit()
+            return result
+
+        wrapper.is_unit_of_work = True
+        return wrapper
+
+    return decorator
@@ -195,3 +195,108 @@ def validate_api_key(api_key):
     except Exception as e:
         frappe.logger().error(f"Failed to validate API key: {str(e)}")
         return None
+
+# Metrics counters
+
+METRICS_COUNTERS_KEY = "rockettradeline:metrics:counters"
+
+def increment_counter(name, amount=1):
+    """
+    Increment a named counter in Redis (shared across workers)
+    """
+    try:
+        cache = frappe.cache()
+        cache.hincrby(cache.make_key(METRICS_COUNTERS_KEY), name, amount)
+    except Exception:
+        # Metrics must never break the request
+        pass
+
+def get_counters():
+    """
+    Return all counters as a dict of name -> int
+    """
+    counters = get_raw_hash(METRICS_COUNTERS_KEY)
+    return {frappe.safe_decode(k): cint(v) for k, v in counters.items()}
+
+def get_raw_hash(key):
+    """
+    HGETALL without the pickling done by frappe's RedisWrapper.hgetall
+    (for hashes written with hincrby/hincrbyfloat)
+    """
+    cache = frappe.cache()
+    return cache.execute_command("HGETALL", cache.make_key(key)) or {}
+
+# User -> Customer resolver
+
+USER_CUSTOMER_CACHE_KEY = "rockettradeline:user_customer:{}"
+USER_CUSTOMER_TTL = 60 * 60
+# Misses expire sooner, so a Customer created outside doc_events shows up quickly
+USER_CUSTOMER_MISS_TTL = 5 * 60
+
+def get_customer_for_user(user):
+    """
+    Return the Customer name linked to a user, or None
+
+    Matches Customer.user first, then Customer.email_id, in one query.
+    Results are cached per user with a TTL (misses with a shorter one) and
+    invalidated from Customer doc_events.
+    """
+    if not user or user == "Guest":
+        return None
+    
+    cache = frappe.cache()
+    customer = cache.get_value(USER_CUSTOMER_CACHE_KEY.format(user))
+    if customer is not None:
+        increment_counter("user_customer_cache_hit")
+        return customer or None
+    
+    increment_counter("user_customer_cache_miss")
+    result = frappe.db.sql("""
+        SELECT name FROM `tabCustomer`
+        WHERE user = %(user)s OR email_id = %(user)s
+        ORDER BY (user = %(user)s) DESC, creation ASC
+        LIMIT 1
+    """, {"user": user})
+    customer = result[0][0] if result else ""
+    
+    cache.set_value(USER_CUSTOMER_CACHE_KEY.format(user), customer,
+        expires_in_sec=USER_CUSTOMER_TTL if customer else USER_CUSTOMER_MISS_TTL)
+    return customer or None
+
+def clear_customer_cache(*users):
+    """Drop cached Customer mappings for the given users/emails"""
+    keys = [USER_CUSTOMER_CACHE_KEY.format(user) for user in users if user]
+    if keys:
+        frappe.cache().delete_value(keys)
+
+def invalidate_customer_cache(doc, method=None):
+    """
+    Customer doc_events hook: drop cached mappings for the old and new user/email
+    """
+    keys = {doc.get("user"), doc.get("email_id")}
+    
+    previous = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+    if previous:
+        keys.update({previous.get("user"), previous.get("email_id")})
+    
+    clear_customer_cache(*keys)
+    # Again once committed, so a concurrent reader cannot re-cache the pre-commit mapping
+    frappe.db.after_commit.add(lambda: clear_customer_cache(*keys))
+
+# SQL fingerprinting
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bin\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+
+def normalize_query(query):
+    """
+    Reduce a SQL statement to a fingerprint: literals and placeholders become ?,
+    IN (...) lists collapse to IN (?...), whitespace and case are normalized
+    """
+    query = frappe.safe_decode(str(query))
+    query = _STRING_LITERAL.sub("?", query)
+    query = re.sub(r"%\(\w+\)s|%s", "?", query)
+    query = _NUMBER_LITERAL.sub("?", query)
+    query = re.sub(r"\s+", " ", query).strip().lower()
+    return _IN_LIST.sub("in (?...)", query)
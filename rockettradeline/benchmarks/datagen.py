@@ -0,0 +1,263 @@
+"""
+Synthetic data generator for performance testing
+
+Builds a deterministic, production-sized dataset with multi-row INSERTs
+(frappe.db.bulk_insert) instead of doc.insert(), so controllers, hooks and
+naming series are bypassed and a full dataset builds in minutes:
+
+    bench --site <site> execute rockettradeline.benchmarks.datagen.run --kwargs "{'scale': 'full', 'seed': 1}"
+    bench --site <site> execute rockettradeline.benchmarks.datagen.purge
+
+Every generated row is named with the SYN- prefix (users: syn-*@example.com)
+so purge() can remove it again. The same seed always produces the same rows.
+"""
+
+import frappe
+import random
+import time
+from datetime import datetime, timedelta
+
+from rockettradeline.api.catalogue import invalidate_catalogue
+from rockettradeline.rockettradeline.doctype.sales_daily_rollup.sales_daily_rollup import rebuild_sales_rollup
+from rockettradeline.rockettradeline.doctype.tradeline_cart.tradeline_cart import clear_active_cart_pointers
+
+PREFIX = "SYN"
+BASE_DATE = datetime(2025, 1, 1)
+OWNER = "Administrator"
+
+SCALES = {
+    "small": {
+        "banks": 20, "card_holders": 20, "tradelines": 500, "users": 500,
+        "carts": 5000, "payment_requests": 2000, "feedback": 500, "files": 1000,
+    },
+    "medium": {
+        "banks": 200, "card_holders": 200, "tradelines": 5000, "users": 5000,
+        "carts": 50000, "payment_requests": 20000, "feedback": 5000, "files": 10000,
+    },
+    "full": {
+        "banks": 1000, "card_holders": 1000, "tradelines": 50000, "users": 50000,
+        "carts": 500000, "payment_requests": 200000, "feedback": 50000, "files": 100000,
+    },
+}
+
+CART_STATUSES = ["Active", "Abandoned", "Expired", "Checked Out", "Completed"]
+CART_STATUS_WEIGHTS = [15, 40, 20, 10, 15]
+PAYMENT_METHODS = ["Zelle", "CashApp", "Venmo", "Apple Cash", "PayPal"]
+PAYMENT_STATUSES = ["Pending", "Completed", "Failed", "Expired", "Verified"]
+PAYMENT_STATUS_WEIGHTS = [20, 55, 10, 10, 5]
+STATES = ["CA", "TX", "FL", "NY", "IL", "GA", "NC", "OH", "PA", "AZ"]
+
+STANDARD_FIELDS = ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx"]
+
+
+def _standard(name, created, idx=0):
+    return [name, created, created, OWNER, OWNER, 0, idx]
+
+
+def _timestamp(rng, days=365):
+    return BASE_DATE + timedelta(seconds=rng.randrange(days * 86400))
+
+
+def _insert(doctype, fields, rows, stats):
+    """Bulk insert a row generator and commit; records rows/sec in stats"""
+    start = time.perf_counter()
+    counter = {"rows": 0}
+
+    def counted():
+        for row in rows:
+            counter["rows"] += 1
+            yield row
+
+    frappe.db.bulk_insert(doctype, STANDARD_FIELDS + fields, counted(), ignore_duplicates=True)
+    frappe.db.commit()
+
+    elapsed = time.perf_counter() - start
+    stats[doctype] = {
+        "rows": counter["rows"],
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(counter["rows"] / elapsed) if elapsed else None,
+    }
+    print(f"{doctype}: {counter['rows']} rows in {elapsed:.1f}s")
+
+
+def run(scale="small", seed=1):
+    """Generate the dataset for the given scale; returns per-doctype timing stats"""
+    counts = SCALES[scale]
+    rng = random.Random(int(seed))
+    stats = {}
+
+    banks = [f"{PREFIX} Bank {i:04d}" for i in range(counts["banks"])]
+    addresses = [f"{PREFIX}-{i:05d} Main St" for i in range(counts["card_holders"])]
+    holders = [f"{PREFIX}-Holder-{i:05d}" for i in range(counts["card_holders"])]
+    tradelines = [f"{PREFIX}-TL-{i:06d}" for i in range(counts["tradelines"])]
+    users = [f"syn-{i:06d}@example.com" for i in range(counts["users"])]
+    customers = [f"{PREFIX}-CUST-{i:06d}" for i in range(counts["users"])]
+
+    _insert("Tradeline Bank", ["bank_name"],
+        (_standard(b, _timestamp(rng)) + [b] for b in banks), stats)
+
+    _insert("Mailing Address", ["street_address", "city", "state", "zipcode", "full_address"],
+        (_standard(a, _timestamp(rng)) + [a, f"City {i % 97}", STATES[i % len(STATES)], f"{10000 + i:05d}", a]
+            for i, a in enumerate(addresses)), stats)
+
+    _insert("Card Holder", ["fullname", "email", "phone", "mailing_address"],
+        (_standard(h, _timestamp(rng)) + [h, f"{h.lower()}@example.com", f"555{i:07d}", addresses[i]]
+            for i, h in enumerate(holders)), stats)
+
+    tradeline_prices = {}
+
+    def tradeline_rows():
+        for name in tradelines:
+            price = rng.choice([150, 200, 250, 300, 400, 500, 650, 800, 1000, 1200])
+            tradeline_prices[name] = price
+            max_spots = rng.randint(1, 10)
+            purchased = rng.randint(0, max_spots)
+            holder = rng.randrange(len(holders))
+            yield _standard(name, _timestamp(rng)) + [
+                rng.choice(banks), rng.randint(1, 28), price, max_spots, max_spots - purchased, purchased,
+                addresses[holder], holders[holder], "Active" if rng.random() < 0.85 else "InActive",
+                rng.choice([2500, 5000, 10000, 15000, 20000, 30000]), rng.randint(0, 30),
+                rng.randint(1, 20), rng.randint(0, 11), 0
+            ]
+
+    _insert("Tradeline", ["bank", "closing_date", "price", "max_spots", "remaining_spots", "purchased_spots",
+        "mailing_address", "card_holder", "status", "credit_limit", "credit_utilization_rate",
+        "age_year", "age_month", "balance"], tradeline_rows(), stats)
+
+    _insert("User", ["email", "first_name", "last_name", "full_name", "enabled", "user_type", "send_welcome_email"],
+        (_standard(u, _timestamp(rng)) + [u, "Syn", f"User {i}", f"Syn User {i}", 1, "Website User", 0]
+            for i, u in enumerate(users)), stats)
+
+    _insert("Has Role", ["parent", "parenttype", "parentfield", "role"],
+        ([f"{PREFIX}-ROLE-{i:06d}", BASE_DATE, BASE_DATE, OWNER, OWNER, 0, 1, u, "User", "roles", "Customer"]
+            for i, u in enumerate(users)), stats)
+
+    customer_fields = ["customer_name", "customer_type", "customer_group", "territory", "email_id"]
+    with_user = frappe.db.has_column("Customer", "user")
+    _insert("Customer", customer_fields + (["user"] if with_user else []),
+        (_standard(c, _timestamp(rng)) + [f"Syn User {i}", "Individual", "Individual", "All Territories", users[i]]
+            + ([users[i]] if with_user else [])
+            for i, c in enumerate(customers)), stats)
+
+    # Carts and their items; remember checked-out carts for payment requests
+    carts = []
+    cart_items = []
+
+    def cart_rows():
+        # Tradeline Cart allows one Active cart per user
+        active_owners = set()
+        for i in range(counts["carts"]):
+            name = f"{PREFIX}-CART-{i:07d}"
+            owner_index = rng.randrange(len(users))
+            created = _timestamp(rng)
+            status = rng.choices(CART_STATUSES, CART_STATUS_WEIGHTS)[0]
+            if status == "Active":
+                if owner_index in active_owners:
+                    status = "Abandoned"
+                active_owners.add(owner_index)
+
+            subtotal = 0
+            for idx in range(1, rng.choice([1, 1, 2, 2, 3, 4]) + 1):
+                tradeline = rng.choice(tradelines)
+                rate = tradeline_prices[tradeline]
+                subtotal += rate
+                cart_items.append([f"{name}-{idx}", created, created, OWNER, OWNER, 0, idx,
+                    name, "Tradeline Cart", "items", tradeline, tradeline, 1, rate, rate])
+
+            if status in ("Checked Out", "Completed"):
+                carts.append((name, owner_index, created, subtotal))
+
+            yield _standard(name, created) + [
+                "CART-.####", users[owner_index], customers[owner_index], status,
+                created + timedelta(days=30), subtotal, 0, 0, subtotal, created, created
+            ]
+
+    _insert("Tradeline Cart", ["naming_series", "user_id", "customer", "status", "cart_expiry",
+        "subtotal", "discount_amount", "tax_amount", "total_amount", "created_at", "modified_at"], cart_rows(), stats)
+
+    _insert("Tradeline Cart Item", ["parent", "parenttype", "parentfield", "tradeline", "tradeline_name",
+        "quantity", "rate", "amount"], iter(cart_items), stats)
+
+    payment_carts = [rng.choice(carts) for _ in range(counts["payment_requests"])] if carts else []
+    payments = []
+
+    def payment_rows():
+        for i, (cart, owner_index, cart_created, amount) in enumerate(payment_carts):
+            name = f"{PREFIX}-PAY-{i:07d}"
+            created = cart_created + timedelta(minutes=rng.randint(1, 600))
+            status = rng.choices(PAYMENT_STATUSES, PAYMENT_STATUS_WEIGHTS)[0]
+            is_manual = 1 if rng.random() < 0.6 else 0
+            approval = ("Approved" if status in ("Completed", "Verified") else "Pending Approval") if is_manual else None
+            completed_at = created + timedelta(hours=rng.randint(1, 48)) if status in ("Completed", "Verified") else None
+            fees = round(amount * 0.03, 2)
+            payments.append((name, cart, owner_index, status))
+            yield _standard(name, created) + [
+                name, rng.choice(PAYMENT_METHODS), cart, amount, fees, amount + fees, status,
+                customers[owner_index], f"Syn User {owner_index}", users[owner_index],
+                "Tradeline Cart", cart, users[owner_index], created, completed_at,
+                created + timedelta(days=1), is_manual, approval
+            ]
+
+    _insert("Payment Request", ["title", "payment_method", "cart_id", "amount", "fees", "total_amount", "status",
+        "customer", "customer_name", "customer_email", "reference_doctype", "reference_name", "created_by",
+        "created_at", "completed_at", "expiry_date", "is_manual_payment", "approval_status"], payment_rows(), stats)
+
+    def client_tradeline_rows():
+        items_by_cart = {}
+        for item in cart_items:
+            items_by_cart.setdefault(item[7], []).append(item)
+        for pay_name, cart, owner_index, status in payments:
+            if status not in ("Completed", "Verified"):
+                continue
+            for item in items_by_cart.get(cart, []):
+                name = f"{pay_name}-CT-{item[6]}"
+                yield _standard(name, item[1]) + [
+                    name, customers[owner_index], f"Syn User {owner_index}", "Active", item[1], cart,
+                    pay_name, item[10], item[10], 1, item[13], item[13]
+                ]
+
+    _insert("Client Tradelines", ["title", "customer", "customer_name", "status", "created_date", "cart",
+        "payment_request", "tradeline", "tradeline_name", "quantity", "unit_price", "total_amount"],
+        client_tradeline_rows(), stats)
+
+    meta = frappe.get_meta("Tradeline Feedback")
+    options = {f: [o for o in (meta.get_field(f).options or "").split("\n") if o] for f in (
+        "question_1_why_buying", "question_2_importance", "question_3_credit_score", "question_4_derogatory_marks")}
+
+    _insert("Tradeline Feedback", ["naming_series", "feedback_id"] + list(options) + [
+        "first_name", "last_name", "email", "submission_date", "source", "status"],
+        (_standard(f"{PREFIX}-TLF-{i:06d}", created) + ["TLF-.YYYY.-.#####", f"{PREFIX}-TLF-{i:06d}"]
+            + [rng.choice(values) for values in options.values()]
+            + ["Syn", f"User {i}", users[i % len(users)], created, "synthetic",
+               rng.choice(["New", "Contacted", "Converted", "Closed"])]
+            for i, created in ((i, _timestamp(rng)) for i in range(counts["feedback"]))), stats)
+
+    _insert("File", ["file_name", "file_url", "is_private", "file_size", "folder",
+        "attached_to_doctype", "attached_to_name", "attached_to_field"],
+        (_standard(f"{PREFIX}-FILE-{i:07d}", _timestamp(rng)) + [
+            f"proof-{i}.png", f"/private/files/syn-proof-{i}.png", 1, rng.randint(20_000, 2_000_000),
+            "Home/Attachments", "Payment Request", payments[i % len(payments)][0] if payments else None,
+            "proof_of_payment"]
+            for i in range(counts["files"])), stats)
+
+    # bulk_insert skips doc_events; drop the cached search snapshot and active-cart
+    # pointers and rebuild the sales rollup
+    invalidate_catalogue()
+    clear_active_cart_pointers("syn-")
+    rebuild_sales_rollup()
+    print(frappe.as_json(stats))
+    return stats
+
+
+def purge():
+    """Delete every row created by run()"""
+    for doctype in ("File", "Tradeline Feedback", "Client Tradelines", "Payment Request", "Tradeline Cart Item",
+            "Tradeline Cart", "Customer", "Has Role", "Tradeline", "Card Holder", "Mailing Address", "Tradeline Bank"):
+        frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE name LIKE %s", (f"{PREFIX}%",))
+        frappe.db.commit()
+
+    frappe.db.sql("DELETE FROM `tabUser` WHERE name LIKE %s", ("syn-%@example.com",))
+    frappe.db.commit()
+    invalidate_catalogue()
+    clear_active_cart_pointers("syn-")
+    rebuild_sales_rollup()
@@ -0,0 +1,246 @@
+"""
+Storefront and checkout load test
+
+Drives the public API of a running bench site with concurrent virtual users.
+Each user runs the journey:
+
+    browse get_tradelines -> login -> add_to_cart x N
+        -> create_manual_payment_request -> admin approve_manual_payment
+
+and the run reports throughput, p50/p95/p99 latency and error rate per step.
+
+1. Create verified shopper accounts once (reuses existing ones):
+    bench --site <site> execute rockettradeline.benchmarks.loadtest.prepare_users \\
+        --kwargs "{'count': 20, 'password': 'LoadTest#2026'}"
+
+2. Run the load test from the bench directory:
+    ./env/bin/python -m rockettradeline.benchmarks.loadtest \\
+        --base-url http://localhost:8000 --users 20 --iterations 5 \\
+        --password 'LoadTest#2026' --admin Administrator:admin \\
+        --output loadtest-results.json [--baseline previous-results.json]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from rockettradeline.benchmarks import percentile
+
+USER_EMAIL_FORMAT = "loadtest-{index}@example.com"
+STEPS = ["get_tradelines", "login", "add_to_cart", "create_manual_payment_request", "approve_manual_payment"]
+
+
+class StepRecorder:
+    """Thread-safe latency/error collection per step"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+
+    def record(self, step, duration, ok):
+        with self.lock:
+            self.samples[step].append(duration)
+            if not ok:
+                self.errors[step] += 1
+
+    def summary(self, elapsed):
+        steps = {}
+        for step in STEPS:
+            durations = self.samples[step]
+            count = len(durations)
+            steps[step] = {
+                "requests": count,
+                "errors": self.errors[step],
+                "error_rate": round(self.errors[step] / count, 4) if count else 0,
+                "throughput_rps": round(count / elapsed, 2) if elapsed else 0,
+                "mean_ms": round(sum(durations) / count * 1000, 2) if count else 0,
+                "p50_ms": round(percentile(durations, 50) * 1000, 2),
+                "p95_ms": round(percentile(durations, 95) * 1000, 2),
+                "p99_ms": round(percentile(durations, 99) * 1000, 2),
+            }
+        return steps
+
+
+class ApiClient:
+    def __init__(self, base_url, recorder, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.token = None
+
+    def call(self, step, method, http_method="POST", **params):
+        """Call a whitelisted method and record it; returns the `message` payload or None"""
+        url = f"{self.base_url}/api/method/rockettradeline.api.{method}"
+        headers = {"Authorization": self.token} if self.token else {}
+
+        start = time.perf_counter()
+        try:
+            if http_method == "GET":
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            else:
+                response = self.session.post(url, data=params, headers=headers, timeout=self.timeout)
+            payload = response.json().get("message") if response.ok else None
+        except (requests.RequestException, ValueError):
+            payload = None
+        duration = time.perf_counter() - start
+
+        ok = isinstance(payload, dict) and payload.get("success") is True
+        self.recorder.record(step, duration, ok)
+        return payload if ok else None
+
+    def login(self, email, password):
+        payload = self.call("login", "auth.login", usr=email, pwd=password)
+        self.token = payload.get("authorization_token") if payload else None
+        return bool(self.token)
+
+
+def run_journey(args, recorder, index, admin):
+    client = ApiClient(args.base_url, recorder)
+    rng = random.Random(args.seed + index)
+
+    tradeline_ids = []
+    for page in range(args.browse_pages):
+        payload = client.call("get_tradelines", "tradeline.get_tradelines", http_method="GET",
+            limit=20, start=page * 20)
+        if payload:
+            tradeline_ids.extend(t["name"] for t in payload.get("tradelines", []))
+
+    if not client.login(USER_EMAIL_FORMAT.format(index=index), args.password) or not tradeline_ids:
+        return
+
+    cart_id = None
+    for tradeline_id in rng.sample(tradeline_ids, min(args.cart_items, len(tradeline_ids))):
+        payload = client.call("add_to_cart", "cart.add_to_cart", tradeline_id=tradeline_id, quantity=1,
+            **({"cart_id": cart_id} if cart_id else {}))
+        if payload:
+            cart_id = payload.get("cart_summary", {}).get("cart_id") or cart_id
+
+    if not cart_id:
+        return
+
+    payload = client.call("create_manual_payment_request", "payment.create_manual_payment_request",
+        cart_id=cart_id, payment_method="Zelle")
+    if payload and admin:
+        admin.call("approve_manual_payment", "payment.approve_manual_payment",
+            payment_request_id=payload["payment_request_id"], approval_action="approve")
+
+
+def run(args):
+    recorder = StepRecorder()
+
+    admin = None
+    if args.admin:
+        admin_user, admin_password = args.admin.split(":", 1)
+        admin = ApiClient(args.base_url, recorder)
+        if not admin.login(admin_user, admin_password):
+            raise SystemExit("Admin login failed")
+
+    def run_user(index):
+        # A virtual user runs its journeys back to back, users run concurrently
+        for _ in range(args.iterations):
+            run_journey(args, recorder, index, admin)
+
+    started_at = datetime.utcnow().isoformat() + "Z"
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        list(pool.map(run_user, range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "started_at": started_at,
+        "config": {
+            "base_url": args.base_url,
+            "users": args.users,
+            "iterations": args.iterations,
+            "browse_pages": args.browse_pages,
+            "cart_items": args.cart_items,
+            "seed": args.seed,
+        },
+        "elapsed_sec": round(elapsed, 3),
+        "journeys": args.users * args.iterations,
+        "steps": recorder.summary(elapsed),
+    }
+
+
+def compare(results, baseline):
+    """Print p95 and error-rate deltas against a previous results file"""
+    print(f"\n{'step':<32}{'p95 ms':>12}{'baseline':>12}{'delta':>10}{'errors':>10}")
+    for step, stats in results["steps"].items():
+        before = baseline.get("steps", {}).get(step)
+        if not before or not before["p95_ms"]:
+            continue
+        delta = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        print(f"{step:<32}{stats['p95_ms']:>12}{before['p95_ms']:>12}{delta:>9.1f}%{stats['error_rate']:>10}")
+
+
+def prepare_users(count=20, password="LoadTest#2026"):
+    """bench execute helper: create verified shopper accounts with customers"""
+    import frappe
+    from rockettradeline.api.utils import get_customer_for_user
+
+    for index in range(int(count)):
+        email = USER_EMAIL_FORMAT.format(index=index)
+        if not frappe.db.exists("User", email):
+            user = frappe.get_doc({
+                "doctype": "User",
+                "email": email,
+                "first_name": "Load",
+                "last_name": f"Test {index}",
+                "user_type": "Website User",
+                "roles": [{"role": "Customer"}],
+                "send_welcome_email": 0,
+                "new_password": password
+            })
+            user.insert(ignore_permissions=True)
+        frappe.db.set_value("User", email, "email_verified", 1)
+
+        if not get_customer_for_user(email):
+            frappe.get_doc({
+                "doctype": "Customer",
+                "customer_name": f"Load Test {index}",
+                "customer_type": "Individual",
+                "customer_group": "Individual",
+                "territory": "All Territories",
+                "email_id": email,
+                "user": email
+            }).insert(ignore_permissions=True)
+
+    frappe.db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RocketTradeline storefront/checkout load test")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=3, help="journeys per virtual user")
+    parser.add_argument("--browse-pages", type=int, default=2)
+    parser.add_argument("--cart-items", type=int, default=3)
+    parser.add_argument("--password", default="LoadTest#2026", help="shopper password used by prepare_users")
+    parser.add_argument("--admin", help="user:password of an approver; approval step is skipped if omitted")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results JSON to this file")
+    parser.add_argument("--baseline", help="results JSON of a previous run to compare against")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results["steps"], indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Sign-up throughput benchmark
+
+Run against a development site:
+    bench --site <site> execute rockettradeline.benchmarks.sign_up.run --kwargs "{'count': 100}"
+
+Creates `count` throwaway users through api.auth.sign_up, reports sign-ups per
+second and latency percentiles, then deletes everything it created.
+Verification email jobs are queued as usual; run it with workers stopped
+if they should not be delivered.
+"""
+
+import frappe
+from frappe.utils import random_string
+import time
+
+from rockettradeline.benchmarks import percentile
+
+
+def run(count=50, cleanup=True):
+    """Run the sign-up benchmark and return the summary dict"""
+    from rockettradeline.api.auth import sign_up
+
+    count = int(count)
+    run_id = random_string(6).lower()
+    emails = [f"bench-{run_id}-{i}@example.com" for i in range(count)]
+    durations = []
+    failures = 0
+
+    started = time.perf_counter()
+    for email in emails:
+        t0 = time.perf_counter()
+        result = sign_up(email=email, full_name="Bench User", password=random_string(12))
+        durations.append(time.perf_counter() - t0)
+        if not result.get("success"):
+            failures += 1
+    elapsed = time.perf_counter() - started
+
+    summary = {
+        "sign_ups": count,
+        "failures": failures,
+        "elapsed_sec": round(elapsed, 3),
+        "sign_ups_per_sec": round(count / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(durations, 50) * 1000, 2),
+        "p95_ms": round(percentile(durations, 95) * 1000, 2),
+        "p99_ms": round(percentile(durations, 99) * 1000, 2),
+    }
+
+    if cleanup:
+        _cleanup(emails)
+
+    print(frappe.as_json(summary))
+    return summary
+
+
+def _cleanup(emails):
+    for email in emails:
+        for customer in frappe.get_all("Customer", filters={"email_id": email}, pluck="name"):
+            frappe.delete_doc("Customer", customer, ignore_permissions=True, force=True)
+        frappe.db.delete("Verification Token", {"user": email})
+        if frappe.db.exists("User", email):
+            frappe.delete_doc("User", email, ignore_permissions=True, force=True)
+    frappe.db.commit()
@@ -152,14 +152,50 @@ patches = [
 # Hook on document methods and events
 
 doc_events = {
+    "User": {
+        "on_update": "rockettradeline.api.profile.invalidate_profile_cache",
+        "on_trash": "rockettradeline.api.profile.invalidate_profile_cache",
+    },
+    "Customer": {
+        "after_insert": "rockettradeline.api.utils.invalidate_customer_cache",
+        "on_update": [
+            "rockettradeline.api.utils.invalidate_customer_cache",
+            "rockettradeline.api.profile.invalidate_profile_cache",
+        ],
+        "on_trash": [
+            "rockettradeline.api.utils.invalidate_customer_cache",
+            "rockettradeline.api.profile.invalidate_profile_cache",
+        ],
+    },
+    "File": {
+        "after_insert": "rockettradeline.api.profile.invalidate_profile_cache",
+        "on_trash": "rockettradeline.api.profile.invalidate_profile_cache",
+    },
     "Payment Request": {
         "on_update": "rockettradeline.rockettradeline.doctype.payment_request.payment_request.on_payment_request_update",
+    },
+    "Tradeline": {
+        "after_insert": "rockettradeline.api.catalogue.invalidate_catalogue",
+        "on_update": "rockettradeline.api.catalogue.invalidate_catalogue",
+        "on_trash": "rockettradeline.api.catalogue.invalidate_catalogue",
+    },
+    "Tradeline Bank": {
+        "on_update": "rockettradeline.api.catalogue.invalidate_catalogue",
     }
 }
 
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+    "hourly": [
+        "rockettradeline.api.recommendations.precompute_recommendations"
+    ],
+    "daily": [
+        "rockettradeline.rockettradeline.doctype.verification_token.verification_token.purge_expired_tokens"
+    ]
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"rockettradeline.tasks.all"
@@ -208,8 +244,15 @@ doc_events = {
 
 # Request Events
 # ----------------
-# before_request = ["rockettradeline.utils.before_request"]
-# after_request = ["rockettradeline.utils.after_request"]
+before_request = [
+    "rockettradeline.api.instrumentation.before_request",
+    "rockettradeline.api.profiler.before_request",
+    "rockettradeline.api.slow_queries.before_request",
+]
+after_request = [
+    "rockettradeline.api.instrumentation.after_request",
+    "rockettradeline.api.idempotency.after_request",
+]
 
 # Job Events
 # ----------
@@ -0,0 +1,8 @@
+import frappe
+
+def execute():
+    """Index the Customer columns used to resolve a customer from a user"""
+    
+    for column in ("user", "email_id"):
+        if frappe.db.has_column("Customer", column):
+            frappe.db.add_index("Customer", [column])
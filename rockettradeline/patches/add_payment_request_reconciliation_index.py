@@ -0,0 +1,11 @@
+import frappe
+
+def execute():
+    """Index the Payment Request columns load_candidates filters on"""
+
+    # First version indexed total_amount, which load_candidates never filters on;
+    # matching by amount happens in memory
+    if frappe.db.has_index("tabPayment Request", "payment_method_total_amount_created_at_index"):
+        frappe.db.sql_ddl("ALTER TABLE `tabPayment Request` DROP INDEX `payment_method_total_amount_created_at_index`")
+
+    frappe.db.add_index("Payment Request", ["payment_method", "status", "created_at"])
@@ -0,0 +1,7 @@
+from rockettradeline.rockettradeline.doctype.sales_daily_rollup.sales_daily_rollup import rebuild_sales_rollup
+
+
+def execute():
+    """Build the Sales Daily Rollup from existing Payment Requests"""
+
+    rebuild_sales_rollup()
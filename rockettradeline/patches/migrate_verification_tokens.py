@@ -0,0 +1,33 @@
+import frappe
+from frappe.utils import add_to_date, now_datetime
+from rockettradeline.rockettradeline.doctype.verification_token.verification_token import (
+    TOKEN_TTL_HOURS, hash_token
+)
+
+def execute():
+    """Move pending email verification tokens from User into the Verification Token store"""
+    
+    if not frappe.db.has_column("User", "email_verification_token"):
+        return
+    
+    users = frappe.get_all("User",
+        filters={"email_verification_token": ["is", "set"]},
+        fields=["name", "email_verification_token", "email_verification_sent_at"]
+    )
+    
+    for user in users:
+        sent_at = user.email_verification_sent_at or now_datetime()
+        frappe.get_doc({
+            "doctype": "Verification Token",
+            "user": user.name,
+            "purpose": "Email Verification",
+            "token_hash": hash_token(user.email_verification_token),
+            "expires_at": add_to_date(sent_at, hours=TOKEN_TTL_HOURS)
+        }).insert(ignore_permissions=True, ignore_if_duplicate=True)
+    
+    # Raw tokens are no longer kept on the User record
+    frappe.db.sql("""
+        UPDATE `tabUser` SET email_verification_token = NULL
+        WHERE email_verification_token IS NOT NULL
+    """)
+    frappe.db.commit()
@@ -6,6 +6,13 @@ from frappe.model.document import Document
 import json
 from decimal import Decimal
 
+REGISTRY_CACHE_KEY = "rockettradeline:payment_configurations"
+REGISTRY_VERSION_KEY = "rockettradeline:payment_configurations:version"
+
+# In-process copy of the registry, valid while its version matches Redis
+_local_registry = {"version": None, "configs": None}
+
+
 class PaymentConfiguration(Document):
     def before_insert(self):
         """Set default values before inserting"""
@@ -30,6 +37,15 @@ class PaymentConfiguration(Document):
         """Validate configuration before saving"""
         self.validate_configuration()
         self.validate_fees_and_limits()
+
+    def on_update(self):
+        clear_payment_configuration_cache()
+        # Again once committed, so a concurrent reader cannot re-cache pre-commit rows
+        frappe.db.after_commit.add(clear_payment_configuration_cache)
+
+    def on_trash(self):
+        clear_payment_configuration_cache()
+        frappe.db.after_commit.add(clear_payment_configuration_cache)
     
     def validate_configuration(self):
         """Validate payment method configuration"""
@@ -78,16 +94,7 @@ class PaymentConfiguration(Document):
     
     def calculate_fees(self, amount):
         """Calculate total fees for a given amount"""
-        amount = Decimal(str(amount or 0))
-        fixed_fee = Decimal(str(self.fixed_fee or 0))
-        percentage_fee = Decimal(str(self.percentage_fee or 0)) / 100
-        
-        total_fee = fixed_fee + (amount * percentage_fee)
-        return {
-            "fixed_fee": float(fixed_fee),
-            "percentage_fee_amount": float(amount * percentage_fee),
-            "total_fee": float(total_fee)
-        }
+        return compute_fees(build_registry_entry(self), amount)
     
     def get_payment_config(self):
         """Get payment configuration for API usage"""
@@ -210,3 +217,97 @@ class PaymentConfiguration(Document):
             'instructions': f"Send ${amount:.2f} via Apple Cash to {self.phone_number}",
             'payment_link': f"https://cash.app/{self.phone_number}" if self.phone_number else None
         }
+
+
+def build_registry_entry(config):
+    """Registry entry for a configuration: public config plus precomputed fee parameters"""
+    public = PaymentConfiguration.get_payment_config(config)
+    return {
+        **public,
+        "name": config.name,
+        "payment_method": config.payment_method,
+        "payment_type": config.payment_type,
+        "display_name": config.display_name,
+        "sort_order": config.sort_order,
+        "description": config.description,
+        "min_amount": float(config.min_amount or 0),
+        "max_amount": float(config.max_amount or 0),
+        "fixed_fee": float(config.fixed_fee or 0),
+        "percentage_fee": float(config.percentage_fee or 0),
+        # Kept as strings so fee arithmetic stays in Decimal without re-parsing floats
+        "fixed_fee_decimal": str(Decimal(str(config.fixed_fee or 0))),
+        "percentage_rate": str(Decimal(str(config.percentage_fee or 0)) / 100),
+    }
+
+
+def compute_fees(entry, amount):
+    """Fees for an amount against a registry entry"""
+    amount = Decimal(str(amount or 0))
+    fixed_fee = Decimal(entry["fixed_fee_decimal"])
+    percentage_fee_amount = amount * Decimal(entry["percentage_rate"])
+
+    return {
+        "fixed_fee": float(fixed_fee),
+        "percentage_fee_amount": float(percentage_fee_amount),
+        "total_fee": float(fixed_fee + percentage_fee_amount)
+    }
+
+
+def _load_registry():
+    configs = frappe.get_all(
+        "Payment Configuration",
+        filters={"is_active": 1},
+        fields=[
+            "name", "payment_method", "display_name", "payment_type", "is_active",
+            "min_amount", "max_amount", "fixed_fee", "percentage_fee", "icon",
+            "instructions", "description", "sort_order", "account_email",
+            "phone_number", "account_id", "qr_code", "payment_link"
+        ],
+        order_by="creation desc"
+    )
+    return [build_registry_entry(frappe._dict(config)) for config in configs]
+
+
+def get_active_payment_configs():
+    """
+    Active payment configurations, newest first
+    Served from process memory, then Redis; the DB is only read after a change
+    """
+    cache = frappe.cache()
+    version = get_registry_version()
+
+    if _local_registry["version"] == version and _local_registry["configs"] is not None:
+        return _local_registry["configs"]
+
+    registry = cache.get_value(REGISTRY_CACHE_KEY)
+    if not registry or registry.get("version") != version:
+        registry = {"version": version, "configs": _load_registry()}
+        cache.set_value(REGISTRY_CACHE_KEY, registry)
+
+    _local_registry.update(registry)
+    return registry["configs"]
+
+
+def get_registry_version():
+    """Current registry version; changes whenever a configuration is saved or deleted"""
+    cache = frappe.cache()
+    version = cache.get_value(REGISTRY_VERSION_KEY)
+    if version is None:
+        version = frappe.generate_hash(length=10)
+        cache.set_value(REGISTRY_VERSION_KEY, version)
+    return version
+
+
+def get_active_payment_config(payment_method):
+    """Registry entry for an active payment method, or None"""
+    for entry in get_active_payment_configs():
+        if entry["payment_method"] == payment_method:
+            return entry
+    return None
+
+
+def clear_payment_configuration_cache():
+    """Drop the registry everywhere; other workers notice the new version on next read"""
+    frappe.cache().set_value(REGISTRY_VERSION_KEY, frappe.generate_hash(length=10))
+    frappe.cache().delete_value(REGISTRY_CACHE_KEY)
+    _local_registry.update({"version": None, "configs": None})
@@ -0,0 +1,153 @@
+# Copyright (c) 2026, RocketTradeline and Contributors
+# See license.txt
+
+import os
+import tempfile
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import now_datetime
+
+from rockettradeline.api.reconciliation import (
+	iter_statement_rows,
+	normalize_sender,
+	parse_amount_cents,
+	run_reconciliation,
+)
+
+
+class TestPaymentReconciliationMatch(FrappeTestCase):
+	def write_statement(self, content, suffix=".csv"):
+		fd, path = tempfile.mkstemp(suffix=suffix)
+		with os.fdopen(fd, "w") as f:
+			f.write(content)
+		self.addCleanup(os.remove, path)
+		return path
+
+	def make_payment_request(self, amount, customer_name, method="Zelle"):
+		name = f"REC-TEST-{frappe.generate_hash(length=8)}"
+		now = now_datetime()
+		frappe.db.bulk_insert("Payment Request", [
+			"name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+			"title", "payment_method", "amount", "fees", "total_amount", "status",
+			"customer_name", "customer_email", "payment_data", "created_by", "created_at", "is_manual_payment",
+		], [(
+			name, now, now, "Administrator", "Administrator", 0, 0,
+			name, method, amount, 0, amount, "Pending",
+			customer_name, f"{name.lower()}@example.com", "{}", "Administrator", now, 0,
+		)])
+		return name
+
+	def reconcile(self, path, source="Zelle"):
+		batch_id = f"REC-TEST-{frappe.generate_hash(length=6)}"
+		# The job commits per chunk; keep the test inside its transaction
+		with patch.object(frappe.db, "commit"):
+			stats = run_reconciliation(None, source, batch_id, "Administrator", path=path)
+		self.assertEqual(stats["status"], "Completed", stats)
+		return stats
+
+	def test_csv_rows_are_normalized(self):
+		path = self.write_statement(
+			"Date,Amount,From,Transaction ID\n01/15/2026,$150.00,Jane Doe,ZL123\n01/15/2026,-20.00,Shop,ZL124\n"
+		)
+
+		rows = list(iter_statement_rows(path, "Zelle"))
+
+		self.assertEqual(len(rows), 1)
+		self.assertEqual(rows[0]["amount_cents"], 15000)
+		self.assertEqual(rows[0]["reference"], "ZL123")
+		self.assertEqual(rows[0]["sender_key"], normalize_sender("jane doe"))
+
+	def test_ofx_rows_are_streamed(self):
+		path = self.write_statement(
+			"<OFX><BANKTRANLIST>\n<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20260115120000[-5:EST]\n"
+			"<TRNAMT>99.50\n<FITID>F1\n<NAME>ZELLE FROM JOHN SMITH\n</STMTTRN>\n</BANKTRANLIST></OFX>\n",
+			suffix=".ofx"
+		)
+
+		rows = list(iter_statement_rows(path, "Bank"))
+
+		self.assertEqual(len(rows), 1)
+		self.assertEqual(rows[0]["amount_cents"], 9950)
+		self.assertEqual(rows[0]["payment_method"], "Zelle")
+		self.assertEqual(rows[0]["reference"], "F1")
+
+	def test_debit_amount_forms_are_negative(self):
+		self.assertEqual(parse_amount_cents("(50.00)"), -5000)
+		self.assertEqual(parse_amount_cents("$50.00 DR"), -5000)
+		self.assertEqual(parse_amount_cents("50.00-"), -5000)
+		self.assertEqual(parse_amount_cents("-$50.00"), -5000)
+		self.assertEqual(parse_amount_cents("50.00", "Debit"), -5000)
+		self.assertEqual(parse_amount_cents("50.00", "ACH_DEBIT"), -5000)
+		self.assertEqual(parse_amount_cents("$1,050.00 CR"), 105000)
+		self.assertEqual(parse_amount_cents("+ $50.00", "Payment"), 5000)
+
+	def test_debit_rows_are_skipped(self):
+		path = self.write_statement(
+			"Date,Description,Amount,Type\n"
+			"01/15/2026,Zelle to Jane Doe,(50.00),\n"
+			"01/15/2026,Zelle to Jane Doe,$50.00 DR,\n"
+			"01/15/2026,Zelle to Jane Doe,50.00-,\n"
+			"01/15/2026,Zelle to Jane Doe,50.00,Debit\n"
+			"01/15/2026,Zelle from Jane Doe,50.00,Credit\n"
+		)
+		rows = list(iter_statement_rows(path, "Bank"))
+		self.assertEqual([row["amount_cents"] for row in rows], [5000])
+
+		ofx = self.write_statement(
+			"<OFX><BANKTRANLIST>\n<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20260115\n"
+			"<TRNAMT>50.00\n<FITID>F2\n<NAME>ZELLE TO JANE DOE\n</STMTTRN>\n</BANKTRANLIST></OFX>\n",
+			suffix=".ofx"
+		)
+		self.assertEqual(list(iter_statement_rows(ofx, "Bank")), [])
+
+	def test_exact_match_is_auto_verified(self):
+		sender = f"Exact {frappe.generate_hash(length=6)}"
+		request = self.make_payment_request(123.47, sender)
+		today = now_datetime().strftime("%m/%d/%Y")
+		path = self.write_statement(
+			"Date,Amount,From,Transaction ID\n"
+			f"{today},(123.47),{sender},OUT1\n"
+			f"{today},$123.47,{sender},IN1\n"
+		)
+
+		stats = self.reconcile(path)
+
+		self.assertEqual(stats["auto_verified"], 1)
+		match = frappe.get_all("Payment Reconciliation Match", filters={"payment_request": request},
+			fields=["status", "match_type", "reference"])
+		self.assertEqual([(m.status, m.match_type, m.reference) for m in match], [("Auto Verified", "Exact", "IN1")])
+		self.assertEqual(frappe.db.get_value("Payment Request", request, "status"), "Verified")
+
+	def test_near_miss_is_queued_for_review(self):
+		sender = f"Fuzzy {frappe.generate_hash(length=6)}"
+		request = self.make_payment_request(211.13, sender)
+		today = now_datetime().strftime("%m/%d/%Y")
+		path = self.write_statement(f"Date,Amount,From,Transaction ID\n{today},$210.63,{sender},NEAR1\n")
+
+		stats = self.reconcile(path)
+
+		self.assertEqual((stats["auto_verified"], stats["pending_review"]), (0, 1))
+		match = frappe.get_all("Payment Reconciliation Match", filters={"payment_request": request},
+			fields=["status", "match_type"])
+		self.assertEqual([(m.status, m.match_type) for m in match], [("Pending Review", "Fuzzy")])
+		self.assertEqual(frappe.db.get_value("Payment Request", request, "status"), "Pending")
+
+	def test_reimport_does_not_duplicate(self):
+		sender = f"Again {frappe.generate_hash(length=6)}"
+		request = self.make_payment_request(77.31, sender)
+		today = now_datetime().strftime("%m/%d/%Y")
+		path = self.write_statement(
+			"Date,Amount,From,Transaction ID\n"
+			f"{today},$77.31,{sender},RE1\n"
+			f"{today},$12.01,Nobody {sender},RE2\n"
+		)
+
+		first = self.reconcile(path)
+		second = self.reconcile(path)
+
+		self.assertEqual((first["rows"], first["duplicates"], first["auto_verified"]), (2, 0, 1))
+		self.assertEqual((second["rows"], second["duplicates"], second["auto_verified"]), (2, 2, 0))
+		self.assertEqual(frappe.db.count("Payment Reconciliation Match", {"reference": ["in", ["RE1", "RE2"]]}), 2)
+		self.assertEqual(frappe.db.get_value("Payment Request", request, "status"), "Verified")
@@ -6,6 +6,9 @@ from frappe.model.document import Document
 from frappe.utils import now_datetime, add_days, flt
 import json
 from rockettradeline.api.payment import is_administrator
+from rockettradeline.api.utils import get_customer_for_user
+from rockettradeline.rockettradeline.doctype.payment_configuration.payment_configuration import get_active_payment_config
+from rockettradeline.rockettradeline.doctype.sales_daily_rollup.sales_daily_rollup import on_payment_request_change as update_sales_rollup
 
 
 class PaymentRequest(Document):
@@ -38,21 +41,21 @@ class PaymentRequest(Document):
             if self.cart_id:
                 cart = frappe.get_doc("Tradeline Cart", self.cart_id)
                 if cart.user_id:
-                    # Try to find customer by email
-                    customer = frappe.db.get_value("Customer", {"email_id": cart.user_id}, ["name", "customer_name"])
+                    # Try to find customer for the cart owner
+                    customer = get_customer_for_user(cart.user_id)
                     if customer:
-                        self.customer = customer[0]
-                        self.customer_name = customer[1]
+                        self.customer = customer
+                        self.customer_name = frappe.db.get_value("Customer", customer, "customer_name")
                         if not self.customer_email:
                             self.customer_email = cart.user_id
                         return
             
             # If no customer found from cart, try from customer_email
             if self.customer_email and not self.customer:
-                customer = frappe.db.get_value("Customer", {"email_id": self.customer_email}, ["name", "customer_name"])
+                customer = get_customer_for_user(self.customer_email)
                 if customer:
-                    self.customer = customer[0]
-                    self.customer_name = customer[1]
+                    self.customer = customer
+                    self.customer_name = frappe.db.get_value("Customer", customer, "customer_name")
                     return
             
             # If still no customer found, create one if we have email
@@ -120,17 +123,20 @@ class PaymentRequest(Document):
     def validate_payment_method(self):
         """Validate payment method is configured and active"""
         if self.payment_method:
-            config = frappe.db.exists("Payment Configuration", {
-                "payment_method": self.payment_method,
-                "is_active": 1
-            })
-            if not config:
+            if not get_active_payment_config(self.payment_method):
                 frappe.throw(f"Payment method {self.payment_method} is not configured or inactive")
     
     def on_update(self):
         """Handle status changes"""
         if self.has_value_changed("status"):
             self.handle_status_change()
+
+        from rockettradeline.api.payment_events import on_payment_request_change
+        on_payment_request_change(self)
+        update_sales_rollup(self)
+
+    def on_trash(self):
+        update_sales_rollup(self, "on_trash")
     
     def handle_status_change(self):
         """Handle payment status changes"""
@@ -256,11 +262,9 @@ class PaymentRequest(Document):
     
     def get_payment_config(self):
         """Get payment configuration for this request"""
-        if self.payment_method:
-            return frappe.get_doc("Payment Configuration", {
-                "payment_method": self.payment_method,
-                "is_active": 1
-            })
+        config = get_active_payment_config(self.payment_method) if self.payment_method else None
+        if config:
+            return frappe.get_cached_doc("Payment Configuration", config["name"])
         return None
     
     def create_client_tradelines(self):
@@ -292,15 +296,19 @@ def handle_expired_payments():
         fields=["name"]
     )
     
+    # One commit for the whole run; a failing row only rolls back to its savepoint
     for payment in expired_payments:
+        frappe.db.savepoint("expire_payment")
         try:
             doc = frappe.get_doc("Payment Request", payment.name)
             doc.status = "Expired"
             doc.save(ignore_permissions=True)
-            frappe.db.commit()
         except Exception as e:
+            frappe.db.rollback(save_point="expire_payment")
             frappe.log_error(f"Failed to expire payment request {payment.name}: {str(e)}")
 
+    frappe.db.commit()
+
 
 # Hook function for document events
 def on_payment_request_update(doc, method):
@@ -0,0 +1,138 @@
+# Copyright (c) 2026, RocketTradeline and contributors
+# For license information, please see license.txt
+
+from contextlib import contextmanager
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, getdate, now_datetime
+
+ROLLUP_FIELDS = ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+	"date", "payment_method", "status", "approval_status", "request_count", "amount", "fees", "total_amount"]
+
+# Payment Request fields that decide a request's rollup row and its contribution
+TRACKED_FIELDS = ("created_at", "payment_method", "status", "approval_status", "amount", "fees", "total_amount")
+
+# Rollup date of a Payment Request, in SQL
+REQUEST_DATE_SQL = "DATE(COALESCE(created_at, creation))"
+
+
+class SalesDailyRollup(Document):
+	pass
+
+
+def rollup_name(date, payment_method, status, approval_status):
+	"""Deterministic row name; must match the CONCAT_WS in rebuild_sales_rollup"""
+	return "::".join([str(getdate(date)), payment_method or "", status or "", approval_status or ""])
+
+
+def _contribution(request, sign=1):
+	"""(rollup key, [count, amount, fees, total_amount]) of one Payment Request row or doc"""
+	key = (
+		getdate(request.get("created_at") or request.get("creation") or now_datetime()),
+		request.get("payment_method") or "",
+		request.get("status") or "",
+		request.get("approval_status") or "",
+	)
+	return key, [sign, sign * flt(request.get("amount")), sign * flt(request.get("fees")),
+		sign * flt(request.get("total_amount"))]
+
+
+def apply_rollup_deltas(contributions):
+	"""Add (key, deltas) pairs to the rollup in one upsert, inside the caller's transaction"""
+	totals = {}
+	for key, deltas in contributions:
+		current = totals.setdefault(key, [0, 0.0, 0.0, 0.0])
+		for i, delta in enumerate(deltas):
+			current[i] += delta
+
+	timestamp = now_datetime()
+	values = []
+	# Sorted by name so concurrent upserts lock rows in the same order
+	for key, (count, amount, fees, total_amount) in sorted(totals.items(), key=lambda item: rollup_name(*item[0])):
+		if not count and not amount and not fees and not total_amount:
+			continue
+		values.append([rollup_name(*key), timestamp, timestamp, "Administrator", "Administrator", 0, 0,
+			*key, count, amount, fees, total_amount])
+	if not values:
+		return
+
+	frappe.db.sql(f"""
+		INSERT INTO `tabSales Daily Rollup` ({", ".join(f"`{field}`" for field in ROLLUP_FIELDS)})
+		VALUES {", ".join(["(" + ", ".join(["%s"] * len(ROLLUP_FIELDS)) + ")"] * len(values))}
+		ON DUPLICATE KEY UPDATE
+			request_count = request_count + VALUES(request_count),
+			amount = amount + VALUES(amount),
+			fees = fees + VALUES(fees),
+			total_amount = total_amount + VALUES(total_amount),
+			modified = VALUES(modified)
+	""", [value for row in values for value in row])
+
+
+def on_payment_request_change(doc, method=None):
+	"""Called from PaymentRequest.on_update and on_trash"""
+	before = doc.get_doc_before_save() if method != "on_trash" else None
+	if method == "on_trash":
+		apply_rollup_deltas([_contribution(doc, -1)])
+	elif before is None:
+		apply_rollup_deltas([_contribution(doc)])
+	elif any(before.get(field) != doc.get(field) for field in TRACKED_FIELDS):
+		apply_rollup_deltas([_contribution(before, -1), _contribution(doc)])
+
+
+def _locked_requests(names):
+	return frappe.db.sql(f"""
+		SELECT name, creation, {", ".join(TRACKED_FIELDS)}
+		FROM `tabPayment Request`
+		WHERE name IN %(names)s
+		ORDER BY name
+		FOR UPDATE
+	""", {"names": tuple(names)}, as_dict=True)
+
+
+@contextmanager
+def track_payment_requests(names):
+	"""
+	Keep the rollup in step with set-based UPDATEs, which skip on_update:
+
+		with track_payment_requests(names):
+			frappe.db.sql("UPDATE `tabPayment Request` ...")
+	"""
+	names = list(names)
+	if not names:
+		yield
+		return
+
+	# Lock the rows so nothing else moves them between the two reads
+	before = _locked_requests(names)
+	yield
+	after = _locked_requests(names)
+	apply_rollup_deltas([_contribution(row, -1) for row in before] + [_contribution(row) for row in after])
+
+
+def rebuild_sales_rollup(from_date=None, to_date=None):
+	"""Backfill: recompute rollup rows for a date range (all dates by default) from Payment Requests"""
+	conditions, params = [], {"now": now_datetime()}
+	if from_date:
+		conditions.append("{date} >= %(from_date)s")
+		params["from_date"] = getdate(from_date)
+	if to_date:
+		conditions.append("{date} <= %(to_date)s")
+		params["to_date"] = getdate(to_date)
+	rollup_where = " AND ".join(conditions).format(date="`date`") or "1 = 1"
+	request_where = " AND ".join(conditions).format(date=REQUEST_DATE_SQL) or "1 = 1"
+
+	frappe.db.sql(f"DELETE FROM `tabSales Daily Rollup` WHERE {rollup_where}", params)
+	frappe.db.sql(f"""
+		INSERT INTO `tabSales Daily Rollup` ({", ".join(f"`{field}`" for field in ROLLUP_FIELDS)})
+		SELECT
+			CONCAT_WS('::', {REQUEST_DATE_SQL}, IFNULL(payment_method, ''), IFNULL(status, ''),
+				IFNULL(approval_status, '')),
+			%(now)s, %(now)s, 'Administrator', 'Administrator', 0, 0,
+			{REQUEST_DATE_SQL}, IFNULL(payment_method, ''), IFNULL(status, ''), IFNULL(approval_status, ''),
+			COUNT(*), SUM(IFNULL(amount, 0)), SUM(IFNULL(fees, 0)), SUM(IFNULL(total_amount, 0))
+		FROM `tabPayment Request`
+		WHERE {request_where}
+		GROUP BY {REQUEST_DATE_SQL}, IFNULL(payment_method, ''), IFNULL(status, ''), IFNULL(approval_status, '')
+	""", params)
+	frappe.db.commit()
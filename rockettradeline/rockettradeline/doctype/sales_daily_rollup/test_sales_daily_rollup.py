@@ -0,0 +1,25 @@
+# Copyright (c) 2026, RocketTradeline and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from rockettradeline.rockettradeline.doctype.sales_daily_rollup.sales_daily_rollup import (
+	apply_rollup_deltas,
+	rollup_name,
+)
+
+
+class TestSalesDailyRollup(FrappeTestCase):
+	def test_deltas_accumulate_on_one_row(self):
+		key = ("2001-01-01", "Zelle", "Pending", "Pending Approval")
+		name = rollup_name(*key)
+		frappe.db.delete("Sales Daily Rollup", {"name": name})
+
+		apply_rollup_deltas([(key, [1, 100, 2, 102]), (key, [1, 50, 1, 51])])
+		apply_rollup_deltas([(key, [-1, -50, -1, -51])])
+
+		row = frappe.db.get_value("Sales Daily Rollup", name,
+			["request_count", "amount", "fees", "total_amount"], as_dict=True)
+		self.assertEqual(row.request_count, 1)
+		self.assertEqual((row.amount, row.fees, row.total_amount), (100, 2, 102))
@@ -5,6 +5,12 @@ import frappe
 from frappe.model.document import Document
 from datetime import datetime, timedelta
 import json
+from rockettradeline.api.utils import get_customer_for_user
+
+ACTIVE_CART_CACHE_KEY = "rockettradeline:active_cart:{}"
+ACTIVE_CART_TTL = 60 * 60
+# "No active cart" expires sooner, so carts written outside the controller show up quickly
+ACTIVE_CART_MISS_TTL = 5 * 60
 
 class TradelineCart(Document):
     def before_insert(self):
@@ -18,10 +24,43 @@ class TradelineCart(Document):
         
         # Get customer from user
         if self.user_id and not self.customer:
-            customer = frappe.db.get_value('Customer', {'email_id': self.user_id}, 'name')
+            customer = get_customer_for_user(self.user_id)
             if customer:
                 self.customer = customer
     
+    def validate(self):
+        """Enforce at most one Active cart per user"""
+        if self.status == "Active" and self.user_id and (self.is_new() or self.has_value_changed("status")):
+            # Lock the user row so concurrent requests for one user activate carts one at a time,
+            # even when the user has no cart rows to lock yet
+            frappe.db.sql("SELECT name FROM `tabUser` WHERE name = %s FOR UPDATE", self.user_id)
+            # Locking read: sees carts committed by whoever held the lock before us
+            other = frappe.db.sql("""
+                SELECT name FROM `tabTradeline Cart`
+                WHERE user_id = %s AND status = 'Active' AND name != %s
+                LIMIT 1
+                FOR UPDATE
+            """, (self.user_id, self.name or ""))
+            if other:
+                frappe.throw(f"User {self.user_id} already has an active cart ({other[0][0]})")
+
+    def after_insert(self):
+        if self.status == "Active":
+            update_active_cart_pointer(self.user_id, self.name)
+
+    def on_update(self):
+        """Keep the active-cart pointer in step with status transitions"""
+        if self.has_value_changed("status"):
+            previous = self.get_doc_before_save()
+            if self.status == "Active":
+                update_active_cart_pointer(self.user_id, self.name)
+            elif previous and previous.status == "Active":
+                update_active_cart_pointer(self.user_id, "")
+
+    def on_trash(self):
+        if self.status == "Active":
+            update_active_cart_pointer(self.user_id, "")
+
     def before_save(self):
         """Update calculations before saving"""
         self.modified_at = frappe.utils.now()
@@ -35,9 +74,21 @@ class TradelineCart(Document):
         if not self.items and self.status in ['Checkout', 'Completed']:
             frappe.throw("Cart cannot be empty for checkout")
         
+        # Load all tradelines in one query
+        tradeline_ids = list({item.tradeline for item in self.items if item.tradeline})
+        tradelines = {
+            t.name: t for t in frappe.get_all(
+                'Tradeline',
+                filters={'name': ['in', tradeline_ids]},
+                fields=['name', 'status', 'max_spots']
+            )
+        } if tradeline_ids else {}
+        
         for item in self.items:
             # Validate tradeline exists and is active
-            tradeline = frappe.get_doc('Tradeline', item.tradeline)
+            tradeline = tradelines.get(item.tradeline)
+            if not tradeline:
+                frappe.throw(f"Tradeline {item.tradeline} not found")
             if tradeline.status != 'Active':
                 frappe.throw(f"Tradeline {item.tradeline} is not active")
             
@@ -274,6 +325,46 @@ def get_cart_summary(cart_id):
         'is_expired': cart.is_expired()
     }
 
+def get_active_cart(user):
+    """
+    Name of the user's Active cart, or None
+
+    Served from a per-user Redis key (cart name, "" when there is none) that the
+    cart controller updates on insert and status transitions. Keys expire, so a
+    write that bypasses the controller is corrected within the TTL.
+    """
+    if not user or user == "Guest":
+        return None
+
+    cache = frappe.cache()
+    cart = cache.get_value(ACTIVE_CART_CACHE_KEY.format(user))
+    if cart is not None:
+        return cart or None
+
+    cart = frappe.db.get_value("Tradeline Cart", {"user_id": user, "status": "Active"}, "name") or ""
+    set_active_cart_pointer(user, cart)
+    return cart or None
+
+
+def set_active_cart_pointer(user, cart):
+    frappe.cache().set_value(ACTIVE_CART_CACHE_KEY.format(user), cart,
+        expires_in_sec=ACTIVE_CART_TTL if cart else ACTIVE_CART_MISS_TTL)
+
+
+def update_active_cart_pointer(user, cart):
+    """Point the user at `cart` ("" for none) once the transaction commits"""
+    if not user:
+        return
+    # Drop now so nothing reads a pointer from this transaction before it commits
+    frappe.cache().delete_value(ACTIVE_CART_CACHE_KEY.format(user))
+    frappe.db.after_commit.add(lambda: set_active_cart_pointer(user, cart))
+
+
+def clear_active_cart_pointers(user_prefix=""):
+    """Drop cached pointers for users whose name starts with user_prefix (all users by default)"""
+    frappe.cache().delete_keys(ACTIVE_CART_CACHE_KEY.format(user_prefix))
+
+
 @frappe.whitelist()
 def cleanup_expired_carts():
     """Cleanup expired carts (can be run as scheduled job)"""
@@ -0,0 +1,22 @@
+# Copyright (c) 2026, philmaxsnr@gmail.com and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from rockettradeline.rockettradeline.doctype.verification_token.verification_token import (
+	consume_token,
+	issue_token,
+	resolve_token,
+)
+
+
+class TestVerificationToken(FrappeTestCase):
+	def test_consumed_token_is_single_use(self):
+		token = issue_token("Administrator", "Password Reset")
+
+		self.assertEqual(resolve_token(token, "Password Reset", for_update=True), ("Administrator", "valid"))
+		consume_token(token, "Password Reset")
+
+		self.assertEqual(resolve_token(token, "Password Reset", for_update=True), (None, "invalid"))
+		self.assertEqual(resolve_token(token, "Email Verification"), (None, "invalid"))
@@ -0,0 +1,120 @@
+# Copyright (c) 2026, RocketTradeline and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_to_date, get_datetime, now_datetime
+import hashlib
+import secrets
+
+TOKEN_TTL_HOURS = 24
+
+
+class VerificationToken(Document):
+    pass
+
+
+def hash_token(token):
+    """Return the SHA-256 digest stored for a raw token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _raw_token_cache_key(user, purpose):
+    """Redis key holding the raw token so unexpired links can be re-sent"""
+    return f"rockettradeline:verification_token:{purpose}:{user}"
+
+
+def issue_token(user, purpose, ttl_hours=TOKEN_TTL_HOURS, reuse=False):
+    """
+    Issue a token for the user and return the raw value.
+
+    Only the digest is written to the database. With reuse=True the token
+    sent previously is returned again as long as it has not expired, so a
+    resend does not invalidate the link already sitting in the inbox.
+    """
+    cache_key = _raw_token_cache_key(user, purpose)
+
+    if reuse:
+        token = frappe.cache().get_value(cache_key)
+        if token and resolve_token(token, purpose)[1] == "valid":
+            return token
+
+    # A user only ever has one live token per purpose
+    frappe.db.delete("Verification Token", {"user": user, "purpose": purpose})
+
+    token = secrets.token_urlsafe(32)
+    frappe.get_doc({
+        "doctype": "Verification Token",
+        "user": user,
+        "purpose": purpose,
+        "token_hash": hash_token(token),
+        "expires_at": add_to_date(now_datetime(), hours=ttl_hours)
+    }).insert(ignore_permissions=True)
+
+    frappe.cache().set_value(cache_key, token, expires_in_sec=int(ttl_hours * 3600))
+    return token
+
+
+def get_active_token(user, purpose):
+    """Return the raw unexpired token for the user, if it is still cached"""
+    token = frappe.cache().get_value(_raw_token_cache_key(user, purpose))
+    if token and resolve_token(token, purpose)[1] == "valid":
+        return token
+    return None
+
+
+def resolve_token(token, purpose, for_update=False):
+    """
+    Look a raw token up by its digest (unique index, single row read).
+
+    Returns a (user, status) tuple where status is "valid", "expired" or
+    "invalid". Used tokens are reported as invalid.
+
+    for_update=True locks the row until the transaction ends, so a caller that
+    acts on the token and then consumes it is the only one to see it valid;
+    concurrent submissions of the same link wait and then find it used.
+    """
+    if not token:
+        return None, "invalid"
+
+    row = frappe.db.get_value(
+        "Verification Token",
+        {"token_hash": hash_token(token), "purpose": purpose},
+        ["user", "expires_at", "used_at"],
+        as_dict=True,
+        for_update=for_update
+    )
+
+    if not row or row.used_at:
+        return None, "invalid"
+
+    if get_datetime(row.expires_at) <= now_datetime():
+        return row.user, "expired"
+
+    return row.user, "valid"
+
+
+def consume_token(token, purpose):
+    """Mark a token as used so the link cannot be replayed"""
+    row = frappe.db.get_value(
+        "Verification Token",
+        {"token_hash": hash_token(token), "purpose": purpose},
+        ["name", "user"],
+        as_dict=True
+    )
+    if not row:
+        return
+
+    frappe.db.set_value("Verification Token", row.name, "used_at", now_datetime(), update_modified=False)
+    frappe.cache().delete_value(_raw_token_cache_key(row.user, purpose))
+
+
+def clear_cached_token(user, purpose):
+    """Forget the cached raw token, e.g. when the issuing transaction rolled back"""
+    frappe.cache().delete_value(_raw_token_cache_key(user, purpose))
+
+
+def purge_expired_tokens():
+    """Delete expired and used tokens (called by scheduler)"""
+    frappe.db.delete("Verification Token", {"expires_at": ["<", now_datetime()]})
+    frappe.db.delete("Verification Token", {"used_at": ["is", "set"]})
@@ -0,0 +1,107 @@
+"""
+Query-budget harness
+
+Counts and fingerprints the SQL issued while a function runs, and checks that
+the count stays flat as the number of related rows grows (no N+1) and within a
+declared budget.
+
+    with QueryRecorder() as recorder:
+        get_tradelines()
+    recorder.count, recorder.fingerprints()
+"""
+
+import frappe
+import inspect
+from collections import Counter
+
+from rockettradeline.api.utils import normalize_query
+
+DEFAULT_SIZES = (1, 10, 100)
+
+
+class QueryRecorder:
+    """Wrap frappe.db.sql for the duration of a with-block"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        db = frappe.db
+        original_sql = db.sql
+        self._db = db
+        self._had_override = "sql" in db.__dict__
+
+        def recording_sql(query, *args, **kwargs):
+            self.queries.append(str(query))
+            return original_sql(query, *args, **kwargs)
+
+        self._original = original_sql
+        db.sql = recording_sql
+        return self
+
+    def __exit__(self, *exc):
+        if self._had_override:
+            self._db.sql = self._original
+        else:
+            del self._db.__dict__["sql"]
+        return False
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def fingerprints(self):
+        """Counter of normalized query -> number of executions"""
+        return Counter(normalize_query(q) for q in self.queries)
+
+
+def unwrap(fn):
+    """Strip whitelist/auth decorators so endpoints can be called directly in tests"""
+    return inspect.unwrap(fn)
+
+
+def measure(fn, *args, **kwargs):
+    """Run fn once to warm caches, then return the QueryRecorder of a second run"""
+    fn(*args, **kwargs)
+    with QueryRecorder() as recorder:
+        fn(*args, **kwargs)
+    return recorder
+
+
+def assert_query_budget(testcase, scenario, budget, sizes=DEFAULT_SIZES, slack=0):
+    """
+    Run scenario(n) for each size and check the queries of the call it returns.
+
+    scenario(n) creates n related rows and returns a zero-argument callable that
+    exercises the code under test. Fails when the query count grows with n (beyond
+    `slack`) or exceeds `budget` at any size. Returns {size: QueryRecorder}.
+    """
+    results = {}
+    for size in sizes:
+        call = scenario(size)
+        results[size] = measure(call)
+
+    smallest = results[sizes[0]]
+    for size, recorder in results.items():
+        testcase.assertLessEqual(
+            recorder.count, budget,
+            f"{recorder.count} queries for n={size}, budget is {budget}:\n{_describe(recorder)}"
+        )
+        testcase.assertLessEqual(
+            recorder.count, smallest.count + slack,
+            f"Query count grows with n ({smallest.count} at n={sizes[0]}, "
+            f"{recorder.count} at n={size}):\n{_describe_growth(smallest, recorder)}"
+        )
+
+    return results
+
+
+def _describe(recorder):
+    return "\n".join(f"{count:>5} x {query}" for query, count in recorder.fingerprints().most_common())
+
+
+def _describe_growth(smaller, larger):
+    before = smaller.fingerprints()
+    after = larger.fingerprints()
+    grown = [(q, before.get(q, 0), c) for q, c in after.items() if c > before.get(q, 0)]
+    return "\n".join(f"{b:>5} -> {a:<5} {q}" for q, b, a in sorted(grown, key=lambda g: g[2] - g[1], reverse=True))
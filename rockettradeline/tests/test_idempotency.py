@@ -0,0 +1,108 @@
+# Copyright (c) 2026, RocketTradeline and Contributors
+# See license.txt
+
+import pickle
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from rockettradeline.api import idempotency
+from rockettradeline.api.idempotency import LOCK_KEY, RESPONSE_KEY, _scope, idempotent
+
+calls = []
+
+
+@idempotent(wait_timeout=1)
+def charge(amount=0):
+	calls.append(amount)
+	return {"success": True, "charged": amount}
+
+
+class TestIdempotency(FrappeTestCase):
+	def setUp(self):
+		calls.clear()
+		frappe.set_user("Administrator")
+		frappe.local.response = frappe._dict()
+		frappe.local.flags.idempotent_replayed = False
+		self.key = frappe.generate_hash(length=12)
+		header = patch.object(frappe, "get_request_header",
+			side_effect=lambda name, default=None: self.key if name == idempotency.IDEMPOTENCY_HEADER else default)
+		header.start()
+		self.addCleanup(header.stop)
+
+	def tearDown(self):
+		scope = _scope("Administrator", charge.__wrapped__, self.key)
+		frappe.cache().delete_value([RESPONSE_KEY.format(scope), LOCK_KEY.format(scope)])
+		frappe.local.form_dict = frappe._dict()
+		frappe.set_user("Administrator")
+
+	def call(self, amount):
+		frappe.local.form_dict = frappe._dict(amount=amount)
+		return charge(amount=amount)
+
+	def test_retry_replays_the_stored_response(self):
+		first = self.call(10)
+		second = self.call(10)
+
+		self.assertEqual(second, first)
+		self.assertEqual(calls, [10])
+		self.assertTrue(frappe.local.flags.idempotent_replayed)
+
+	def test_key_reused_with_other_parameters_is_rejected(self):
+		self.call(10)
+		response = self.call(20)
+
+		self.assertFalse(response["success"])
+		self.assertEqual(frappe.local.response.http_status_code, 422)
+		self.assertEqual(calls, [10])
+
+	def test_guests_are_not_deduplicated(self):
+		self.call(10)
+		frappe.set_user("Guest")
+		self.call(10)
+
+		self.assertEqual(calls, [10, 10])
+
+	def test_duplicate_waits_for_the_running_request(self):
+		cache = frappe.cache()
+		scope = _scope("Administrator", charge.__wrapped__, self.key)
+		lock_key = cache.make_key(LOCK_KEY.format(scope))
+		cache.set(lock_key, "other-request", ex=60)
+
+		def first_request_finishes(_):
+			frappe.local.form_dict = frappe._dict(amount=10)
+			cache.set(cache.make_key(RESPONSE_KEY.format(scope)), pickle.dumps({
+				"fingerprint": idempotency._fingerprint((), {"amount": 10}),
+				"response": {"success": True, "charged": 10},
+				"http_status_code": None,
+			}), ex=60)
+			cache.delete(lock_key)
+
+		with patch.object(idempotency.time, "sleep", side_effect=first_request_finishes):
+			response = self.call(10)
+
+		self.assertEqual(response, {"success": True, "charged": 10})
+		self.assertEqual(calls, [])
+
+	def test_duplicate_of_a_failed_request_gets_409(self):
+		cache = frappe.cache()
+		scope = _scope("Administrator", charge.__wrapped__, self.key)
+		lock_key = cache.make_key(LOCK_KEY.format(scope))
+		cache.set(lock_key, "other-request", ex=60)
+
+		with patch.object(idempotency.time, "sleep", side_effect=lambda _: cache.delete(lock_key)):
+			response = self.call(10)
+
+		self.assertEqual(frappe.local.response.http_status_code, 409)
+		self.assertFalse(response["success"])
+		self.assertEqual(calls, [])
+
+	def test_lock_held_by_another_request_is_not_released(self):
+		cache = frappe.cache()
+		scope = _scope("Administrator", charge.__wrapped__, self.key)
+		lock_key = cache.make_key(LOCK_KEY.format(scope))
+		cache.set(lock_key, "other-request", ex=60)
+		cache.eval(idempotency.RELEASE_LOCK_SCRIPT, 1, lock_key, "my-token")
+
+		self.assertEqual(frappe.safe_decode(cache.get(lock_key)), "other-request")
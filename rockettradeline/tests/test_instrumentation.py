@@ -0,0 +1,24 @@
+# Copyright (c) 2026, RocketTradeline and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from rockettradeline.api.instrumentation import OTHER_ENDPOINT, escape_label, resolve_endpoint
+
+
+class TestInstrumentation(FrappeTestCase):
+	def test_whitelisted_methods_keep_their_label(self):
+		path = "/api/method/rockettradeline.api.tradeline.get_tradelines"
+		self.assertEqual(resolve_endpoint(path), "rockettradeline.api.tradeline.get_tradelines")
+
+	def test_unknown_paths_share_one_label(self):
+		for path in (
+			"/api/method/rockettradeline.api.tradeline.no_such_method",
+			"/api/method/rockettradeline.nope.x",
+			"/api/method/rockettradeline.api.utils.validate_tradeline_data",
+			'/api/method/rockettradeline."}\nfake 1',
+		):
+			self.assertEqual(resolve_endpoint(path), OTHER_ENDPOINT, path)
+
+	def test_label_values_are_escaped(self):
+		self.assertEqual(escape_label('a"b\\c\nd'), 'a\\"b\\\\c\\nd')
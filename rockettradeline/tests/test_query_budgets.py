@@ -0,0 +1,130 @@
+# Copyright (c) 2026, RocketTradeline and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from rockettradeline.api import auth, cart, marketing, tradeline
+from rockettradeline.tests.query_budget import assert_query_budget, unwrap
+
+# Maximum queries per call, independent of the number of related rows
+QUERY_BUDGETS = {
+    "get_tradelines": 4,
+    "get_cart": 12,
+    "get_email_groups": 4,
+    "get_users": 3,
+    "validate_cart_items": 2,
+}
+
+
+def make_tradelines(prefix, n):
+    """Create n active tradelines, each on its own bank, and return their names"""
+    card_holder = frappe.get_doc({"doctype": "Card Holder", "fullname": f"{prefix} Holder"}).insert()
+    mailing_address = frappe.get_doc({"doctype": "Mailing Address", "street_address": f"{prefix} Street"}).insert()
+
+    names = []
+    for i in range(n):
+        bank = frappe.get_doc({"doctype": "Tradeline Bank", "bank_name": f"{prefix}-Bank-{i}"}).insert()
+        names.append(frappe.get_doc({
+            "doctype": "Tradeline",
+            "bank": bank.name,
+            "age_year": 5,
+            "credit_limit": 10000,
+            "price": 100 + i,
+            "max_spots": 5,
+            "remaining_spots": 5,
+            "purchased_spots": 0,
+            "closing_date": 15,
+            "card_holder": card_holder.name,
+            "mailing_address": mailing_address.name,
+            "status": "Active"
+        }).insert().name)
+    return names
+
+
+def make_cart(tradelines):
+    cart_doc = frappe.get_doc({
+        "doctype": "Tradeline Cart",
+        "user_id": "Administrator",
+        "status": "Draft",
+        "items": [{"tradeline": t, "quantity": 1, "rate": 100} for t in tradelines]
+    })
+    cart_doc.insert()
+    return cart_doc
+
+
+class TestQueryBudgets(FrappeTestCase):
+    def setUp(self):
+        frappe.set_user("Administrator")
+
+    def prefix(self):
+        return f"QB{frappe.generate_hash(length=6)}"
+
+    def test_get_tradelines(self):
+        get_tradelines = unwrap(tradeline.get_tradelines)
+
+        def scenario(n):
+            prefix = self.prefix()
+            make_tradelines(prefix, n)
+            return lambda: get_tradelines(limit=n, search=prefix)
+
+        assert_query_budget(self, scenario, QUERY_BUDGETS["get_tradelines"])
+
+    def test_get_cart(self):
+        get_cart = unwrap(cart.get_cart)
+
+        def scenario(n):
+            cart_doc = make_cart(make_tradelines(self.prefix(), n))
+            return lambda: get_cart(cart_id=cart_doc.name)
+
+        assert_query_budget(self, scenario, QUERY_BUDGETS["get_cart"])
+
+    def test_validate_cart_items(self):
+        def scenario(n):
+            cart_doc = make_cart(make_tradelines(self.prefix(), n))
+            return cart_doc.validate_cart_items
+
+        assert_query_budget(self, scenario, QUERY_BUDGETS["validate_cart_items"])
+
+    def test_get_email_groups(self):
+        get_email_groups = unwrap(marketing.get_email_groups)
+
+        def scenario(n):
+            prefix = self.prefix()
+            for i in range(n):
+                group = frappe.get_doc({"doctype": "Email Group", "title": f"{prefix}-{i}"}).insert()
+                frappe.get_doc({
+                    "doctype": "Email Group Member",
+                    "email_group": group.name,
+                    "email": f"{prefix.lower()}-{i}@example.com"
+                }).insert()
+            return get_email_groups
+
+        # Groups accumulate across sizes (1, 11, 111); the count must still stay flat
+        assert_query_budget(self, scenario, QUERY_BUDGETS["get_email_groups"])
+
+    def test_get_users(self):
+        get_users = unwrap(auth.get_users)
+
+        def scenario(n):
+            prefix = self.prefix().lower()
+            for i in range(n):
+                email = f"{prefix}-{i}@example.com"
+                frappe.get_doc({
+                    "doctype": "User",
+                    "email": email,
+                    "first_name": f"{prefix}-{i}",
+                    "send_welcome_email": 0
+                }).insert()
+                frappe.get_doc({
+                    "doctype": "Customer",
+                    "customer_name": f"{prefix}-{i}",
+                    "customer_type": "Individual",
+                    "customer_group": "Individual",
+                    "territory": "All Territories",
+                    "email_id": email,
+                    "user": email
+                }).insert()
+            return lambda: get_users(limit=n, search=prefix)
+
+        assert_query_budget(self, scenario, QUERY_BUDGETS["get_users"])
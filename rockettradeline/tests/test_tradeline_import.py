@@ -0,0 +1,119 @@
+# Copyright (c) 2026, RocketTradeline and Contributors
+# See license.txt
+
+import os
+import tempfile
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import cint, now_datetime
+
+from rockettradeline.api.tradeline_import import (
+	TRADELINE_SERIES,
+	TRADELINE_SERIES_DIGITS,
+	iter_import_rows,
+	run_tradeline_import,
+)
+
+CSV_HEADER = "name,bank,age_year,credit_limit,price,max_spots,closing_date,card_holder,mailing_address\n"
+
+
+class TestTradelineImport(FrappeTestCase):
+	def setUp(self):
+		suffix = frappe.generate_hash(length=6)
+		self.bank = f"Import Bank {suffix}"
+		self.holder = f"Import Holder-{suffix}"
+		self.address = f"{suffix} Import Street"
+		now = now_datetime()
+		standard = lambda name: [name, now, now, "Administrator", "Administrator", 0, 0]
+		frappe.db.bulk_insert("Tradeline Bank", ["name", "creation", "modified", "owner", "modified_by",
+			"docstatus", "idx", "bank_name"], [standard(self.bank) + [self.bank]])
+		frappe.db.bulk_insert("Card Holder", ["name", "creation", "modified", "owner", "modified_by",
+			"docstatus", "idx"], [standard(self.holder)])
+		frappe.db.bulk_insert("Mailing Address", ["name", "creation", "modified", "owner", "modified_by",
+			"docstatus", "idx"], [standard(self.address)])
+
+		self.existing = self.make_tradeline(f"IMP-{suffix}", max_spots=5, purchased_spots=2)
+
+	def make_tradeline(self, name, max_spots=5, purchased_spots=0, price=300):
+		now = now_datetime()
+		frappe.db.bulk_insert("Tradeline", ["name", "creation", "modified", "owner", "modified_by", "docstatus",
+			"idx", "bank", "age_year", "age_month", "credit_limit", "price", "max_spots", "closing_date",
+			"card_holder", "mailing_address", "credit_utilization_rate", "balance", "status",
+			"remaining_spots", "purchased_spots"], [[
+				name, now, now, "Administrator", "Administrator", 0, 0, self.bank, 5, 0, 10000, price, max_spots,
+				15, self.holder, self.address, 0, 0, "Active", max_spots - purchased_spots, purchased_spots
+			]])
+		return name
+
+	def run_import(self, csv_rows):
+		fd, path = tempfile.mkstemp(suffix=".csv")
+		with os.fdopen(fd, "w") as f:
+			f.write(CSV_HEADER + csv_rows)
+		self.addCleanup(os.remove, path)
+
+		# The job commits per chunk; keep the test inside its transaction
+		with patch.object(frappe.db, "commit"):
+			stats = run_tradeline_import(f"TLI-TEST-{frappe.generate_hash(length=6)}", "Administrator",
+				rows=list(iter_import_rows(path)))
+		self.assertEqual(stats["status"], "Completed", stats)
+		return stats
+
+	def new_row(self, price=300, closing_date=15, bank=None):
+		return f",{bank or self.bank},5,10000,{price},4,{closing_date},{self.holder},{self.address}\n"
+
+	def test_new_updated_and_invalid_rows(self):
+		stats = self.run_import(
+			self.new_row()
+			+ f"{self.existing},,,,,8,,,\n"
+			+ self.new_row(price=-1, closing_date=40)
+			+ "IMP-MISSING,,,,,8,,,\n"
+			+ self.new_row(bank="No Such Bank")
+		)
+
+		self.assertEqual((stats["processed"], stats["inserted"], stats["updated"], stats["failed"]), (5, 1, 1, 3))
+		errors = {error["row"]: error["errors"] for error in stats["errors"]}
+		self.assertEqual(set(errors), {3, 4, 5})
+		self.assertIn("Price must be positive", errors[3])
+		self.assertIn("Closing date must be between 1 and 31", errors[3])
+		self.assertEqual(errors[4], ["Tradeline IMP-MISSING not found"])
+		self.assertEqual(errors[5], ["bank No Such Bank not found"])
+
+		created = frappe.get_all("Tradeline", filters={"bank": self.bank, "name": ["!=", self.existing]},
+			fields=["max_spots", "remaining_spots", "purchased_spots", "card_holder"])
+		self.assertEqual([(t.max_spots, t.remaining_spots, t.purchased_spots, t.card_holder) for t in created],
+			[(4, 4, 0, self.holder)])
+
+	def test_update_recomputes_remaining_spots(self):
+		self.run_import(f"{self.existing},,,,,8,,,\n")
+
+		tradeline = frappe.db.get_value("Tradeline", self.existing,
+			["max_spots", "purchased_spots", "remaining_spots", "price"], as_dict=True)
+		self.assertEqual((tradeline.max_spots, tradeline.purchased_spots, tradeline.remaining_spots), (8, 2, 6))
+		# Columns the row leaves empty keep their stored values
+		self.assertEqual(tradeline.price, 300)
+
+	def test_reserved_names_skip_existing_tradelines(self):
+		frappe.db.sql("INSERT IGNORE INTO `tabSeries` (`name`, `current`) VALUES (%s, 0)", (TRADELINE_SERIES,))
+		current = cint(frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name` = %s", (TRADELINE_SERIES,))[0][0])
+		taken = str(current + 1).zfill(TRADELINE_SERIES_DIGITS)
+		if not frappe.db.exists("Tradeline", taken):
+			self.make_tradeline(taken, price=999)
+		taken_price = frappe.db.get_value("Tradeline", taken, "price")
+
+		stats = self.run_import(self.new_row())
+
+		self.assertEqual(stats["inserted"], 1)
+		self.assertEqual(frappe.db.get_value("Tradeline", taken, "price"), taken_price)
+		self.assertTrue(frappe.db.exists("Tradeline", str(current + 2).zfill(TRADELINE_SERIES_DIGITS)))
+
+	def test_update_needs_write_permission(self):
+		with patch.object(frappe, "has_permission", side_effect=lambda doctype, ptype="read", *args, **kwargs:
+				ptype == "create"):
+			stats = self.run_import(f"{self.existing},,,,,8,,,\n" + self.new_row())
+
+		self.assertEqual((stats["inserted"], stats["updated"], stats["failed"]), (1, 0, 1))
+		self.assertEqual(stats["errors"][0]["row"], 1)
+		self.assertIn("Permission denied", stats["errors"][0]["errors"][0])
+		self.assertEqual(frappe.db.get_value("Tradeline", self.existing, "max_spots"), 5)
@@ -0,0 +1,133 @@
+# Copyright (c) 2026, RocketTradeline and Contributors
+# See license.txt
+
+import inspect
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from rockettradeline.api import auth, auth_extended, cart, feedback, marketing, payment, reconciliation
+from rockettradeline.api.transaction import unit_of_work
+
+# Endpoints that write and must commit exactly once per call
+UNITS_OF_WORK = [
+    payment.create_manual_payment_request,
+    payment.upload_payment_proof,
+    payment.approve_manual_payment,
+    payment.bulk_approve_manual_payments,
+    payment.create_payment_request,
+    cart.add_to_cart,
+    cart.create_payment_request,
+    auth.login,
+    auth.sign_up,
+    auth.verify_email,
+    auth.resend_verification_email,
+    auth_extended.forgot_password,
+    marketing.subscribe_to_newsletter,
+    marketing.unsubscribe_from_newsletter,
+    marketing.subscribe_to_email_group,
+    marketing.create_email_group,
+    feedback.submit_feedback,
+    feedback.update_feedback_status,
+    reconciliation.resolve_reconciliation_match,
+]
+
+
+def unit(fn):
+    """Strip whitelist/auth wrappers down to the unit of work"""
+    return inspect.unwrap(fn, stop=lambda f: getattr(f, "is_unit_of_work", False))
+
+
+class TestUnitOfWork(FrappeTestCase):
+    def setUp(self):
+        frappe.set_user("Administrator")
+
+    def count_commits(self, fn, *args, **kwargs):
+        with patch.object(frappe.db, "commit") as commit, patch.object(frappe.db, "rollback") as rollback:
+            result = fn(*args, **kwargs)
+        return result, commit.call_count, rollback.call_count
+
+    def test_endpoints_declare_units(self):
+        for fn in UNITS_OF_WORK:
+            self.assertTrue(getattr(unit(fn), "is_unit_of_work", False), fn.__name__)
+
+    def test_nested_units_commit_once(self):
+        @unit_of_work()
+        def inner():
+            return {"success": True}
+
+        @unit_of_work()
+        def outer():
+            inner()
+            inner()
+            return {"success": True}
+
+        _, commits, rollbacks = self.count_commits(outer)
+        self.assertEqual((commits, rollbacks), (1, 0))
+
+    def test_failure_rolls_back(self):
+        @unit_of_work()
+        def failing():
+            return {"success": False, "error": "nope"}
+
+        _, commits, rollbacks = self.count_commits(failing)
+        self.assertEqual((commits, rollbacks), (0, 1))
+
+    def test_newsletter_commits_once(self):
+        email = f"uow-{frappe.generate_hash(length=6)}@example.com"
+        subscribe = unit(marketing.subscribe_to_newsletter)
+        unsubscribe = unit(marketing.unsubscribe_from_newsletter)
+
+        # First subscription may also create the group; still one commit
+        for fn in (subscribe, unsubscribe, subscribe):
+            result, commits, rollbacks = self.count_commits(fn, email)
+            self.assertTrue(result["success"], result)
+            self.assertEqual((commits, rollbacks), (1, 0), fn.__name__)
+
+    def test_create_email_group_commits_once(self):
+        create_email_group = unit(marketing.create_email_group)
+
+        result, commits, _ = self.count_commits(create_email_group, f"UOW {frappe.generate_hash(length=6)}")
+        self.assertTrue(result["success"], result)
+        self.assertEqual(commits, 1)
+
+    def test_payment_failures_roll_back_once(self):
+        missing = f"missing-{frappe.generate_hash(length=6)}"
+        for fn, args in (
+            (payment.create_manual_payment_request, (missing, "Zelle")),
+            (payment.upload_payment_proof, (missing,)),
+            (payment.approve_manual_payment, (missing,)),
+            (payment.create_payment_request, (missing, "Zelle")),
+            (cart.create_payment_request, ("Zelle", missing)),
+        ):
+            result, commits, rollbacks = self.count_commits(unit(fn), *args)
+            self.assertFalse(result["success"], fn.__name__)
+            self.assertEqual((commits, rollbacks), (0, 1), fn.__name__)
+
+    def test_bulk_approval_commits_once(self):
+        missing = f"missing-{frappe.generate_hash(length=6)}"
+        items = [{"payment_request_id": missing, "action": "approve"}]
+
+        result, commits, rollbacks = self.count_commits(unit(payment.bulk_approve_manual_payments), items)
+        self.assertEqual(result["failed"], 1, result)
+        self.assertEqual((commits, rollbacks), (1, 0))
+
+    def test_sign_up_commits_once(self):
+        email = f"uow-{frappe.generate_hash(length=6)}@example.com"
+
+        result, commits, rollbacks = self.count_commits(unit(auth.sign_up), email, "Unit Of Work")
+        self.assertTrue(result["success"], result)
+        self.assertEqual((commits, rollbacks), (1, 0))
+
+    def test_failed_login_commits_once(self):
+        # login keeps failure state, so it commits instead of rolling back
+        _, commits, rollbacks = self.count_commits(unit(auth.login),
+            f"uow-{frappe.generate_hash(length=6)}@example.com", "wrong-password")
+        self.assertEqual((commits, rollbacks), (1, 0))
+
+    def test_unknown_email_commits_at_most_once(self):
+        email = f"uow-{frappe.generate_hash(length=6)}@example.com"
+        for fn in (auth.resend_verification_email, auth_extended.forgot_password):
+            _, commits, rollbacks = self.count_commits(unit(fn), email)
+            self.assertEqual(commits + rollbacks, 1, fn.__name__)